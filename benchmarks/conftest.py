@@ -0,0 +1,90 @@
+# Shared fixtures for the performance benchmarks (pytest-benchmark).
+# Every benchmark runs against a throwaway HOME and a fake QEMU, so nothing
+# here touches real VMs or needs QEMU installed.
+import json
+import os
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["HOME"] = tempfile.mkdtemp(prefix="mgui-bench-home-")
+
+import pytest
+from PySide6.QtCore import QEventLoop, QTimer
+from PySide6.QtWidgets import QApplication
+
+import main
+
+FAKE_QEMU = Path(__file__).with_name("fake_qemu.py")
+LIBRARY_SIZE = int(os.environ.get("BENCH_LIBRARY_SIZE", "500"))
+
+
+def sample_config(name, i=0):
+    return {
+        "name": name,
+        "arch": "x86_64" if i % 3 else "aarch64",
+        "machine": "q35" if i % 3 else "virt",
+        "cpu": "max",
+        "accel": "tcg",
+        "ram": 1024 + 512 * (i % 8),
+        "smp": 1 + i % 4,
+        "hda": f"/nonexistent/{name}/disk.qcow2",
+        "cdrom": f"/nonexistent/iso/install-{i % 5}.iso" if i % 2 else "",
+        "boot": "Disk (c)",
+        "net_type": "user",
+        "net_device": "virtio-net-pci",
+        "hostfwd": f"tcp::{2200 + i}-:22",
+        "display": "none",
+        "vga": "virtio",
+        "append": "console=ttyS0 quiet",
+        "extra": "-device virtio-rng-pci -rtc base=utc",
+    }
+
+
+def wait_for(signal, timeout_ms=10000):
+    loop = QEventLoop()
+    signal.connect(loop.quit)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec()
+    signal.disconnect(loop.quit)
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope="session")
+def window(qapp):
+    # One window for the whole session: building MguiQemu is itself expensive
+    w = main.MguiQemu()
+    yield w
+    w.close()
+
+
+@pytest.fixture(scope="session")
+def fake_qemu_bin(tmp_path_factory):
+    bin_dir = tmp_path_factory.mktemp("bin")
+    for name in ("qemu-system-x86_64", "qemu-system-aarch64"):
+        (bin_dir / name).symlink_to(FAKE_QEMU)
+    old_path = os.environ["PATH"]
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{old_path}"
+    yield bin_dir
+    os.environ["PATH"] = old_path
+
+
+@pytest.fixture(scope="session")
+def library(tmp_path_factory):
+    base = tmp_path_factory.mktemp("MGUI_QEMU_VMs")
+    for i in range(LIBRARY_SIZE):
+        name = f"vm-{i:05d}"
+        (base / name).mkdir()
+        with open(base / name / "config.json", "w", encoding='utf-8') as f:
+            json.dump(sample_config(name, i), f, indent=4)
+    return base
+
+
+@pytest.fixture
+def library_window(window, library, monkeypatch):
+    monkeypatch.setattr(window, "base_path", library)
+    return window
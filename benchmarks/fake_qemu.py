@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# Stand-in for qemu-system-* used by the benchmark suite.
+# It accepts any QEMU command line, serves a minimal QMP monitor on the -qmp
+# socket and is scripted through environment variables:
+#   FAKE_QEMU_BOOT_DELAY      seconds to wait before printing anything (0)
+#   FAKE_QEMU_STDOUT_LINES    number of lines to flood on stdout (0)
+#   FAKE_QEMU_STDERR_LINES    number of lines to flood on stderr (0)
+#   FAKE_QEMU_LINE            text of every flooded line
+#   FAKE_QEMU_READY_MARKER    line printed once booting is "done"
+#   FAKE_QEMU_EXIT_AFTER      exit by itself this many seconds after the output (never)
+#   FAKE_QEMU_EXIT_CODE       exit code used by FAKE_QEMU_EXIT_AFTER, quit and SIGTERM (0)
+#   FAKE_QEMU_VERSION         version reported by QMP and -version (9.0.0)
+#   FAKE_QEMU_IOPS            I/O operations per second reported by query-blockstats (100)
+import json
+import os
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+
+VERSION = os.environ.get("FAKE_QEMU_VERSION", "9.0.0")
+EXIT_CODE = int(os.environ.get("FAKE_QEMU_EXIT_CODE", "0"))
+IOPS = float(os.environ.get("FAKE_QEMU_IOPS", "100"))
+STARTED = time.monotonic()
+
+
+def blockstats():
+    # Counters grow steadily: 70% reads, 4 KiB per operation, 0.5 ms per operation
+    ops = int((time.monotonic() - STARTED) * IOPS)
+    reads, writes = ops * 7 // 10, ops - ops * 7 // 10
+    stats = {"rd_operations": reads, "wr_operations": writes, "rd_bytes": reads * 4096, "wr_bytes": writes * 4096,
+             "rd_total_time_ns": reads * 500000, "wr_total_time_ns": writes * 500000,
+             "timed_stats": [{"interval_length": 10, "avg_rd_queue_depth": 0.5, "avg_wr_queue_depth": 0.25}]}
+    return [{"device": "ide0-hd0", "stats": stats}]
+
+
+def qemu_version():
+    major, minor, micro = (VERSION.split(".") + ["0", "0"])[:3]
+    return {"qemu": {"major": int(major), "minor": int(minor), "micro": int(micro)}, "package": ""}
+
+
+def info_network(argv):
+    # HMP "info network" for the -netdev options on the command line; taps without ifname= get tapN
+    lines = []
+    netdevs = [argv[i + 1] for i, arg in enumerate(argv[:-1]) if arg == "-netdev"]
+    for index, spec in enumerate(netdevs):
+        backend, _, opts = spec.partition(",")
+        options = dict(opt.partition("=")[::2] for opt in opts.split(",") if opt)
+        details = f"index={index},type={'tap' if backend in ('tap', 'bridge') else backend}"
+        if backend == "tap":
+            details += f",ifname={options.get('ifname', f'tap{index}')}"
+        lines.append(f"{options.get('id', f'net{index}')}: {details}")
+    return "\r\n".join(lines) + "\r\n"
+
+
+class FakeMonitor:
+    def __init__(self, paused, argv=()):
+        self.status = "prelaunch" if paused else "running"
+        self.argv = list(argv)
+        self.lock = threading.Lock()
+        self.streams = []
+
+    def shutdown(self, reason):
+        # Like QEMU, tell every connected monitor why it is going away before exiting
+        event = {"event": "SHUTDOWN", "data": {"guest": reason == "guest-shutdown", "reason": reason},
+                 "timestamp": {"seconds": int(time.time()), "microseconds": 0}}
+        for stream in list(self.streams):
+            try:
+                stream.write(json.dumps(event).encode() + b"\r\n")
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        os._exit(EXIT_CODE)
+
+    def handle(self, command, arguments):
+        with self.lock:
+            if command == "qmp_capabilities":
+                return {}
+            if command == "query-status":
+                return {"status": self.status, "running": self.status == "running"}
+            if command == "query-version":
+                return qemu_version()
+            if command == "query-blockstats":
+                return blockstats()
+            if command == "human-monitor-command" and arguments.get("command-line") == "info network":
+                return info_network(self.argv)
+            if command == "cont":
+                self.status = "running"
+                return {}
+            if command == "stop":
+                self.status = "paused"
+                return {}
+            if command in ("quit", "system_powerdown"):
+                reason = "host-qmp-quit" if command == "quit" else "guest-shutdown"
+                threading.Timer(0.01, lambda: self.shutdown(reason)).start()
+                return {}
+            if command == "query-commands":
+                return [{"name": name} for name in ("qmp_capabilities", "query-status", "query-version",
+                                                     "query-blockstats", "human-monitor-command", "cont", "stop",
+                                                     "quit", "system_powerdown")]
+        raise KeyError(command)
+
+    def serve(self, conn):
+        with conn, conn.makefile("rwb") as stream:
+            stream.write(json.dumps({"QMP": {"version": qemu_version(), "capabilities": []}}).encode() + b"\r\n")
+            stream.flush()
+            self.streams.append(stream)
+            for line in stream:
+                try:
+                    msg = json.loads(line)
+                    reply = {"return": self.handle(msg["execute"], msg.get("arguments", {}))}
+                except KeyError as exc:
+                    reply = {"error": {"class": "CommandNotFound", "desc": f"The command {exc} has not been found"}}
+                except ValueError:
+                    reply = {"error": {"class": "GenericError", "desc": "JSON parse error"}}
+                stream.write(json.dumps(reply).encode() + b"\r\n")
+                stream.flush()
+
+
+def listen(spec):
+    # tcp:HOST:PORT,server=on,wait=off or unix:PATH,server=on,wait=off
+    address = spec.split(",")[0]
+    if address.startswith("unix:"):
+        path = address[5:]
+        if os.path.exists(path):
+            os.unlink(path)
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        srv.bind(path)
+    else:
+        match = re.match(r"tcp:([^:]*):(\d+)", address)
+        if not match:
+            raise SystemExit(f"fake-qemu: unsupported -qmp address {spec}")
+        srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        srv.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        srv.bind((match.group(1) or "127.0.0.1", int(match.group(2))))
+    srv.listen(4)
+    return srv
+
+
+def accept_loop(srv, monitor):
+    while True:
+        conn, _ = srv.accept()
+        threading.Thread(target=monitor.serve, args=(conn,), daemon=True).start()
+
+
+def flood(stream, count, text):
+    chunk = (text + "\n") * min(count, 1000)
+    for _ in range(count // 1000):
+        stream.write(chunk)
+    stream.write((text + "\n") * (count % 1000))
+    stream.flush()
+
+
+def main(argv):
+    if "-version" in argv:
+        print(f"QEMU emulator version {VERSION} (fake)")
+        return 0
+    if "help" in argv:
+        print("Accelerators supported in QEMU binary:\ntcg")
+        return 0
+
+    monitor = FakeMonitor("-S" in argv, argv)
+    signal.signal(signal.SIGTERM, lambda *_: monitor.shutdown("host-signal"))
+    for i, arg in enumerate(argv[:-1]):
+        if arg == "-qmp" and argv[i + 1] != "stdio":
+            threading.Thread(target=accept_loop, args=(listen(argv[i + 1]), monitor), daemon=True).start()
+
+    time.sleep(float(os.environ.get("FAKE_QEMU_BOOT_DELAY", "0")))
+    text = os.environ.get("FAKE_QEMU_LINE", "fake-qemu: guest console output")
+    flood(sys.stderr, int(os.environ.get("FAKE_QEMU_STDERR_LINES", "0")), text)
+    flood(sys.stdout, int(os.environ.get("FAKE_QEMU_STDOUT_LINES", "0")), text)
+    marker = os.environ.get("FAKE_QEMU_READY_MARKER")
+    if marker:
+        print(marker, flush=True)
+    exit_after = os.environ.get("FAKE_QEMU_EXIT_AFTER")
+    if exit_after:
+        time.sleep(float(exit_after))
+        return EXIT_CODE
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,47 @@
+# Accelerator detection, TCG options and per-arch defaults
+import main
+
+
+def test_accel_probe_is_cached(fake_qemu_bin):
+    qemu_bin = str(fake_qemu_bin / "qemu-system-aarch64")
+    main._accel_help_cache.pop(qemu_bin, None)
+    # Without probing nothing is run, so the GUI thread never waits on the binary
+    assert main.binary_accels(qemu_bin, probe=False) is None
+    assert main.binary_accels(qemu_bin) == ["tcg"]
+    assert main.binary_accels(qemu_bin, probe=False) == ["tcg"]
+
+
+def test_accel_hint_names_the_tcg_thread_mode(monkeypatch):
+    monkeypatch.setattr(main, "host_arch_code", lambda: "aarch64")
+    monkeypatch.setattr(main, "binary_accels", lambda qemu_bin, probe=True: None)
+    accels, reason = main.detect_accelerators("x86_64")
+    # A strongly ordered guest on a weakly ordered host runs single-threaded
+    assert accels == ["tcg"] and "single-threaded TCG" in reason
+    assert "multi-threaded TCG" in main.detect_accelerators("riscv64")[1]
+
+
+def test_tb_size_only_when_chosen():
+    assert main.tcg_accel_options({"arch": "riscv64"}) == "tcg,thread=multi"
+    assert main.tcg_accel_options({"arch": "riscv64", "tcg_tb_size": 0}) == "tcg,thread=multi"
+    assert main.tcg_accel_options({"arch": "riscv64", "tcg_tb_size": 512}) == "tcg,thread=multi,tb-size=512"
+    assert main.tcg_accel_options({"arch": "riscv64", "icount": "shift=auto"}) == "tcg,thread=single"
+
+
+def test_arch_change_keeps_valid_choices(window):
+    saved = (window.f_mode.currentIndex(), window.f_arch.currentText(),
+             window.f_machine.currentText(), window.f_cpu.currentText())
+    window.f_mode.setCurrentIndex(0)
+    window.f_arch.setCurrentText("x86_64")
+    window.f_machine.setCurrentText("pc")
+    window.f_cpu.setCurrentText("qemu64")
+    # i386 runs the same machines and CPU models
+    window.f_arch.setCurrentText("i386")
+    assert (window.f_machine.currentText(), window.f_cpu.currentText()) == ("pc", "qemu64")
+    window.f_arch.setCurrentText("Arm (64-bit)")
+    assert (window.f_machine.currentText(), window.f_cpu.currentText()) == ("virt", "max,pauth-impdef=on")
+    window.f_arch.setCurrentText("x86_64")
+    assert (window.f_machine.currentText(), window.f_cpu.currentText()) == ("q35", "max")
+    window.f_mode.setCurrentIndex(saved[0])
+    window.f_arch.setCurrentText(saved[1])
+    window.f_machine.setCurrentText(saved[2])
+    window.f_cpu.setCurrentText(saved[3])
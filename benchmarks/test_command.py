@@ -0,0 +1,42 @@
+# Command generation: runs on every keystroke through update_preview
+import pytest
+
+import main
+from conftest import sample_config
+
+
+def test_build_command(benchmark):
+    cfg = sample_config("bench", 1)
+    args = benchmark(main.build_command, cfg)
+    assert args[0] == "qemu-system-x86_64"
+
+
+def test_build_command_fast_boot(benchmark):
+    cfg = dict(sample_config("bench", 1), fast_boot=True, kernel="/nonexistent/vmlinuz")
+    args = benchmark(main.build_command, cfg)
+    assert "microvm" in " ".join(args)
+
+
+def test_generate_command_list(benchmark, window):
+    window.apply_config(sample_config("bench", 1), "bench")
+    args = benchmark(window.generate_command_list)
+    assert "-m" in args
+
+
+def test_update_preview(benchmark, window):
+    window.apply_config(sample_config("bench", 2), "bench")
+    benchmark(window.update_preview)
+    assert window.cmd_preview.toPlainText().startswith("qemu-system-")
+
+
+def test_fast_boot_uses_virtio_mmio_nic():
+    for nic in ("e1000-82545em", "vmxnet3", "virtio-net-pci"):
+        cfg = dict(sample_config("fast", 1), fast_boot=True, arch="Arm (64-bit)", net_device=nic)
+        args = main.build_command(cfg)
+        assert any(arg.startswith("virtio-net-device,netdev=") for arg in args)
+        assert not any(arg.startswith(nic + ",") for arg in args)
+
+
+def test_fast_boot_rejects_unsupported_arches():
+    with pytest.raises(ValueError, match="ppc64"):
+        main.fast_boot_config(dict(sample_config("fast", 1), arch="ppc64"))
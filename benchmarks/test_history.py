@@ -0,0 +1,21 @@
+# Config edit history: recorded after every edit, so diffing a full config must stay cheap
+import main
+from conftest import sample_config
+
+
+def test_history_record(benchmark):
+    edits = []
+    cfg = sample_config("vm-00000")
+    for i in range(main.HISTORY_LIMIT * 2):
+        cfg = dict(cfg, ram=1024 + i, append=cfg["append"] + " x") if i % 2 else dict(cfg, smp=1 + i % 8)
+        edits.append(cfg)
+
+    def record_all():
+        history = main.ConfigHistory(sample_config("vm-00000"), coalesce_s=0)
+        for i, edit in enumerate(edits):
+            history.record(edit, now=float(i))
+        return history
+
+    history = benchmark(record_all)
+    assert len(history.undo_steps) == main.HISTORY_LIMIT
+    assert history.undo()["ram"] == edits[-2]["ram"]
@@ -0,0 +1,108 @@
+# Host-side helpers read from /sys and /proc, run against fake trees, plus capacity and balloon arithmetic
+import json
+import mmap
+import os
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def ksm_root(tmp_path):
+    root = tmp_path / "sys" / "kernel" / "mm" / "ksm"
+    root.mkdir(parents=True)
+    values = {"run": 1, "pages_to_scan": 100, "sleep_millisecs": 20, "pages_shared": 300,
+              "pages_sharing": 1200, "pages_unshared": 50, "pages_volatile": 7, "full_scans": 3}
+    for key, value in values.items():
+        (root / key).write_text(f"{value}\n")
+    return root
+
+
+def test_ksm_counters(ksm_root):
+    ksm = main.KsmControl(ksm_root)
+    assert ksm.available()
+    assert ksm.settings() == {"run": 1, "pages_to_scan": 100, "sleep_millisecs": 20}
+    stats = ksm.sample()
+    assert stats["pages_shared"] == 300 and stats["full_scans"] == 3
+    assert stats["saved_bytes"] == 1200 * mmap.PAGESIZE
+    assert len(ksm.history) == 1
+
+
+def test_ksm_tunables(ksm_root):
+    ksm = main.KsmControl(ksm_root)
+    ksm.write("pages_to_scan", 500)
+    assert ksm.read("pages_to_scan") == 500
+    with pytest.raises(ValueError):
+        ksm.write("pages_shared", 0)
+    (ksm_root / "full_scans").write_text("garbage")
+    assert ksm.sample()["full_scans"] == 0
+    assert not main.KsmControl(ksm_root / "missing").available()
+
+
+def test_memory_pressure(tmp_path):
+    psi = tmp_path / "memory"
+    psi.write_text("some avg10=1.53 avg60=0.87 avg300=0.20 total=1234\nfull avg10=0.40 avg60=0.10 avg300=0.00 total=99\n")
+    assert main.read_memory_pressure(psi) == {"some": 1.53, "full": 0.40}
+    assert main.read_memory_pressure(tmp_path / "missing") is None
+
+
+@pytest.mark.parametrize("actual, available, pressure, target", [
+    (4096, 2000, 20.0, 3096),   # high pressure: reclaim half of the guest's free memory
+    (4096, 100, 20.0, None),    # less than 64 MiB of change is not worth a balloon request
+    (2048, 3000, 20.0, 1024),   # never below the configured minimum
+    (4096, 1000, 5.0, None),    # between the thresholds nothing moves
+    (4096, 300, 0.5, 5120),     # low pressure and a starved guest: grow by a quarter
+    (7680, 300, 0.5, 8192),     # ... up to the maximum
+    (4096, 1000, 0.5, None),    # the guest has enough headroom
+    (4096, None, 0.5, 8192),    # no guest stats: give it everything back
+])
+def test_balloon_target(actual, available, pressure, target):
+    assert main.balloon_target(actual, available, 1024, 8192, pressure) == target
+
+
+def saved_vm(base, name, **cfg):
+    (base / name).mkdir()
+    (base / name / "config.json").write_text(json.dumps(dict(name=name, **cfg)))
+
+
+def test_capacity_plan(tmp_path):
+    saved_vm(tmp_path, "small", ram=1024, smp=2)
+    saved_vm(tmp_path, "big", ram=6144, smp=4)
+    saved_vm(tmp_path, "wide", ram=512, smp=16)
+    saved_vm(tmp_path, "huge", ram=2048, smp=1, mem_path="/dev/hugepages")
+    saved_vm(tmp_path, "busy", ram=1024, smp=1)
+    saved_vm(tmp_path, "broken", ram="lots")
+    reqs = main.library_requirements(tmp_path)
+    assert sorted(req["name"] for req in reqs) == ["big", "busy", "huge", "small", "wide"]
+    host = {"mem_total_mb": 8192, "mem_available_mb": 4096, "cpu_count": 8,
+            "hugepages_total_mb": 4096, "hugepages_free_mb": 1024}
+    report = main.plan_capacity(reqs, host, running={"busy"})
+    assert sorted(report["startable"]) == ["small"]
+    assert report["blocked"]["busy"] == "running"
+    assert "RAM" in report["blocked"]["big"] and "vCPUs" in report["blocked"]["wide"]
+    assert "hugepages" in report["blocked"]["huge"]
+    assert report["ram_mb"] == 10752 and report["vcpus"] == 24 and report["hugepages_mb"] == 2048
+    assert report["ram_ratio"] == 10752 / 8192 and report["vcpu_ratio"] == 3.0
+    assert report["hugepages_ratio"] == 0.5
+    # Hugepage demand without any reserved hugepages can never be met
+    assert main.plan_capacity(reqs, dict(host, hugepages_total_mb=0))["hugepages_ratio"] == float("inf")
+
+
+def test_guest_agent_socket_in_private_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "_runtime_dir", None)
+    path = main.guest_agent_socket({"name": "web/1"})
+    folder = tmp_path / "mgui_qemu"
+    assert path == str(folder / "web_1.qga")
+    assert folder.stat().st_mode & 0o777 == 0o700 and folder.stat().st_uid == os.getuid()
+
+
+def test_private_dir_refuses_shared_folders(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    assert main.private_dir(str(shared)) is None
+    os.symlink(shared, tmp_path / "link")
+    assert main.private_dir(str(tmp_path / "link")) is None
+    assert main.private_dir(str(tmp_path / "own")) == str(tmp_path / "own")
@@ -0,0 +1,70 @@
+# Importing launch scripts: a directory full of hand-written QEMU command lines
+import shlex
+
+import main
+from conftest import sample_config
+
+SCRIPTS = 300
+
+
+def option_groups(argv):
+    # QEMU doesn't care where an option sits on the command line, so compare the (option, value) pairs
+    return sorted(main.split_qemu_options(argv), key=lambda pair: (pair[0] or "", pair[1] or ""))
+
+
+def write_scripts(folder):
+    folder.mkdir()
+    for i in range(SCRIPTS):
+        cfg = sample_config(f"vm-{i:04d}", i)
+        cfg.update(boot="c (Hard Disk)", balloon=i % 2 == 0, usb_device="usb-tablet", accel="kvm" if i % 4 == 0 else "tcg")
+        argv = shlex.join(main.build_command(cfg)).replace(" -", " \\\n    -")
+        with open(folder / f"vm-{i:04d}.sh", "w", encoding='utf-8') as f:
+            f.write(f"#!/bin/sh\nDISK=/nonexistent/disk-{i}.qcow2\n{argv} -hdb $DISK \"$@\"\n")
+    return folder
+
+
+def test_import_round_trip():
+    for i in range(12):
+        cfg = sample_config(f"vm-{i:04d}", i)
+        cfg.update(mem_merge="off", audio_drv="pa" if i % 3 else "none", soundhw="ac97", gdb="s" if i % 2 else "",
+                   accel="kvm" if i % 4 == 0 else "tcg", icount="shift=auto" if i % 5 == 0 else "")
+        argv = main.build_command(cfg)
+        imported, unmapped, _ = main.parse_qemu_argv(argv)
+        assert option_groups(main.build_command(imported)) == option_groups(argv)
+        assert set(unmapped) <= {"-boot", "-device", "-rtc"}
+
+
+def test_import_directory(benchmark, tmp_path):
+    scripts = write_scripts(tmp_path / "scripts")
+    counter = iter(range(1000))
+    report = benchmark(lambda: main.import_scripts([scripts], tmp_path / f"library-{next(counter)}"))
+    assert [row["status"] for row in report] == ["imported"] * SCRIPTS
+    assert {tuple(row["unmapped"]) for row in report} == {("-device", "-rtc")}
+
+
+def test_import_windows_binary():
+    cfg, _, _ = main.parse_qemu_argv(["C:\\Program Files\\qemu\\qemu-system-aarch64.exe", "-m", "512"])
+    assert main.ARCH_MAP[cfg["arch"]] == "aarch64" and cfg["ram"] == 512
+    assert main.QEMU_BINARY_RE.search("C:\\qemu\\qemu-system-x86_64.exe")
+
+
+def test_script_single_quotes_are_literal():
+    text = "MEM=2048\nNAME=box\nqemu-system-x86_64 -m $MEM -name \"$NAME\" -append 'root=$ROOT quiet' -smp ${CPUS}\n"
+    argv = main.script_qemu_commands(text)[0]
+    assert argv == ["qemu-system-x86_64", "-m", "2048", "-name", "box", "-append", "root=$ROOT quiet",
+                    "-smp", "${CPUS}"]
+    assert main.script_qemu_commands("N='$MEM'\nqemu-system-x86_64 -name $N\n")[0][-1] == "$MEM"
+
+
+def test_import_worker(qapp, tmp_path):
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    (scripts / "a.sh").write_text("qemu-system-x86_64 -m 1024 -name a\n")
+    worker = main.ImportWorker([scripts], tmp_path / "library")
+    reports = []
+    worker.done.connect(reports.append)
+    worker.start()
+    assert worker.wait(10000)
+    qapp.processEvents()
+    assert [row["status"] for row in reports[0]] == ["imported"]
+    assert (tmp_path / "library" / "a" / "config.json").exists()
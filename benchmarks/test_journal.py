@@ -0,0 +1,26 @@
+# Event journal: "which VMs crashed in the last day" scans every journal file
+import time
+
+import main
+
+VMS = 50
+LAUNCHES = 200
+
+
+def test_journal_report(benchmark, tmp_path):
+    journal = main.EventJournal(tmp_path)
+    now = time.time()
+    for vm in range(VMS):
+        name = f"vm-{vm:03d}"
+        for run in range(LAUNCHES):
+            journal.record(name, "launch", pid=1000 + run, argv_sha1="0" * 40)
+            journal.record(name, "qmp_ready", boot_s=0.1, qemu="9.0.0")
+            for _ in range(8):
+                journal.record(name, "qmp_event", qmp_event="RTC_CHANGE", data={"offset": 0})
+            journal.record(name, "exit", exit_code=139 if run % 10 == 0 else 0, crashed=run % 10 == 0, uptime_s=60.0,
+                           shutdown_reason=None)
+    journal.close()
+    report = benchmark(main.journal_report, tmp_path, now - 86400)
+    assert len(report) == VMS
+    assert len(report["vm-000"]["crashes"]) == LAUNCHES // 10
+    assert report["vm-000"]["boot_s"][0] == 0.1
@@ -0,0 +1,28 @@
+# VM library: listing, switching between and saving profiles
+from PySide6.QtWidgets import QMessageBox
+
+from conftest import LIBRARY_SIZE
+
+
+def test_refresh_list(benchmark, library_window):
+    benchmark(library_window.refresh_list)
+    assert library_window.vm_list.count() == LIBRARY_SIZE
+
+
+def test_load_vm_switching(benchmark, library_window):
+    names = ["vm-00001", "vm-00002"]
+    state = {"i": 0}
+
+    def switch():
+        state["i"] += 1
+        library_window.load_vm(names[state["i"] % 2])
+
+    benchmark(switch)
+    assert library_window.f_name.text() in names
+
+
+def test_save_vm(benchmark, library_window, monkeypatch):
+    monkeypatch.setattr(QMessageBox, "information", lambda *args: None)
+    library_window.load_vm("vm-00003")
+    benchmark(library_window.save_vm)
+    assert (library_window.base_path / "vm-00003" / "config.json").exists()
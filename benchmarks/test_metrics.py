@@ -0,0 +1,75 @@
+# Metrics tab: redrawn on the GUI thread after every sampling round
+from collections import deque
+
+import main
+
+VMS = 50
+DISKS = 4
+
+
+def fake_series(history):
+    series = {}
+    for vm in range(VMS):
+        for disk in range(DISKS):
+            samples = deque(maxlen=history)
+            for t in range(history):
+                prev = {"rd_operations": 0, "wr_operations": 0, "rd_bytes": 0, "wr_bytes": 0}
+                cur = {"rd_operations": 100 * vm + t, "wr_operations": 50 * disk + t,
+                       "rd_bytes": 4096 * (100 * vm + t), "wr_bytes": 4096 * (50 * disk + t),
+                       "rd_total_time_ns": 10 ** 6 * t, "wr_total_time_ns": 10 ** 6 * t}
+                samples.append((t, main.blockstats_rates(prev, cur, 2.0)))
+            series[(f"vm-{vm:03d}", f"ide0-hd{disk}")] = samples
+    return series
+
+
+def test_blockstats_rates(benchmark):
+    prev = {"rd_operations": 1000, "wr_operations": 500, "rd_bytes": 4096000, "wr_bytes": 2048000,
+            "rd_total_time_ns": 10 ** 9, "wr_total_time_ns": 10 ** 9}
+    cur = {key: value * 2 for key, value in prev.items()}
+    rates = benchmark(main.blockstats_rates, prev, cur, 2.0)
+    assert rates["read_iops"] == 500
+    assert rates["queue_depth"] is None  # no stats-intervals on this drive
+    timed = dict(cur, timed_stats=[{"avg_rd_queue_depth": 1.5, "avg_wr_queue_depth": 0.5}])
+    assert main.blockstats_rates(prev, timed, 2.0)["queue_depth"] == 2.0
+
+
+def test_show_blockstats(benchmark, window, monkeypatch):
+    sampler = main.BlockStatsSampler()
+    sampler.series = fake_series(main.BLOCKSTATS_HISTORY)
+    monkeypatch.setattr(window, "blockstats_sampler", sampler)
+    benchmark(window.show_blockstats)
+    assert window.metrics_table.rowCount() == VMS * DISKS
+    assert window.metrics_table.item(0, 0).text() == f"vm-{VMS - 1:03d}"
+
+
+def test_format_metrics(benchmark):
+    # One exporter collection's worth of samples for 100 VMs with 4 disks each
+    samples = [({"vm": f"vm-{vm:03d}", "device": f"ide0-hd{disk}", "op": op}, 123456789 * vm + disk)
+               for vm in range(100) for disk in range(4) for op in ("read", "write")]
+    families = {name: ("counter", "help text", samples) for name in ("block_bytes_total", "block_ops_total",
+                                                                     "block_time_seconds_total")}
+    text = benchmark(main.format_metrics, families)
+    assert text.count("\n") == 3 * (2 + len(samples))
+
+
+def test_sampler_skips_vm_while_a_job_holds_the_monitor(qapp, capsys):
+    reads = []
+
+    def read(port, name, info):
+        reads.append(port)
+        if len(reads) == 1:
+            raise OSError("timed out")
+        return {"disk": len(reads)}
+
+    sampler = main.VmStatsSampler(read, lambda prev, cur, elapsed: cur - prev)
+    sampler.targets[4444] = ("vm", {})
+    with main.MonitorJob(4444, "snapshot-save"):
+        assert main.monitor_busy(4444) == "snapshot-save"
+        sampler.sample_all()
+        sampler.sample_all()
+    assert main.monitor_busy(4444) is None and reads == []
+    for _ in range(3):
+        sampler.sample_all()
+    out = capsys.readouterr().out
+    assert out.count("monitor busy with snapshot-save") == 1 and out.count("timed out") == 1
+    assert [rates for _, rates in sampler.snapshot()[0][("vm", "disk")]] == [1]
@@ -0,0 +1,89 @@
+# Running QEMU: log throughput of the console pane and time until QMP answers
+import os
+import time
+
+import pytest
+from PySide6.QtCore import QProcess
+
+import main
+from conftest import sample_config, wait_for
+
+FLOOD_LINES = int(os.environ.get("BENCH_FLOOD_LINES", "20000"))
+
+
+@pytest.fixture
+def fake_env(monkeypatch, fake_qemu_bin):
+    def configure(**values):
+        for key, value in values.items():
+            monkeypatch.setenv(f"FAKE_QEMU_{key.upper()}", str(value))
+    return configure
+
+
+def stop_process(window):
+    if window.process.state() != QProcess.ProcessState.NotRunning:
+        window.process.kill()
+        window.process.waitForFinished(3000)
+
+
+@pytest.fixture
+def vm_window(window):
+    # pedantic() skips its teardown under --benchmark-disable, so stop QEMU here as well
+    yield window
+    stop_process(window)
+
+
+def test_log_throughput(benchmark, vm_window, fake_env):
+    window = vm_window
+    fake_env(stdout_lines=FLOOD_LINES, stderr_lines=FLOOD_LINES // 10,
+             ready_marker="Run /sbin/init as init process", exit_after=0)
+    window.apply_config(sample_config("flood", 1), "flood")
+
+    def run():
+        window.run_vm()
+        wait_for(window.process.finished)
+
+    benchmark.pedantic(run, teardown=lambda: stop_process(window), rounds=5)
+    assert window.log_output.blockCount() > FLOOD_LINES
+
+
+def test_launch_until_qmp(benchmark, vm_window, fake_env):
+    window = vm_window
+    fake_env(boot_delay=0)
+    window.apply_config(sample_config("qmp", 1), "qmp")
+
+    def run():
+        window.run_vm()
+        t0 = time.perf_counter()
+        status = main.qmp_execute(window.qmp_port, "query-status", wait=5.0)
+        assert status["running"]
+        return time.perf_counter() - t0
+
+    benchmark.pedantic(run, teardown=lambda: stop_process(window), rounds=10)
+
+
+def test_benchmarks_leave_no_qemu_running(window):
+    # Runs after the benchmarks above: vm_window must have stopped QEMU even with --benchmark-disable
+    assert window.process.state() == QProcess.ProcessState.NotRunning
+
+
+def test_fake_qemu_monitor(window, fake_env):
+    # The stand-in must behave enough like QEMU for the UI: -S, stop/cont and unknown commands
+    args = main.build_command(dict(sample_config("monitor", 1), S=True))
+    port = main.find_free_port()
+    proc = QProcess()
+    proc.start(main.resolve_qemu_binary(args[0]), args[1:] + main.qmp_args(port))
+    assert proc.waitForStarted(5000)
+    try:
+        with main.QmpClient(port) as client:
+            client.connect(5.0)
+            assert client.greeting["QMP"]["version"]["qemu"]["major"] == 9
+            assert client.execute("query-status")["status"] == "prelaunch"
+            client.execute("cont")
+            assert client.execute("query-status")["running"]
+            with pytest.raises(main.QmpError):
+                client.execute("no-such-command")
+            client.execute("quit")
+        assert proc.waitForFinished(3000)
+    finally:
+        proc.kill()
+        proc.waitForFinished(3000)
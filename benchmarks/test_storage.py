@@ -0,0 +1,137 @@
+# Disk images: sparse copies and exports of VM folders, header parsing
+import os
+import struct
+import tarfile
+import time
+
+import main
+
+MIB = 1024 * 1024
+
+
+def sparse_vm(folder):
+    # 64 MiB disk with data only at the start, the middle and the end
+    folder.mkdir()
+    with open(folder / "disk.img", "wb") as f:
+        f.truncate(64 * MIB)
+        for offset in (0, 32 * MIB, 64 * MIB - 4096):
+            f.seek(offset)
+            f.write(os.urandom(4096))
+    (folder / "config.json").write_text('{"name": "sparse"}')
+    os.symlink("disk.img", folder / "link.img")
+    return folder
+
+
+def test_copy_vm_tree_keeps_holes(tmp_path):
+    src = sparse_vm(tmp_path / "src")
+    copied = []
+    main.copy_vm_tree(src, tmp_path / "dst", copied.append)
+    dst = tmp_path / "dst"
+    assert (dst / "disk.img").read_bytes() == (src / "disk.img").read_bytes()
+    assert os.readlink(dst / "link.img") == "disk.img"
+    assert (dst / "config.json").read_text() == '{"name": "sparse"}'
+    if main.allocated_size(src / "disk.img") < 64 * MIB:
+        # The file system keeps holes: the copy must not fill them in
+        assert main.allocated_size(dst / "disk.img") < 64 * MIB
+        assert sum(copied) < 64 * MIB
+
+
+def test_export_tar_sparse_round_trip(tmp_path):
+    src = sparse_vm(tmp_path / "src")
+    main.export_vm_tar(src, tmp_path / "vm.tar")
+    with tarfile.open(tmp_path / "vm.tar") as tar:
+        names = tar.getnames()
+        tar.extractall(tmp_path / "out", filter="tar")
+    out = tmp_path / "out" / "src"
+    assert (out / "disk.img").read_bytes() == (src / "disk.img").read_bytes()
+    assert os.readlink(out / "link.img") == "disk.img"
+    if main.allocated_size(src / "disk.img") < 64 * MIB:
+        assert "src/disk.img" in names  # stored as a GNU sparse member under its real name
+        assert os.path.getsize(tmp_path / "vm.tar") < 4 * MIB
+
+
+def qcow2_header(version, size, backing=b"", backing_format=b""):
+    header_length = 104 if version >= 3 else 72
+    backing_offset = 512 if backing else 0
+    head = struct.pack(">4sIQIIQI", main.QCOW2_MAGIC, version, backing_offset, len(backing), 16, size, 0)
+    head += struct.pack(">IQQIIQ", 0, 0, 0, 0, 0, 0)
+    if version >= 3:
+        head += struct.pack(">QQQII", 0, 0, 0, 4, header_length)
+    if backing_format:
+        head += struct.pack(">II", main.QCOW2_EXT_BACKING_FORMAT, len(backing_format))
+        head += backing_format + b"\0" * (-len(backing_format) % 8)
+    head += struct.pack(">II", main.QCOW2_EXT_END, 0)
+    head = head.ljust(512, b"\0") + backing
+    return head.ljust(4096, b"\0")
+
+
+def test_qcow2_header(tmp_path):
+    (tmp_path / "base.img").write_bytes(b"\0" * 4096)
+    (tmp_path / "disk.qcow2").write_bytes(qcow2_header(3, 10 * 1024 ** 3, b"base.img", b"raw"))
+    info = main.inspect_image(str(tmp_path / "disk.qcow2"))
+    assert info["format"] == "qcow2" and info["qcow2_version"] == 3
+    assert info["virtual_size"] == 10 * 1024 ** 3 and info["cluster_size"] == 65536
+    assert info["backing_file"] == "base.img" and info["backing_format"] == "raw"
+    assert [parent["path"] for parent in info["chain"]] == [str(tmp_path / "base.img")]
+    # qcow (version 1) shares the magic but isn't qcow2
+    assert main.detect_image_format(qcow2_header(1, MIB)) == "qcow"
+    assert main.detect_image_format(qcow2_header(2, MIB)) == "qcow2"
+
+
+def test_vmdk_header(tmp_path):
+    sparse = struct.pack("<4sIIQ", main.VMDK_SPARSE_MAGIC, 1, 3, 2 * 1024 * 1024).ljust(512, b"\0")
+    (tmp_path / "sparse.vmdk").write_bytes(sparse)
+    assert main.inspect_image(str(tmp_path / "sparse.vmdk"))["virtual_size"] == 1024 ** 3
+    descriptor = b'# Disk DescriptorFile\nversion=1\nRW 2048 SPARSE "a.vmdk"\nRW 2048 SPARSE "b.vmdk"\n'
+    (tmp_path / "text.vmdk").write_bytes(descriptor)
+    info = main.inspect_image(str(tmp_path / "text.vmdk"))
+    assert info["format"] == "vmdk" and info["virtual_size"] == 2 * MIB
+
+
+def test_drive_format_only_for_identified_images(tmp_path):
+    (tmp_path / "disk.qcow2").write_bytes(qcow2_header(3, MIB))
+    (tmp_path / "old.qcow").write_bytes(qcow2_header(1, MIB))
+    (tmp_path / "disk.raw").write_bytes(b"\0" * 4096)
+    cfg = {"name": "fmt", "hda": str(tmp_path / "disk.qcow2"), "hdb": str(tmp_path / "old.qcow"),
+           "hdc": str(tmp_path / "disk.raw")}
+    args = main.build_command(cfg)
+    assert any(arg.startswith(f"file={tmp_path / 'disk.qcow2'},format=qcow2,index=0") for arg in args)
+    assert args[args.index("-hdb") + 1] == str(tmp_path / "old.qcow")
+    assert args[args.index("-hdc") + 1] == str(tmp_path / "disk.raw")
+
+
+def test_image_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "IMAGE_CACHE_SIZE", 8)
+    for i in range(20):
+        (tmp_path / f"{i}.img").write_bytes(b"\0" * 512)
+        main.inspect_image(str(tmp_path / f"{i}.img"))
+    assert len(main._image_info_cache) <= 8
+    assert str(tmp_path / "19.img") in main._image_info_cache
+
+
+def test_qemu_img_queue_order_and_parallelism(qapp, tmp_path):
+    # Stand-in qemu-img: reports progress, fails for "fail"
+    fake = tmp_path / "qemu-img"
+    fake.write_text('#!/bin/sh\necho "    (50.00/100%)"\nsleep 0.2\n[ "$2" != fail ]\n')
+    fake.chmod(0o755)
+    queue = main.QemuImgQueue(str(fake), max_parallel=2)
+    peak = []
+    started = []
+
+    def changed(job_id):
+        peak.append(len(queue.running))
+        if queue.jobs[job_id].state == "running" and job_id not in started:
+            started.append(job_id)
+
+    queue.job_changed.connect(changed)
+    ids = [queue.submit(["check", name]) for name in ("a", "b", "c", "fail", "e", "f")]
+    queue.cancel(ids[-1])
+    deadline = time.monotonic() + 10
+    while (queue.running or queue.pending) and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    states = [queue.jobs[job_id].state for job_id in ids]
+    assert states == ["done", "done", "done", "failed", "done", "cancelled"]
+    assert max(peak) == 2
+    assert started == ids[:5]
+    assert queue.jobs[ids[0]].progress == 100.0
@@ -0,0 +1,148 @@
+# Supervised VMs: warm pool copies, bulk launch admission and restart policies
+import main
+from conftest import sample_config
+
+
+def pooled(qapp, **values):
+    pool = main.WarmPool(main.VmSupervisor())
+    pool.cfg = dict(sample_config("pooled", 1), snapshot=True, vnc=":5", **values)
+    return pool
+
+
+def test_pool_copies_get_distinct_ports(qapp):
+    pool = pooled(qapp)
+    (name1, cfg1), (name2, cfg2) = pool.instance_config(), pool.instance_config()
+    assert name1 != name2
+    assert cfg1["name"] == cfg2["name"] == "pooled"
+    assert len({pool.cfg["hostfwd"], cfg1["hostfwd"], cfg2["hostfwd"]}) == 3
+    assert len({pool.cfg["vnc"], cfg1["vnc"], cfg2["vnc"]}) == 3
+    assert cfg2["hostfwd"] == "tcp::2203-:22" and cfg2["vnc"] == ":7"
+
+
+def test_pool_refuses_non_snapshot_configs(qapp):
+    pool = main.WarmPool(main.VmSupervisor())
+    messages = []
+    pool.status_changed.connect(messages.append)
+    pool.configure(dict(sample_config("disk", 1), snapshot=False), 2)
+    assert pool.size == 0 and "Snapshot" in messages[-1]
+    assert not pool.matches(dict(sample_config("disk", 1), snapshot=False))
+
+
+def host(**values):
+    resources = {"mem_available_mb": 8192, "mem_total_mb": 16384, "hugepages_free_mb": 0,
+                 "hugepages_total_mb": 0, "cpu_count": 8, "load1": 0.0}
+    resources.update(values)
+    return resources
+
+
+class FakeVm:
+    def __init__(self, cfg):
+        self.name = main.instance_name(cfg)
+        self.cfg = cfg
+
+
+def scheduler_with(monkeypatch, resources):
+    supervisor = main.VmSupervisor()
+    scheduler = main.BulkLaunchScheduler(supervisor)
+    scheduler.stagger_ms = 0
+    launched = []
+
+    def launch(cfg, extra_args=(), restart=False):
+        vm = FakeVm(cfg)
+        supervisor.instances[vm.name] = vm
+        launched.append(vm.name)
+        return vm
+
+    monkeypatch.setattr(supervisor, "launch", launch)
+    monkeypatch.setattr(main, "host_resources", lambda: resources)
+    return scheduler, launched
+
+
+def test_admission_counts_booting_guests(qapp, monkeypatch):
+    scheduler, launched = scheduler_with(monkeypatch, host(mem_available_mb=6144))
+    # 6 GiB free, 1 GiB reserve: two 2 GiB guests fit, the third waits for the first ones to settle
+    scheduler.enqueue(main.instance_configs(dict(sample_config("bulk", 1), ram=2048, smp=1), 3))
+    for _ in range(5):
+        scheduler.tick()
+    assert launched == ["bulk-1", "bulk-2"] and len(scheduler.queue) == 1
+    scheduler.booting.clear()
+    scheduler.tick()
+    assert launched == ["bulk-1", "bulk-2", "bulk-3"]
+    scheduler.timer.stop()
+
+
+def test_admission_limits_concurrent_boots(qapp, monkeypatch):
+    scheduler, launched = scheduler_with(monkeypatch, host(mem_available_mb=65536, mem_total_mb=65536))
+    scheduler.max_concurrent_boots = 2
+    scheduler.enqueue(main.instance_configs(dict(sample_config("bulk", 1), ram=512, smp=1), 4))
+    for _ in range(5):
+        scheduler.tick()
+    assert len(launched) == 2 and len(scheduler.queue) == 2
+    scheduler.timer.stop()
+
+
+def test_entries_that_never_fit_are_skipped(qapp, monkeypatch):
+    scheduler, launched = scheduler_with(monkeypatch, host())
+    messages = []
+    scheduler.status_changed.connect(messages.append)
+    scheduler.enqueue([dict(sample_config("huge", 1), ram=65536), dict(sample_config("bad", 1), ram="lots"),
+                       dict(sample_config("ok", 1), ram=1024)])
+    for _ in range(5):
+        scheduler.tick()
+    assert launched == ["ok"] and scheduler.failed == 2
+    assert "huge:" in messages[-1] and "bad:" in messages[-1]
+    scheduler.timer.stop()
+
+
+def test_single_instance_runs_in_the_foreground():
+    cfg = dict(sample_config("one", 1), daemonize=True, pidfile="/run/one.pid")
+    (inst,) = main.instance_configs(cfg, 1)
+    assert inst["daemonize"] is False and inst["pidfile"] == "" and inst["name"] == "one"
+
+
+def test_restart_policy_gives_up_on_crash_loops():
+    policy = main.RestartPolicy("always", max_restarts=3, window=100)
+    assert all(policy.next_delay(1, True, 1.0, now=t) is not None for t in (0, 10, 20))
+    assert policy.next_delay(1, True, 1.0, now=30) is None and policy.crash_loop
+    # Once the first crash leaves the window the VM may restart again
+    assert policy.next_delay(1, True, 1.0, now=105) is not None and not policy.crash_loop
+    assert len(policy.restarts) == 3
+
+
+def test_restart_policy_backoff():
+    policy = main.RestartPolicy.from_config({"restart_policy": "on-failure"})
+    assert policy.next_delay(0, False, 1.0, now=0) is None
+    delays = [policy.next_delay(1, False, 1.0, now=t) for t in range(4)]
+    for attempt, delay in enumerate(delays):
+        assert 2 ** attempt / 2 <= delay <= 2 ** attempt
+    # A VM that stayed up long enough starts over with the shortest delay
+    assert policy.next_delay(1, False, main.RESTART_STABLE_AFTER, now=5) <= 1.0
+    assert main.RestartPolicy("sometimes").policy == "never"
+
+
+def test_queued_restart_is_dropped_on_cancel(qapp, monkeypatch):
+    # Not enough free RAM right now: the restart waits in the queue
+    scheduler, launched = scheduler_with(monkeypatch, host(mem_available_mb=1024))
+    vm = FakeVm(dict(sample_config("service", 1), ram=2048))
+    vm.extra_args = ()
+    scheduler.supervisor.restart(vm)
+    assert [entry[2] for entry in scheduler.queue] == [True] and not launched
+    scheduler.supervisor.cancel_restart("service")
+    assert not scheduler.queue
+    scheduler.timer.stop()
+
+
+def test_failed_restart_is_not_a_second_exit(qapp, monkeypatch):
+    supervisor = main.VmSupervisor()
+    finished, output = [], []
+    supervisor.instance_finished.connect(lambda name, code: finished.append(name))
+    supervisor.instance_output.connect(lambda name, text: output.append(text))
+
+    def launch(cfg, extra_args=(), restart=False):
+        raise RuntimeError("QEMU binary not found")
+
+    monkeypatch.setattr(supervisor, "launch", launch)
+    vm = FakeVm(sample_config("service", 1))
+    vm.extra_args = ()
+    supervisor.restart(vm)
+    assert finished == [] and output == ["Restart failed: QEMU binary not found"]
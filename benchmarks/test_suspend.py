@@ -0,0 +1,122 @@
+# Suspend to file and internal snapshots: saved state matching, the exec: writer handshake, QMP jobs
+import json
+import struct
+import subprocess
+import threading
+
+import pytest
+
+import main
+from conftest import sample_config
+
+
+def test_saved_state_matches_fingerprint(tmp_path):
+    cfg = sample_config("sleepy", 1)
+    state = tmp_path / "sleepy" / main.SUSPEND_STATE_FILE
+    assert main.saved_state_for(tmp_path, cfg) is None
+    state.parent.mkdir()
+    state.write_bytes(b"RAM")
+    # Without metadata there is nothing to prove the state belongs to this config
+    assert main.saved_state_for(tmp_path, cfg)[2] is False
+    with open(main.state_meta_path(state), "w", encoding='utf-8') as f:
+        json.dump({"kind": "exec", "fingerprint": main.config_fingerprint(cfg)}, f)
+    assert main.saved_state_for(tmp_path, cfg)[2] is True
+    assert main.saved_state_for(tmp_path, dict(cfg, ram=cfg["ram"] * 2))[2] is False
+    assert main.saved_state_for(tmp_path, dict(cfg, snapshot=True)) is None
+
+
+@pytest.mark.parametrize("writer, ok", [("gzip -1", True), ("false", False)])
+def test_exec_writer_reports_exit_status(tmp_path, writer, ok):
+    partial, status = tmp_path / "suspend.partial", tmp_path / "suspend.status"
+    command = main.exec_writer_command(writer, partial, status)
+    subprocess.run(["sh", "-c", command], input=b"x" * 100000, check=True)
+    if ok:
+        main.wait_writer(status, timeout=5)
+        assert subprocess.run(["gzip", "-dc", str(partial)], capture_output=True).stdout == b"x" * 100000
+    else:
+        with pytest.raises(main.QmpError):
+            main.wait_writer(status, timeout=5)
+
+
+def test_wait_writer_waits_for_the_writer(tmp_path):
+    status = tmp_path / "suspend.status"
+    threading.Timer(0.3, lambda: status.write_text("0\n")).start()
+    main.wait_writer(status, timeout=5)
+    with pytest.raises(main.QmpError):
+        main.wait_writer(tmp_path / "never.status", timeout=0.2)
+
+
+def test_language_codes_cover_every_language(window):
+    for index in range(window.f_lang.count()):
+        window.f_lang.setCurrentIndex(index)
+        assert window.lang_code() in window.lang_data
+    window.f_lang.setCurrentIndex(0)
+
+
+class FakeQmp:
+    # Answers query-block from a fixed list and runs one job through the given states
+    def __init__(self, block=(), states=(), error=None):
+        self.block = list(block)
+        self.states = list(states)
+        self.error = error
+        self.job_id = None
+        self.sent = []
+
+    def execute(self, command, arguments=None):
+        self.sent.append((command, arguments))
+        if command == "query-block":
+            return self.block
+        if command == "query-jobs":
+            if not self.states:
+                return []
+            status = self.states.pop(0)
+            job = {"id": self.job_id, "status": status, "current-progress": 1, "total-progress": 4}
+            if status == "concluded" and self.error:
+                job["error"] = self.error
+            return [job]
+        if arguments and "job-id" in arguments:
+            self.job_id = arguments["job-id"]
+        return {}
+
+
+BLOCK = [
+    {"device": "cd0", "inserted": {"node-name": "cd", "ro": True, "drv": "raw"}},
+    {"device": "ide0-hd0", "inserted": {"node-name": "disk0", "ro": False, "drv": "qcow2", "image": {
+        "snapshots": [{"id": "1", "name": "clean", "date-sec": 100, "vm-clock-sec": 2, "vm-clock-nsec": 5,
+                       "vm-state-size": 4096}]}}},
+    {"device": "ide0-hd1", "inserted": {"node-name": "raw1", "ro": False, "drv": "raw"}},
+]
+
+
+def test_snapshot_targets_writable_qcow2_disks():
+    client = FakeQmp(BLOCK)
+    assert [node["node-name"] for node in main.writable_block_nodes(client)] == ["disk0"]
+    assert main.live_snapshot_list(client) == [
+        {"id": "1", "name": "clean", "date": 100, "vm_clock_ns": 2_000_000_005, "vm_state_size": 4096}]
+
+
+def test_qmp_job_reports_progress_and_dismisses():
+    client = FakeQmp(states=["running", "running", "concluded"])
+    progress = []
+    main.run_qmp_job(client, "snapshot-save", {"tag": "t"}, progress.append)
+    assert progress == [25, 25, 25]
+    assert client.sent[-1] == ("job-dismiss", {"id": client.job_id})
+
+
+def test_qmp_job_error_is_raised():
+    client = FakeQmp(states=["concluded"], error="no space")
+    with pytest.raises(main.QmpError, match="no space"):
+        main.run_qmp_job(client, "snapshot-load", {"tag": "t"})
+    assert ("job-dismiss", {"id": client.job_id}) in client.sent
+
+
+def test_qcow2_snapshot_table(tmp_path):
+    # Header with one snapshot at 4096: fixed 40-byte entry, 16 bytes of extra data, id and name
+    header = struct.pack(">4sIQIIQI", main.QCOW2_MAGIC, 3, 0, 0, 16, 1 << 30, 0)
+    header += struct.pack(">IQQIIQ", 0, 0, 0, 0, 1, 4096)
+    header += struct.pack(">QQQII", 0, 0, 0, 4, 104) + struct.pack(">II", 0, 0)
+    entry = struct.pack(">QIHHIIQII", 0, 0, 1, 6, 1700000000, 0, 3_000_000_000, 0, 16)
+    entry += struct.pack(">QQ", 123456, 0) + b"1" + b"before"
+    (tmp_path / "disk.qcow2").write_bytes(header.ljust(4096, b"\0") + entry.ljust(512, b"\0"))
+    assert main.list_qcow2_snapshots(str(tmp_path / "disk.qcow2")) == [
+        {"id": "1", "name": "before", "date": 1700000000, "vm_clock_ns": 3_000_000_000, "vm_state_size": 123456}]
@@ -0,0 +1,32 @@
+# Template registry: a large user template directory with inheritance chains
+import json
+
+import main
+
+TEMPLATES = 500
+
+
+def write_templates(folder):
+    folder.mkdir()
+    for i in range(TEMPLATES):
+        # Every third template extends the previous one, the rest extend a built-in
+        base = f"team-{i - 1:04d}" if i % 3 else ["Debian Linux", "Fedora Linux", "Windows 10/11"][i % 9 // 3]
+        template = {"extends": base, "tags": [f"team{i % 20}", "internal"],
+                    "config": {"name": f"team-{i:04d}", "ram": 1024 + i, "arch": "aarch64" if i % 5 == 0 else "x86_64"}}
+        with open(folder / f"team-{i:04d}.json", "w", encoding='utf-8') as f:
+            json.dump(template, f)
+    return folder
+
+
+def test_template_index_cold(benchmark, tmp_path):
+    folder = write_templates(tmp_path / "templates")
+    names = benchmark(lambda: main.TemplateRegistry(folder).find("team1", arch="x86_64"))
+    assert names and all(n.startswith("team-") for n in names)
+
+
+def test_template_lookup_warm(benchmark, tmp_path):
+    registry = main.TemplateRegistry(write_templates(tmp_path / "templates"))
+    registry.find()
+    template = benchmark(registry.get, f"team-{TEMPLATES - 1:04d}")
+    assert template["config"]["ram"] == 1024 + TEMPLATES - 1
+    assert "internal" in template["tags"]
@@ -1,20 +1,4248 @@
+import argparse
+import errno
+import hashlib
 import json
+import mmap
+import os
 import platform
+import queue
+import random
+import re
 import shlex
 import shutil
+import signal
+import socket
+import struct
+import subprocess
 import sys
+import tarfile
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from json import JSONDecodeError
 from pathlib import Path
 
-from PySide6.QtCore import QProcess
-from PySide6.QtGui import QPalette
+from PySide6.QtCore import QCoreApplication, QObject, QProcess, QThread, QTimer, Qt, Signal
+from PySide6.QtGui import QKeySequence, QPalette, QShortcut
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLineEdit, QPushButton, QLabel, QFileDialog, QSpinBox, QListWidget,
     QMessageBox, QPlainTextEdit, QTabWidget, QComboBox, QFormLayout,
-    QScrollArea, QCheckBox
+    QScrollArea, QCheckBox, QInputDialog, QProgressDialog, QTableWidget,
+    QTableWidgetItem, QHeaderView, QProgressBar, QDialog
 )
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import psutil
+except ImportError:  # optional, only used for host stats
+    psutil = None
+
+
+# Sparse / reflink aware copying of VM folders
+FICLONE = 0x40049409
+COPY_CHUNK = 8 * 1024 * 1024
+
+
+class CopyCancelled(Exception):
+    pass
+
+
+def data_extents(fd, size):
+    # Allocated (offset, length) regions of a file; the whole file if the FS can't tell
+    if size == 0:
+        return []
+    if not hasattr(os, "SEEK_DATA"):
+        return [(0, size)]
+    extents = []
+    pos = 0
+    while pos < size:
+        try:
+            start = os.lseek(fd, pos, os.SEEK_DATA)
+        except OSError as exc:
+            if exc.errno == errno.ENXIO:
+                break  # only a hole is left
+            if exc.errno in (errno.EINVAL, errno.EOPNOTSUPP) and not extents:
+                return [(0, size)]
+            raise
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        extents.append((start, end - start))
+        pos = end
+    return extents
+
+
+def allocated_size(path):
+    st = os.stat(path)
+    if hasattr(st, "st_blocks"):
+        return min(st.st_size, st.st_blocks * 512)
+    return st.st_size
+
+
+def _copy_range(src_fd, dst_fd, offset, length, progress, cancel):
+    use_cfr = hasattr(os, "copy_file_range")
+    end = offset + length
+    while offset < end:
+        if cancel is not None and cancel.is_set():
+            raise CopyCancelled()
+        n = min(COPY_CHUNK, end - offset)
+        copied = 0
+        if use_cfr:
+            try:
+                copied = os.copy_file_range(src_fd, dst_fd, n, offset, offset)
+            except OSError as exc:
+                if exc.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                use_cfr = False
+        if not use_cfr:
+            buf = os.pread(src_fd, n, offset)
+            copied = os.pwrite(dst_fd, buf, offset) if buf else 0
+        if copied <= 0:
+            break  # source shrank under us
+        offset += copied
+        if progress:
+            progress(copied)
+
+
+def copy_sparse_file(src, dst, progress=None, cancel=None):
+    # Try a reflink first, then copy only the allocated extents so holes stay holes
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                    if progress:
+                        progress(allocated_size(src))
+                    return "reflink"
+                except OSError:
+                    pass
+            os.ftruncate(dst_fd, size)
+            for offset, length in data_extents(src_fd, size):
+                _copy_range(src_fd, dst_fd, offset, length, progress, cancel)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dst)
+    return "sparse"
+
+
+def copy_vm_tree(src_dir, dst_dir, progress=None, cancel=None):
+    src_dir, dst_dir = Path(src_dir), Path(dst_dir)
+    dst_dir.mkdir(parents=True)
+    for root, dirs, files in os.walk(src_dir):
+        rel = Path(root).relative_to(src_dir)
+        for name in dirs:
+            (dst_dir / rel / name).mkdir(exist_ok=True)
+        for name in files:
+            src = Path(root) / name
+            dst = dst_dir / rel / name
+            if src.is_symlink():
+                os.symlink(os.readlink(src), dst)
+            else:
+                copy_sparse_file(src, dst, progress, cancel)
+
+
+def tree_allocated_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            p = os.path.join(root, name)
+            if not os.path.islink(p):
+                total += allocated_size(p)
+    return total
+
+
+class _SparseMemberReader:
+    # File-like object tarfile reads a PAX 1.0 sparse member body from:
+    # the decimal sparse map padded to a block, then only the data extents.
+    def __init__(self, fd, extents, size, progress, cancel):
+        lines = [str(len(extents))]
+        for offset, length in extents:
+            lines += [str(offset), str(length)]
+        header = ("\n".join(lines) + "\n").encode()
+        header += b"\0" * (-len(header) % tarfile.BLOCKSIZE)
+        self.header = header
+        self.fd = fd
+        self.extents = [e for e in extents if e[1]]
+        self.progress = progress
+        self.cancel = cancel
+        self.data_size = sum(length for _, length in self.extents)
+
+    def read(self, n):
+        # tarfile expects full reads, so keep filling across the map/extent boundaries
+        if self.cancel is not None and self.cancel.is_set():
+            raise CopyCancelled()
+        parts = []
+        if self.header:
+            parts.append(self.header[:n])
+            self.header = self.header[n:]
+            n -= len(parts[0])
+        while n > 0 and self.extents:
+            offset, length = self.extents[0]
+            chunk = os.pread(self.fd, min(n, length), offset)
+            if not chunk:
+                break
+            if len(chunk) < length:
+                self.extents[0] = (offset + len(chunk), length - len(chunk))
+            else:
+                self.extents.pop(0)
+            if self.progress:
+                self.progress(len(chunk))
+            parts.append(chunk)
+            n -= len(chunk)
+        return b"".join(parts)
+
+
+def export_vm_tar(src_dir, target, progress=None, cancel=None):
+    # target is a path or a writable stream; sparse files are stored as GNU PAX 1.0 sparse members
+    src_dir = Path(src_dir)
+    if hasattr(target, "write"):
+        tar = tarfile.open(fileobj=target, mode="w|", format=tarfile.PAX_FORMAT)
+    else:
+        tar = tarfile.open(target, "w", format=tarfile.PAX_FORMAT)
+    with tar:
+        for root, dirs, files in os.walk(src_dir):
+            dirs.sort()
+            rel_root = Path(src_dir.name) / Path(root).relative_to(src_dir)
+            tar.add(root, arcname=rel_root.as_posix(), recursive=False)
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                arcname = (rel_root / name).as_posix()
+                if os.path.islink(path):
+                    tar.add(path, arcname=arcname)
+                    continue
+                info = tar.gettarinfo(path, arcname=arcname)
+                fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+                try:
+                    extents = data_extents(fd, info.size)
+                    if sum(length for _, length in extents) < info.size:
+                        if not extents or sum(extents[-1]) < info.size:
+                            extents.append((info.size, 0))
+                        reader = _SparseMemberReader(fd, extents, info.size, progress, cancel)
+                        info.pax_headers = {
+                            "GNU.sparse.major": "1",
+                            "GNU.sparse.minor": "0",
+                            "GNU.sparse.name": arcname,
+                            "GNU.sparse.realsize": str(info.size),
+                        }
+                        info.name = f"{rel_root.as_posix()}/GNUSparseFile.0/{name}"
+                        info.size = len(reader.header) + reader.data_size
+                    else:
+                        reader = _SparseMemberReader(fd, extents, info.size, progress, cancel)
+                        reader.header = b""
+                    tar.addfile(info, reader)
+                finally:
+                    os.close(fd)
+
+
+class VmCopyWorker(QThread):
+    progress = Signal(object, object)
+    done = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, mode, src_dir, target, parent=None):
+        super().__init__(parent)
+        self.mode = mode
+        self.src_dir = Path(src_dir)
+        self.target = target
+        self.cancel_event = threading.Event()
+        self.total = 0
+        self.copied = 0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def on_chunk(self, n):
+        self.copied += n
+        self.progress.emit(self.copied, self.total)
+
+    def run(self):
+        if Path(self.target).exists():
+            self.failed.emit(f"Target already exists: {self.target}")
+            return
+        try:
+            self.total = tree_allocated_size(self.src_dir)
+            if self.mode == "clone":
+                copy_vm_tree(self.src_dir, self.target, self.on_chunk, self.cancel_event)
+            else:
+                export_vm_tar(self.src_dir, self.target, self.on_chunk, self.cancel_event)
+            self.done.emit(str(self.target))
+        except CopyCancelled:
+            self.cleanup()
+            self.failed.emit("Cancelled")
+        except (OSError, tarfile.TarError) as exc:
+            self.cleanup()
+            self.failed.emit(str(exc))
+
+    def cleanup(self):
+        target = Path(self.target)
+        try:
+            if self.mode == "clone" and target.is_dir():
+                shutil.rmtree(target)
+            elif self.mode == "export" and target.is_file():
+                target.unlink()
+        except OSError as exc:
+            print(f"Cleanup error: {exc}")
+
+
+# Native disk image inspection (no qemu-img)
+QCOW2_MAGIC = b"QFI\xfb"
+QCOW2_EXT_BACKING_FORMAT = 0xE2792ACA
+QCOW2_EXT_END = 0
+VMDK_SPARSE_MAGIC = b"KDMV"
+MAX_BACKING_DEPTH = 32
+IMAGE_CACHE_SIZE = 4096
+# Formats recognised by their own header; only these are named in -drive format=.
+# Anything else (raw included: no magic is not proof of raw) is left to QEMU's probing.
+DRIVE_FORMATS = ("qcow2", "qed", "vmdk", "vhdx", "vpc", "vdi")
+_image_info_cache = OrderedDict()
+
+
+def format_size(num):
+    for unit in ["B", "KiB", "MiB", "GiB", "TiB"]:
+        if abs(num) < 1024 or unit == "TiB":
+            return f"{num:.0f} {unit}" if unit == "B" else f"{num:.1f} {unit}"
+        num /= 1024
+
+
+def detect_image_format(buf):
+    # buf is a bytes-like view of the start of the file (mmap works too)
+    if buf[:4] == QCOW2_MAGIC:
+        # qcow (version 1) shares the magic but not the header layout
+        return "qcow2" if len(buf) >= 8 and struct.unpack_from(">I", buf, 4)[0] >= 2 else "qcow"
+    if buf[:4] == b"QED\0":
+        return "qed"
+    if buf[:4] == VMDK_SPARSE_MAGIC or buf[:21] == b"# Disk DescriptorFile":
+        return "vmdk"
+    if buf[:8] == b"vhdxfile":
+        return "vhdx"
+    if buf[:8] == b"conectix":
+        return "vpc"
+    if len(buf) >= 0x44 and buf[0x40:0x44] == b"\x7f\x10\xda\xbe":
+        return "vdi"
+    if len(buf) >= 0x8006 and buf[0x8001:0x8006] == b"CD001":
+        return "iso"
+    return "raw"
+
+
+def _parse_qcow2(buf, info):
+    (version,) = struct.unpack_from(">I", buf, 4)
+    backing_offset, backing_size, cluster_bits, virtual_size, crypt_method = struct.unpack_from(">QIIQI", buf, 8)
+    nb_snapshots, snapshots_offset = struct.unpack_from(">IQ", buf, 60)
+    info["virtual_size"] = virtual_size
+    info["cluster_size"] = 1 << cluster_bits
+    info["encrypted"] = crypt_method != 0
+    info["qcow2_version"] = version
+    info["snapshot_count"] = nb_snapshots
+    info["snapshots_offset"] = snapshots_offset
+    if backing_offset and backing_size:
+        info["backing_file"] = bytes(buf[backing_offset:backing_offset + backing_size]).decode(errors="replace")
+
+    # Header extensions start right after the fixed header
+    pos = 72 if version < 3 else struct.unpack_from(">I", buf, 100)[0]
+    limit = backing_offset or info["cluster_size"]
+    while pos + 8 <= min(limit, len(buf)):
+        ext_type, ext_len = struct.unpack_from(">II", buf, pos)
+        if ext_type == QCOW2_EXT_END:
+            break
+        if ext_type == QCOW2_EXT_BACKING_FORMAT:
+            info["backing_format"] = bytes(buf[pos + 8:pos + 8 + ext_len]).decode(errors="replace")
+        pos += 8 + ((ext_len + 7) & ~7)
+
+
+def _parse_vmdk(buf, info):
+    if buf[:4] == VMDK_SPARSE_MAGIC:
+        (capacity,) = struct.unpack_from("<Q", buf, 12)
+        info["virtual_size"] = capacity * 512
+        return
+    # Text descriptor: sum the extent lines ("RW 4192256 SPARSE "disk-s001.vmdk"")
+    sectors = 0
+    for line in bytes(buf[:65536]).decode(errors="replace").splitlines():
+        parts = line.split()
+        if len(parts) >= 3 and parts[0] in ("RW", "RDONLY", "NOACCESS") and parts[1].isdigit():
+            sectors += int(parts[1])
+    info["virtual_size"] = sectors * 512
+
+
+def _inspect_one(path):
+    st = os.stat(path)
+    info = {
+        "path": str(path),
+        "format": "raw",
+        "virtual_size": st.st_size,
+        "file_size": st.st_size,
+        "allocated_size": allocated_size(path),
+        "backing_file": "",
+        "backing_format": "",
+    }
+    if st.st_size == 0:
+        return info
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        head = memoryview(mm)[:min(st.st_size, 1024 * 1024)]
+        try:
+            info["format"] = detect_image_format(head)
+            if info["format"] == "qcow2":
+                _parse_qcow2(head, info)
+            elif info["format"] == "vmdk":
+                _parse_vmdk(head, info)
+        finally:
+            head.release()
+    return info
+
+
+def inspect_image(path, _depth=0):
+    # Cached by path + mtime + size, so annotating a large library only costs a stat() per disk
+    path = os.path.expanduser(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _image_info_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        _image_info_cache.move_to_end(path)
+        return cached[1]
+    try:
+        info = _inspect_one(path)
+    except (OSError, ValueError, struct.error) as exc:
+        print(f"Image inspect error: {exc}")
+        return None
+
+    chain = []
+    if info["backing_file"] and _depth < MAX_BACKING_DEPTH:
+        backing = Path(info["backing_file"])
+        if not backing.is_absolute():
+            backing = Path(path).parent / backing
+        parent = inspect_image(backing, _depth + 1)
+        if parent is not None:
+            chain = [parent] + parent["chain"]
+            if not info["backing_format"]:
+                info["backing_format"] = parent["format"]
+    info["chain"] = chain
+    _image_info_cache[path] = (stamp, info)
+    _image_info_cache.move_to_end(path)
+    while len(_image_info_cache) > IMAGE_CACHE_SIZE:
+        _image_info_cache.popitem(last=False)
+    return info
+
+
+_snapshot_cache = {}
+
+
+def list_qcow2_snapshots(path):
+    # Reads the qcow2 snapshot table directly; cached per path until mtime/size change
+    info = inspect_image(path)
+    if info is None or info["format"] != "qcow2":
+        return []
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _snapshot_cache.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    snapshots = []
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = info["snapshots_offset"]
+            for _ in range(info["snapshot_count"]):
+                (_l1_offset, _l1_size, id_len, name_len, date_sec, _date_nsec,
+                 vm_clock_ns, vm_state_size, extra_len) = struct.unpack_from(">QIHHIIQII", mm, pos)
+                extra = pos + 40
+                if extra_len >= 8:
+                    (vm_state_size,) = struct.unpack_from(">Q", mm, extra)
+                strings = extra + extra_len
+                snapshots.append({
+                    "id": mm[strings:strings + id_len].decode(errors="replace"),
+                    "name": mm[strings + id_len:strings + id_len + name_len].decode(errors="replace"),
+                    "date": date_sec,
+                    "vm_clock_ns": vm_clock_ns,
+                    "vm_state_size": vm_state_size,
+                })
+                pos = strings + id_len + name_len
+                pos += -(pos - info["snapshots_offset"]) % 8
+    except (OSError, ValueError, struct.error) as exc:
+        print(f"Snapshot table error: {exc}")
+        return []
+    _snapshot_cache[str(path)] = (stamp, snapshots)
+    return snapshots
+
+
+def describe_image(info):
+    text = f"{info['format']}, {format_size(info['virtual_size'])} virtual, {format_size(info['allocated_size'])} allocated"
+    if info["backing_file"]:
+        text += f", backing: {' -> '.join(Path(p['path']).name for p in info['chain']) or info['backing_file']}"
+    return text
+
+
+def drive_file_escape(path):
+    # -drive option values escape commas by doubling them
+    return str(path).replace(",", ",,")
+
+
+# Background qemu-img jobs
+QEMU_IMG_PROGRESS_RE = re.compile(r"\((\d+(?:\.\d+)?)/100%\)")
+QEMU_IMG_OPS = ["create", "convert", "resize", "snapshot", "check"]
+
+
+def qemu_img_path(qemu_bin=""):
+    # qemu-img normally sits next to qemu-system-*
+    exe = "qemu-img.exe" if platform.system() == "Windows" else "qemu-img"
+    if qemu_bin and (Path(qemu_bin).parent != Path(".")):
+        sibling = Path(qemu_bin).parent / exe
+        if sibling.exists():
+            return str(sibling)
+    return shutil.which(exe) or exe
+
+
+def qemu_img_args(op, path, target="", fmt="qcow2", size="", tag="", snapshot_action="-c", compress=False):
+    if op == "create":
+        return ["create", "-f", fmt, path, size]
+    if op == "convert":
+        args = ["convert", "-p", "-W", "-m", "8", "-O", fmt]
+        if compress:
+            args.append("-c")
+        return args + [path, target]
+    if op == "resize":
+        return ["resize", path, size]
+    if op == "snapshot":
+        return ["snapshot"] + ([snapshot_action, tag] if snapshot_action != "-l" else ["-l"]) + [path]
+    if op == "check":
+        return ["check", path]
+    raise ValueError(f"Unknown qemu-img operation: {op}")
+
+
+class QemuImgJob:
+    def __init__(self, job_id, args, label):
+        self.job_id = job_id
+        self.args = args
+        self.label = label
+        self.state = "queued"
+        self.progress = -1.0  # -1 while qemu-img doesn't report progress
+        self.output = ""
+        self.process = None
+
+
+class QemuImgQueue(QObject):
+    job_added = Signal(int)
+    job_changed = Signal(int)
+    job_finished = Signal(int)
+
+    def __init__(self, qemu_img="qemu-img", max_parallel=2, parent=None):
+        super().__init__(parent)
+        self.qemu_img = qemu_img
+        self.max_parallel = max_parallel
+        self.jobs = {}
+        self.pending = deque()
+        self.running = set()
+        self.next_id = 1
+
+    def submit(self, args, label=""):
+        job = QemuImgJob(self.next_id, list(args), label or " ".join(args[:2]))
+        self.next_id += 1
+        self.jobs[job.job_id] = job
+        self.pending.append(job.job_id)
+        self.job_added.emit(job.job_id)
+        self.pump()
+        return job.job_id
+
+    def set_max_parallel(self, value):
+        self.max_parallel = max(1, value)
+        self.pump()
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if job.state == "queued":
+            self.pending.remove(job_id)
+            job.state = "cancelled"
+            self.job_finished.emit(job_id)
+        elif job.state == "running":
+            job.state = "cancelled"
+            job.process.kill()
+
+    def cancel_all(self):
+        for job_id in list(self.pending) + list(self.running):
+            self.cancel(job_id)
+
+    def pump(self):
+        while self.pending and len(self.running) < self.max_parallel:
+            job = self.jobs[self.pending.popleft()]
+            proc = QProcess(self)
+            proc.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+            proc.readyReadStandardOutput.connect(lambda j=job: self.on_output(j))
+            proc.finished.connect(lambda code, _status, j=job: self.on_finished(j, code))
+            proc.errorOccurred.connect(lambda err, j=job: self.on_error(j, err))
+            job.process = proc
+            job.state = "running"
+            self.running.add(job.job_id)
+            proc.start(self.qemu_img, job.args)
+            self.job_changed.emit(job.job_id)
+
+    def on_output(self, job):
+        text = job.process.readAllStandardOutput().data().decode(errors='replace')
+        matches = QEMU_IMG_PROGRESS_RE.findall(text)
+        if matches:
+            job.progress = float(matches[-1])
+        text = QEMU_IMG_PROGRESS_RE.sub("", text).replace("\r", "").strip()
+        if text:
+            job.output += text + "\n"
+        self.job_changed.emit(job.job_id)
+
+    def on_error(self, job, error):
+        if error == QProcess.ProcessError.FailedToStart:
+            job.output += f"Failed to start {self.qemu_img}: {job.process.errorString()}\n"
+            self.finish(job, "failed")
+
+    def on_finished(self, job, code):
+        if job.state == "running":
+            self.finish(job, "done" if code == 0 else "failed")
+        else:
+            self.finish(job, job.state)
+
+    def finish(self, job, state):
+        if job.job_id not in self.running:
+            return
+        self.running.discard(job.job_id)
+        job.state = state
+        if state == "done":
+            job.progress = 100.0
+        job.process.deleteLater()
+        job.process = None
+        self.job_finished.emit(job.job_id)
+        self.pump()
+
+
+# Command line generation
+ARCH_MAP = {
+    "x86_64": "x86_64",
+    "i386": "i386",
+    "Arm (64-bit)": "aarch64",
+    "Arm (32-bit)": "arm",
+    "RISC-V (64-bit)": "riscv64",
+    "RISC-V (32-bit)": "riscv32"
+}
+
+# Values offered by the fixed (non-editable) combo boxes
+MACHINE_TYPES = ["q35", "pc", "virt", "microvm"]
+BOOT_ORDERS = ["", "a (Floppy)", "c (Hard Disk)", "d (CD-ROM)", "n (Network)"]
+NET_TYPES = ["user", "tap", "bridge", "socket", "stream", "vde", "none"]
+NET_DEVICES = ["virtio-net-pci", "e1000", "rtl8139", "pcnet", "vmxnet3"]
+DISPLAYS = ["gtk", "sdl", "curses", "spice-app", "egl-headless", "none"]
+VGA_TYPES = ["virtio", "std", "vmware", "qxl", "none"]
+USB_DEVICES = ["", "usb-tablet", "usb-mouse", "usb-kbd", "usb-host"]
+AUDIO_DRIVERS = ["none", "pa", "alsa", "oss", "sdl", "dsound", "coreaudio"]
+SOUND_HW = ["none", "intel-hda", "ac97", "sb16", "all"]
+
+
+# Fast boot: minimal direct-kernel-boot machines (microvm / virt with virtio-mmio)
+MICROVM_OPTIONS = "x-option-roms=off,pit=off,pic=off,rtc=off,isa-serial=on"
+FAST_BOOT_CMDLINE = {
+    "x86": "console=ttyS0 reboot=t panic=-1 pci=off i8042.noaux i8042.nomux i8042.nopnp i8042.dumbkbd "
+           "tsc=reliable no_timer_check 8250.nr_uarts=1 cryptomgr.notests rcupdate.rcu_expedited=1 random.trust_cpu=on",
+    "arm": "console=ttyAMA0 reboot=t panic=-1 cryptomgr.notests rcupdate.rcu_expedited=1 random.trust_cpu=on",
+    "riscv": "console=ttyS0 reboot=t panic=-1 cryptomgr.notests rcupdate.rcu_expedited=1",
+}
+FAST_BOOT_FAMILIES = {"x86_64": "x86", "i386": "x86", "aarch64": "arm", "arm": "arm", "riscv64": "riscv", "riscv32": "riscv"}
+DEFAULT_BOOT_MARKER = r"Run \S+ as init process"
+
+
+def merge_cmdline(defaults, user):
+    # User parameters win over defaults with the same key
+    user_keys = {token.split("=", 1)[0] for token in user.split()}
+    tokens = [token for token in defaults.split() if token.split("=", 1)[0] not in user_keys]
+    return " ".join(tokens + user.split())
+
+
+def fast_boot_config(cfg):
+    # ValueError for targets without a minimal virtio-mmio machine
+    arch_code = ARCH_MAP.get(cfg.get("arch", ""), cfg.get("arch", "") or "x86_64")
+    family = FAST_BOOT_FAMILIES.get(arch_code)
+    if family is None:
+        raise ValueError(f"Fast boot is not available for {arch_code} (supported: {', '.join(FAST_BOOT_FAMILIES)})")
+    fast = dict(cfg)
+    fast.update({
+        "machine": "microvm" if family == "x86" else "virt",
+        "nodefaults": True, "no_user_config": True, "no_reboot": True,
+        "vga": "none", "display": "none", "fullscreen": False, "usb": False, "usb_device": "",
+        "audio_drv": "none", "soundhw": "none", "cdrom": "", "boot": "", "bios": "",
+        "append": merge_cmdline(FAST_BOOT_CMDLINE[family], cfg.get("append", "").strip()),
+    })
+    # There is no PCI bus (microvm, pci=off), so every NIC model becomes a virtio-mmio one
+    fast["net_device"] = "virtio-net-device"
+    return fast
+
+
+def build_command(cfg):
+    fast_boot = cfg.get("fast_boot", False)
+    if fast_boot:
+        cfg = fast_boot_config(cfg)
+    qemu_bin = cfg.get("qemu_path", "").strip()
+    if not qemu_bin:
+        arch_code = ARCH_MAP.get(cfg.get("arch", ""), cfg.get("arch", "") or "x86_64")
+        qemu_bin = f"qemu-system-{arch_code}"
+
+    cmd = [qemu_bin]
+
+    # System & CPU
+    if cfg.get("name", ""):
+        cmd.extend(["-name", cfg.get("name", "")])
+
+    cmd.extend(["-m", str(cfg.get("ram", 2048))])
+    cmd.extend(["-smp", str(cfg.get("smp", 2))])
+
+    # Determine acceleration and machine type
+    machine = cfg.get("machine", "q35")
+    accel = cfg.get("accel", "tcg")
+
+    machine_opts = machine
+    if fast_boot and machine == "microvm":
+        machine_opts += f",{MICROVM_OPTIONS}"
+    mem_merge = cfg.get("mem_merge", "default")
+    if mem_merge in ("on", "off"):
+        machine_opts += f",mem-merge={mem_merge}"
+
+    if accel == "kvm":
+        cmd.extend(["-machine", f"{machine_opts},accel=kvm"])
+    else:
+        cmd.extend(["-machine", machine_opts])
+        cmd.extend(["-accel", tcg_accel_options(cfg) if accel == "tcg" else accel])
+        icount = cfg.get("icount", "").strip()
+        if accel == "tcg" and icount:
+            cmd.extend(["-icount", icount])
+
+    cmd.extend(["-cpu", cfg.get("cpu", "host")])
+
+    uuid_val = cfg.get("uuid", "").strip()
+    if uuid_val: cmd.extend(["-uuid", uuid_val])
+
+    pidfile = cfg.get("pidfile", "").strip()
+    if pidfile: cmd.extend(["-pidfile", pidfile])
+
+    mem_path = cfg.get("mem_path", "").strip()
+    if mem_path: cmd.extend(["-mem-path", mem_path])
+
+    numa = cfg.get("numa", "").strip()
+    if numa: cmd.extend(["-numa", numa])
+
+    if cfg.get("nodefaults", False): cmd.append("-nodefaults")
+    if cfg.get("no_user_config", False): cmd.append("-no-user-config")
+    if cfg.get("S", False): cmd.append("-S")
+    if cfg.get("no_acpi", False): cmd.append("-no-acpi")
+    if cfg.get("no_hpet", False): cmd.append("-no-hpet")
+    if cfg.get("no_shutdown", False): cmd.append("-no-shutdown")
+    if cfg.get("no_reboot", False): cmd.append("-no-reboot")
+    if cfg.get("daemonize", False): cmd.append("-daemonize")
+    if cfg.get("mem_prealloc", False): cmd.append("-mem-prealloc")
+    if cfg.get("balloon", False):
+        balloon_model = "virtio-balloon-device" if machine.startswith("microvm") else "virtio-balloon-pci"
+        cmd.extend(["-device", f"{balloon_model},id=balloon0,free-page-reporting=on"])
+    if cfg.get("guest_agent", False):
+        cmd.extend(guest_agent_args(cfg, fast_boot or machine.startswith("microvm")))
+
+    # Storage
+    # Hard disks with a known format get an explicit -drive so QEMU doesn't have to probe
+    for index, key in enumerate(["hda", "hdb", "hdc", "hdd"]):
+        path = cfg.get(key, "").strip()
+        if not path: continue
+        info = inspect_image(path)
+        if fast_boot:
+            # No IDE on microvm: every disk is a virtio-mmio block device
+            fmt = f",format={info['format']}" if info and info["format"] in DRIVE_FORMATS else ""
+            cmd.extend(["-drive", f"file={drive_file_escape(path)}{fmt},if=none,id=hd{index}"
+                                  f",stats-intervals.0={BLOCKSTATS_INTERVAL}",
+                        "-device", f"virtio-blk-device,drive=hd{index}"])
+        elif info and info["format"] in DRIVE_FORMATS:
+            cmd.extend(["-drive", f"file={drive_file_escape(path)},format={info['format']},index={index},media=disk"
+                                  f",stats-intervals.0={BLOCKSTATS_INTERVAL}"])
+        else:
+            cmd.extend([f"-hd{'abcd'[index]}", path])
+
+    for flag, key in [
+        ("-cdrom", "cdrom"), ("-fda", "fda"), ("-fdb", "fdb"),
+        ("-mtdblock", "mtdblock"), ("-pflash", "pflash"), ("-sd", "sd")
+    ]:
+        path = cfg.get(key, "").strip()
+        if path: cmd.extend([flag, path])
+
+    if cfg.get("snapshot", False): cmd.append("-snapshot")
+
+    boot_val = cfg.get("boot", "")
+    if boot_val:
+        cmd.extend(["-boot", boot_val.split()[0]])
+
+    # Network
+    net_type = cfg.get("net_type", "user")
+    if net_type != "none":
+        netdev_id = "net0"
+        net_opts = f"{net_type},id={netdev_id}"
+        hostfwd = cfg.get("hostfwd", "").strip()
+        if net_type == "user" and hostfwd:
+            net_opts += f",hostfwd={hostfwd}"
+        hostname = cfg.get("hostname", "").strip()
+        if net_type == "user" and hostname:
+            net_opts += f",hostname={hostname}"
+
+        cmd.extend(["-netdev", net_opts])
+        net_device = cfg.get("net_device", "virtio-net-pci")
+        cmd.extend(["-device", f"{net_device},netdev={netdev_id}"])
+
+    nic_val = cfg.get("nic", "").strip()
+    if nic_val: cmd.extend(["-nic", nic_val])
+    redir_val = cfg.get("redir", "").strip()
+    if redir_val: cmd.extend(["-redir", redir_val])
+
+    # Graphics
+    display_val = cfg.get("display", "gtk")
+    if fast_boot:
+        # -nodefaults drops the default serial, so put the console on stdio explicitly
+        cmd.extend(["-display", "none", "-serial", "stdio"])
+    elif display_val != "none":
+        cmd.extend(["-display", display_val])
+    else:
+        cmd.append("-nographic")
+
+    vga_val = cfg.get("vga", "virtio")
+    if vga_val != "none":
+        cmd.extend(["-vga", vga_val])
+
+    vnc_val = cfg.get("vnc", "").strip()
+    if vnc_val: cmd.extend(["-vnc", vnc_val])
+    if cfg.get("fullscreen", False): cmd.append("-full-screen")
+
+    # Input
+    if cfg.get("usb", False): cmd.append("-usb")
+    usb_dev = cfg.get("usb_device", "")
+    if usb_dev: cmd.extend(["-device", usb_dev])
+    usbdevice_val = cfg.get("usbdevice", "").strip()
+    if usbdevice_val: cmd.extend(["-usbdevice", usbdevice_val])
+    kbd_layout = cfg.get("kbd_layout", "").strip()
+    if kbd_layout: cmd.extend(["-k", kbd_layout])
+
+    # Kernel & Boot
+    for flag, key in [
+        ("-kernel", "kernel"), ("-initrd", "initrd"), ("-dtb", "dtb"),
+        ("-bios", "bios"), ("-L", "L")
+    ]:
+        path = cfg.get(key, "").strip()
+        if path: cmd.extend([flag, path])
+
+    append_val = cfg.get("append", "").strip()
+    if append_val: cmd.extend(["-append", append_val])
+
+    # Audio
+    audio_drv = cfg.get("audio_drv", "none")
+    soundhw = cfg.get("soundhw", "none")
+    if audio_drv != "none":
+        cmd.extend(["-audio", f"driver={audio_drv},model={soundhw}"])
+    elif soundhw != "none":
+        cmd.extend(["-soundhw", soundhw])
+
+    audiodev = cfg.get("audiodev", "").strip()
+    if audiodev: cmd.extend(["-audiodev", audiodev])
+
+    # Debug
+    debug_items = cfg.get("debug_item", "").strip()
+    if debug_items: cmd.extend(["-d", debug_items])
+    debug_log = cfg.get("debug_log", "").strip()
+    if debug_log: cmd.extend(["-D", debug_log])
+    gdb_val = cfg.get("gdb", "").strip()
+    if gdb_val:
+        if gdb_val == "s":
+            cmd.append("-s")
+        else:
+            cmd.extend(["-gdb", gdb_val])
+    trace_val = cfg.get("trace", "").strip()
+    if trace_val: cmd.extend(["-trace", trace_val])
+    trace_file = cfg.get("trace_file", "").strip()
+    if trace_file: cmd.extend(["-T", trace_file])
+
+    # Expert
+    obj_val = cfg.get("object", "").strip()
+    if obj_val: cmd.extend(["-object", obj_val])
+    glob_val = cfg.get("global", "").strip()
+    if glob_val: cmd.extend(["-global", glob_val])
+    fd_val = cfg.get("add_fd", "").strip()
+    if fd_val: cmd.extend(["-add-fd", fd_val])
+    dev_extra = cfg.get("device_extra", "").strip()
+    if dev_extra: cmd.extend(["-device", dev_extra])
+
+    extra = cfg.get("extra", "").strip()
+    if extra:
+        cmd.extend(shlex.split(extra))
+
+    return cmd
+
+
+# Importing hand-written QEMU command lines and launch scripts: the inverse of build_command
+IMPORT_TEXT_OPTIONS = {
+    "-hda": "hda", "-hdb": "hdb", "-hdc": "hdc", "-hdd": "hdd", "-cdrom": "cdrom", "-fda": "fda", "-fdb": "fdb",
+    "-mtdblock": "mtdblock", "-pflash": "pflash", "-sd": "sd", "-kernel": "kernel", "-initrd": "initrd",
+    "-dtb": "dtb", "-bios": "bios", "-L": "L", "-cpu": "cpu", "-uuid": "uuid", "-pidfile": "pidfile",
+    "-mem-path": "mem_path", "-numa": "numa", "-icount": "icount", "-nic": "nic", "-redir": "redir",
+    "-vnc": "vnc", "-usbdevice": "usbdevice", "-k": "kbd_layout", "-append": "append", "-audiodev": "audiodev",
+    "-d": "debug_item", "-D": "debug_log", "-gdb": "gdb", "-trace": "trace", "-T": "trace_file",
+    "-object": "object", "-global": "global", "-add-fd": "add_fd",
+}
+IMPORT_FLAGS = {
+    "-nodefaults": "nodefaults", "-no-user-config": "no_user_config", "-S": "S", "-no-acpi": "no_acpi",
+    "-no-hpet": "no_hpet", "-no-shutdown": "no_shutdown", "-no-reboot": "no_reboot", "-daemonize": "daemonize",
+    "-mem-prealloc": "mem_prealloc", "-snapshot": "snapshot", "-full-screen": "fullscreen", "-usb": "usb",
+}
+# Options without an argument that the importer doesn't map, so the next token isn't taken as their value
+QEMU_FLAGS = {"-nographic", "-enable-kvm", "-s", "-no-fd-bootchk", "-no-quit", "-no-frame", "-alt-grab",
+              "-ctrl-grab", "-win2k-hack", "-rtc-td-hack", "-singlestep", "-only-migratable", "-preconfig",
+              "-enable-sync-profile"}
+QEMU_VALUE_OPTIONS = set(IMPORT_TEXT_OPTIONS) | {"-name", "-m", "-smp", "-machine", "-M", "-accel", "-drive",
+                                                 "-boot", "-netdev", "-device", "-display", "-vga", "-audio", "-soundhw"}
+QEMU_BINARY_RE = re.compile(r"(?:^|[/\\])(?:qemu-system-[\w.-]+|qemu-kvm)$")
+SHELL_OPERATORS = {"&", "&&", "|", "||", ";", ";;"}
+IMPORT_MAX_BYTES = 1024 * 1024
+
+
+def qemu_opts(value):
+    # "virtio-net-pci,netdev=n0" -> [("", "virtio-net-pci"), ("netdev", "n0")]; ",," is an escaped comma
+    parts = [""]
+    i = 0
+    while i < len(value):
+        if value[i] == "," and value[i + 1:i + 2] == ",":
+            parts[-1] += ","
+            i += 2
+            continue
+        if value[i] == ",":
+            parts.append("")
+        else:
+            parts[-1] += value[i]
+        i += 1
+    return [tuple(part.split("=", 1)) if "=" in part else ("", part) for part in parts]
+
+
+def import_size_mb(value):
+    match = re.fullmatch(r"(?:size=)?(\d+(?:\.\d+)?)([kKmMgGtT]?)[bB]?", value)
+    if not match:
+        return None
+    return int(float(match.group(1)) * {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}[(match.group(2) or "M").upper()])
+
+
+def split_qemu_options(argv):
+    # [(option, value)]; value is None for flags, option is None for positional arguments
+    options = []
+    i = 1
+    while i < len(argv):
+        token = argv[i]
+        option = token[1:] if token.startswith("--") else token
+        if not option.startswith("-") or option == "-":
+            options.append((None, token))
+            i += 1
+            continue
+        takes_value = (option not in IMPORT_FLAGS and option not in QEMU_FLAGS and i + 1 < len(argv)
+                       and (option in QEMU_VALUE_OPTIONS or not argv[i + 1].startswith("-")))
+        options.append((option, argv[i + 1] if takes_value else None))
+        i += 2 if takes_value else 1
+    return options
+
+
+def match_network(options):
+    # The first -netdev that the form can express, together with the single NIC device using it
+    for index, (option, value) in enumerate(options):
+        if option != "-netdev" or not value:
+            continue
+        opts = qemu_opts(value)
+        backend, props = opts[0][1], dict(opts[1:])
+        allowed = {"id", "hostfwd", "hostname"} if backend == "user" else {"id"}
+        if opts[0][0] or backend not in NET_TYPES or backend == "none" or not set(props) <= allowed or len(opts) != len(props) + 1:
+            continue
+        nics = [i for i, (o, v) in enumerate(options) if o == "-device" and v and ("netdev", props.get("id")) in qemu_opts(v)]
+        if len(nics) != 1:
+            continue
+        device = qemu_opts(options[nics[0]][1])
+        if len(device) == 2 and not device[0][0] and device[0][1] in NET_DEVICES:
+            return index, nics[0], {"net_type": backend, "hostfwd": props.get("hostfwd", ""),
+                                    "hostname": props.get("hostname", ""), "net_device": device[0][1]}
+    return None
+
+
+def parse_qemu_argv(argv):
+    # Returns (config, unmapped options, warnings). Options the form has no field for go to "extra" in their
+    # original order; QEMU lets a later -display/-cpu/-machine/-m override or extend what the form generates.
+    # Also C:\...\qemu-system-x86_64.exe from Windows scripts
+    base = re.sub(r"\.exe$", "", re.split(r"[/\\]", argv[0])[-1], flags=re.IGNORECASE)
+    arch_code = base[len("qemu-system-"):] if base.startswith("qemu-system-") else "x86_64"
+    cfg = {
+        "name": "", "arch": next((name for name, code in ARCH_MAP.items() if code == arch_code), arch_code),
+        "qemu_path": "" if argv[0] == f"qemu-system-{arch_code}" else argv[0],
+        "ram": 128, "smp": 1, "machine": "", "cpu": "", "accel": "tcg", "tcg_thread": "auto", "tcg_tb_size": 0,
+        "mem_merge": "default", "boot": "", "net_type": "none", "display": "gtk", "vga": "none", "usb_device": "",
+        "audio_drv": "none", "soundhw": "none",
+    }
+    extra = []
+    warnings = []
+    options = split_qemu_options(argv)
+    network = match_network(options)
+    consumed = set()
+    if network is not None:
+        consumed = {network[0], network[1]}
+        cfg.update(network[2])
+    has_display = False
+
+    for index, (option, value) in enumerate(options):
+        if index in consumed:
+            continue
+        opts = qemu_opts(value) if value else []
+        head = opts[0][1] if opts and not opts[0][0] else ""
+        props = {key: val for key, val in opts if key}
+        if option is None:
+            # A bare image name is -hda
+            if not cfg.get("hda"):
+                cfg["hda"] = value
+                continue
+            extra.append([value])
+        elif option in IMPORT_FLAGS:
+            cfg[IMPORT_FLAGS[option]] = True
+        elif option in IMPORT_TEXT_OPTIONS and value is not None and not cfg.get(IMPORT_TEXT_OPTIONS[option]):
+            cfg[IMPORT_TEXT_OPTIONS[option]] = value
+        elif option == "-name" and value and not cfg["name"]:
+            cfg["name"] = head or props.get("guest", "")
+            if head != value:
+                extra.append([option, value])
+        elif option == "-m" and value:
+            ram = import_size_mb(value.split(",")[0])
+            if ram:
+                cfg["ram"] = ram
+            if not ram or "," in value:
+                extra.append([option, value])
+        elif option == "-smp" and value:
+            count = re.fullmatch(r"(?:cpus=)?(\d+)", value.split(",")[0])
+            if count:
+                cfg["smp"] = int(count.group(1))
+            if not count or "," in value:
+                extra.append([option, value])
+        elif option in ("-machine", "-M") and value:
+            machine = props.pop("type", head)
+            if "accel" in props:
+                cfg["accel"] = props.pop("accel").split(":")[0]
+            if props.get("mem-merge") in ("on", "off"):
+                cfg["mem_merge"] = props.pop("mem-merge")
+            if machine in MACHINE_TYPES:
+                cfg["machine"] = machine
+            if props or machine not in MACHINE_TYPES:
+                # Without accel=, which the form already passes and QEMU refuses to combine with -accel
+                rest = [f"{key}={val.replace(',', ',,')}" for key, val in props.items()]
+                extra.append(["-machine", ",".join(([machine] if machine else []) + rest)])
+        elif option == "-enable-kvm":
+            cfg["accel"] = "kvm"
+        elif option == "-accel" and value:
+            cfg["accel"] = head or props.pop("accel", "tcg")
+            if cfg["accel"] == "tcg" and props.get("thread") in ("multi", "single"):
+                cfg["tcg_thread"] = props.pop("thread")
+            if cfg["accel"] == "tcg" and props.get("tb-size", "").isdigit():
+                cfg["tcg_tb_size"] = int(props.pop("tb-size"))
+            if props:
+                # -accel and -machine accel= can't be mixed, so these can't be passed through "extra"
+                warnings.append(f"accelerator properties not imported: {','.join(f'{k}={v}' for k, v in props.items())}")
+        elif option == "-drive" and value:
+            index_value = props.get("index", "")
+            key = f"hd{'abcd'[int(index_value)]}" if index_value in ("0", "1", "2", "3") else ""
+            if (key and not head and not cfg.get(key) and props.get("file")
+                    and props.get("media", "disk") == "disk" and props.get("if", "ide") == "ide"
+                    and set(props) <= {"file", "format", "index", "media", "if", "stats-intervals.0"}):
+                cfg[key] = props["file"]
+            else:
+                extra.append([option, value])
+        elif option == "-boot" and value in ("a", "c", "d", "n"):
+            cfg["boot"] = next(order for order in BOOT_ORDERS if order.startswith(value))
+        elif option == "-device" and head in USB_DEVICES[1:] and not props and not cfg["usb_device"]:
+            cfg["usb_device"] = value
+        elif option == "-device" and head in ("virtio-balloon-pci", "virtio-balloon-device") and \
+                props == {"id": "balloon0", "free-page-reporting": "on"}:
+            cfg["balloon"] = True
+        elif option == "-display" and value in DISPLAYS and value != "none" and not has_display:
+            cfg["display"] = value
+            has_display = True
+        elif option == "-nographic" and not has_display:
+            cfg["display"] = "none"
+            has_display = True
+        elif option == "-vga" and value in VGA_TYPES and value != "none":
+            cfg["vga"] = value
+        elif option == "-audio" and not head and set(props) == {"driver", "model"} and \
+                props["driver"] in AUDIO_DRIVERS[1:] and props["model"] in SOUND_HW:
+            cfg["audio_drv"], cfg["soundhw"] = props["driver"], props["model"]
+        elif option == "-soundhw" and value in SOUND_HW:
+            cfg["soundhw"] = value
+        elif option == "-s" and not cfg.get("gdb"):
+            cfg["gdb"] = "s"
+        else:
+            extra.append([option] if value is None else [option, value])
+            if option == "-display" or option == "-nographic":
+                has_display = True
+
+    # What QEMU does without the option, as far as the form can express it
+    defaults = TCG_ARCH_DEFAULTS.get(arch_code, {})
+    if not cfg["machine"]:
+        cfg["machine"] = "pc" if arch_code in ("x86_64", "i386") else defaults.get("machine", "virt")
+        if arch_code not in ("x86_64", "i386"):
+            warnings.append(f"no -machine option: imported as {cfg['machine']}")
+    if not cfg["cpu"]:
+        cfg["cpu"] = {"x86_64": "qemu64", "i386": "qemu32"}.get(arch_code, defaults.get("cpu", "max"))
+        if arch_code not in ("x86_64", "i386"):
+            warnings.append(f"no -cpu option: imported as {cfg['cpu']}")
+    if not has_display:
+        warnings.append("no -display option: imported as gtk")
+    if cfg["accel"] != "tcg" and cfg.get("icount"):
+        extra.append(["-icount", cfg.pop("icount")])
+    cfg["mode"] = 1 if cfg["accel"] in ("kvm", "hvf", "whpx") else 0
+    cfg["extra"] = "\n".join(shlex.join(group) for group in extra)
+    return cfg, [group[0] for group in extra], warnings
+
+
+def protect_single_quoted(line):
+    # The shell expands nothing inside '...': hide those $ from variable expansion as \0
+    out = []
+    quote = None
+    i = 0
+    while i < len(line):
+        c = line[i]
+        if c == "\\" and quote != "'":
+            out.append(line[i:i + 2])
+            i += 2
+            continue
+        if c in "'\"" and quote in (None, c):
+            quote = None if quote else c
+        elif c == "$" and quote == "'":
+            c = "\0"
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def script_qemu_commands(text):
+    # Launch scripts: join continuation lines, expand VAR=value assignments made earlier in the script and
+    # cut the QEMU invocation at the first shell operator or redirection
+    variables = {}
+    commands = []
+    for line in text.replace("\\\n", " ").splitlines():
+        try:
+            tokens = shlex.split(protect_single_quoted(line), comments=True)
+        except ValueError:
+            continue
+        tokens = [re.sub(r"\$\{(\w+)\}|\$(\w+)", lambda m: variables.get(m.group(1) or m.group(2), m.group(0)),
+                         token).replace("\0", "$")
+                  for token in tokens if token not in ("$@", "$*")]
+        assignments = tokens[1:] if tokens[:1] in (["export"], ["local"], ["readonly"]) else tokens
+        if assignments and all(re.match(r"[A-Za-z_]\w*=", token) for token in assignments):
+            variables.update(token.split("=", 1) for token in assignments)
+            continue
+        start = next((i for i, token in enumerate(tokens) if QEMU_BINARY_RE.search(token)), None)
+        if start is None:
+            continue
+        argv = []
+        for token in tokens[start:]:
+            if token in SHELL_OPERATORS or re.match(r"\d*[<>]", token):
+                break
+            argv.append(token)
+        commands.append(argv)
+    return commands
+
+
+def import_qemu_script(path):
+    # -> (config, unmapped options, warnings); ValueError when the file holds no QEMU command
+    with open(path, "r", encoding='utf-8', errors='replace') as f:
+        text = f.read(IMPORT_MAX_BYTES + 1)
+    if len(text) > IMPORT_MAX_BYTES or "\0" in text:
+        raise ValueError("not a launch script")
+    commands = script_qemu_commands(text)
+    if not commands:
+        raise ValueError("no QEMU command found")
+    # A variable that is a whole argument (e.g. $EXTRA_ARGS) usually expands to options of its own: drop it
+    argv = [token for token in commands[0] if not re.fullmatch(r"\$\{?\w+\}?", token)]
+    cfg, unmapped, warnings = parse_qemu_argv(argv)
+    if len(commands) > 1:
+        warnings.append(f"{len(commands)} QEMU commands, only the first was imported")
+    unresolved = sorted({var for token in commands[0] for var in re.findall(r"\$\{?\w+\}?", token)})
+    if unresolved:
+        warnings.append(f"unresolved shell variables: {', '.join(unresolved)}")
+    cfg["name"] = re.sub(r"[^\w.-]", "_", cfg["name"] or Path(path).stem)
+    return cfg, unmapped, warnings
+
+
+def try_import_script(path):
+    try:
+        return import_qemu_script(path) + (None,)
+    except (OSError, ValueError) as exc:
+        return None, [], [], str(exc)
+
+
+def import_scripts(paths, base_path, workers=8):
+    # Files are read and parsed on a thread pool; configs are written afterwards in a stable order.
+    # VMs that already exist in the library are never overwritten.
+    files = []
+    for path in map(Path, paths):
+        files += sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    files = list(dict.fromkeys(files))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(try_import_script, files))
+    report = []
+    taken = set()
+    for path, (cfg, unmapped, warnings, error) in zip(files, parsed):
+        row = {"file": str(path), "vm": "", "status": "imported", "unmapped": unmapped, "warnings": warnings}
+        report.append(row)
+        if error:
+            row.update(status="skipped", warnings=[error])
+            continue
+        name, suffix = cfg["name"], 2
+        while name in taken:
+            name, suffix = f"{cfg['name']}-{suffix}", suffix + 1
+        cfg["name"] = row["vm"] = name
+        taken.add(name)
+        vm_dir = Path(base_path) / name
+        if (vm_dir / "config.json").exists():
+            row["status"] = "exists"
+            continue
+        try:
+            vm_dir.mkdir(parents=True, exist_ok=True)
+            with open(vm_dir / "config.json", "w", encoding='utf-8') as f:
+                json.dump(cfg, f, indent=4)
+        except OSError as exc:
+            row.update(status="failed", warnings=warnings + [str(exc)])
+    return report
+
+
+def format_import_report(report):
+    lines = []
+    counts = {}
+    for row in report:
+        for option in row["unmapped"]:
+            counts[option] = counts.get(option, 0) + 1
+        line = f"{row['status']:<8} {row['file']}" + (f" -> {row['vm']}" if row["vm"] else "")
+        if row["unmapped"]:
+            line += f"\n         unmapped (kept in extra): {' '.join(row['unmapped'])}"
+        for warning in row["warnings"]:
+            line += f"\n         {warning}"
+        lines.append(line)
+    imported = sum(row["status"] == "imported" for row in report)
+    summary = f"Imported {imported} of {len(report)} files"
+    if counts:
+        summary += "; unmapped options: " + ", ".join(
+            f"{option} ×{count}" for option, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+    return summary, "\n".join(lines)
+
+
+class ImportWorker(QThread):
+    done = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, paths, base_path, parent=None):
+        super().__init__(parent)
+        self.paths = paths
+        self.base_path = base_path
+
+    def run(self):
+        try:
+            self.done.emit(import_scripts(self.paths, self.base_path))
+        except OSError as exc:
+            self.failed.emit(str(exc))
+
+
+def print_import_report(paths, base_path):
+    report = import_scripts(paths, base_path)
+    summary, details = format_import_report(report)
+    print(details)
+    print(summary)
+    return 0 if any(row["status"] == "imported" for row in report) else 1
+
+
+# QMP (QEMU Machine Protocol)
+class QmpError(Exception):
+    pass
+
+
+def find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def qmp_args(port):
+    return ["-qmp", f"tcp:127.0.0.1:{port},server=on,wait=off"]
+
+
+class QmpClient:
+    def __init__(self, port, host="127.0.0.1", timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+        self.events = []
+        self.greeting = None
+
+    def connect(self, wait=0.0):
+        # QEMU opens the socket a little after the process starts, so retry for up to `wait` seconds
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.05)
+        self.reader = self.sock.makefile("rb")
+        self.greeting = self._read_message()
+        self.execute("qmp_capabilities")
+        return self
+
+    def _read_message(self):
+        line = self.reader.readline()
+        if not line:
+            raise QmpError("QMP connection closed")
+        return json.loads(line)
+
+    def execute(self, command, arguments=None):
+        msg = {"execute": command}
+        if arguments:
+            msg["arguments"] = arguments
+        self.sock.sendall(json.dumps(msg).encode() + b"\n")
+        while True:
+            reply = self._read_message()
+            if "event" in reply:
+                self.events.append(reply)
+                continue
+            if "error" in reply:
+                raise QmpError(f"{command}: {reply['error'].get('desc', reply['error'])}")
+            return reply.get("return")
+
+    def close(self):
+        try:
+            if self.reader:
+                self.reader.close()
+            if self.sock:
+                self.sock.close()
+        except OSError:
+            pass
+        self.sock = None
+        self.reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def qmp_execute(port, command, arguments=None, wait=0.0, timeout=5.0):
+    with QmpClient(port, timeout=timeout) as client:
+        client.connect(wait)
+        return client.execute(command, arguments)
+
+
+_monitor_jobs = {}
+_monitor_jobs_lock = threading.Lock()
+
+
+class MonitorJob:
+    # QEMU serves one QMP client at a time: while a long job (snapshot, suspend, resume) holds the
+    # monitor, pollers skip the VM instead of timing out on every round
+    def __init__(self, port, what):
+        self.port = port
+        self.what = what
+
+    def __enter__(self):
+        with _monitor_jobs_lock:
+            _monitor_jobs[self.port] = self.what
+        return self
+
+    def __exit__(self, *exc):
+        with _monitor_jobs_lock:
+            _monitor_jobs.pop(self.port, None)
+
+
+def monitor_busy(port):
+    # Name of the job holding the VM's monitor, or None
+    with _monitor_jobs_lock:
+        return _monitor_jobs.get(port)
+
+
+class PollWarnings:
+    # One line per VM and problem instead of one per polling round; forgotten once the VM answers again
+    def __init__(self, label):
+        self.label = label
+        self.active = {}
+
+    def warn(self, name, message):
+        if self.active.get(name) != message:
+            self.active[name] = message
+            print(f"{self.label} {name}: {message}")
+
+    def clear(self, name):
+        self.active.pop(name, None)
+
+
+# QEMU guest agent (qemu-ga on a virtio-serial port)
+QGA_PORT_NAME = "org.qemu.guest_agent.0"
+QGA_SHUTDOWN_GRACE_MS = 15000
+QGA_CPU_BUSY = ("user", "nice", "system", "irq", "softirq", "steal")
+
+
+_runtime_dir = None
+
+
+def private_dir(path):
+    # A folder only the current user can enter; None if it exists but belongs to someone else or is open to others
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if hasattr(os, "getuid") and (not os.path.isdir(path) or os.path.islink(path)
+                                  or st.st_uid != os.getuid() or st.st_mode & 0o077):
+        return None
+    return path
+
+
+def runtime_dir():
+    # Per-user folder for sockets: in the shared temp folder other users could pre-create or connect to them
+    global _runtime_dir
+    if _runtime_dir is None:
+        xdg = os.environ.get("XDG_RUNTIME_DIR", "")
+        uid = os.getuid() if hasattr(os, "getuid") else os.getpid()
+        _runtime_dir = ((xdg and os.path.isdir(xdg) and private_dir(os.path.join(xdg, "mgui_qemu")))
+                        or private_dir(os.path.join(tempfile.gettempdir(), f"mgui_qemu-{uid}"))
+                        or tempfile.mkdtemp(prefix="mgui_qemu-"))
+    return _runtime_dir
+
+
+def guest_agent_socket(cfg):
+    # Unix socket paths are limited to ~108 bytes, so keep them out of the (possibly deep) home folder
+    name = re.sub(r"[^\w.-]", "_", cfg.get("instance", "") or cfg.get("name", "").strip() or "vm")
+    return os.path.join(runtime_dir(), f"{name}.qga")
+
+
+def guest_agent_args(cfg, virtio_mmio=False):
+    serial_model = "virtio-serial-device" if virtio_mmio else "virtio-serial-pci"
+    path = guest_agent_socket(cfg).replace(",", ",,")
+    return ["-chardev", f"socket,id=qga0,path={path},server=on,wait=off",
+            "-device", f"{serial_model},id=vser0",
+            "-device", f"virtserialport,bus=vser0.0,chardev=qga0,name={QGA_PORT_NAME}"]
+
+
+def guest_agent_target(name, cfg, qmp_port):
+    # (name, agent socket, QMP port to read balloon memory stats from) for a running VM, None without an agent
+    if not cfg.get("guest_agent", False):
+        return None
+    return name, guest_agent_socket(cfg), qmp_port if cfg.get("balloon", False) else None
+
+
+class GuestAgentClient:
+    # qemu-ga speaks QMP-style JSON lines, but without a greeting or capabilities negotiation
+    def __init__(self, path, timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+        self.reader = self.sock.makefile("rb")
+        self.sync()
+        return self
+
+    def sync(self):
+        # The agent keeps no per-client state: a reply meant for an earlier, timed out client may still be
+        # queued. guest-sync-delimited prefixes its reply with 0xFF, so everything before it is stale.
+        token = time.monotonic_ns() & 0x7FFFFFFF
+        self.sock.sendall(b"\xff" + json.dumps({"execute": "guest-sync-delimited", "arguments": {"id": token}}).encode() + b"\n")
+        while True:
+            byte = self.reader.read(1)
+            if not byte:
+                raise QmpError("guest agent connection closed")
+            if byte == b"\xff" and self._read_message().get("return") == token:
+                return
+
+    def _read_message(self):
+        line = self.reader.readline()
+        if not line:
+            raise QmpError("guest agent connection closed")
+        return json.loads(line)
+
+    def execute(self, command, arguments=None, reply=True):
+        msg = {"execute": command}
+        if arguments:
+            msg["arguments"] = arguments
+        self.sock.sendall(json.dumps(msg).encode() + b"\n")
+        if not reply:
+            return None
+        answer = self._read_message()
+        if "error" in answer:
+            raise QmpError(f"{command}: {answer['error'].get('desc', answer['error'])}")
+        return answer.get("return")
+
+    def shutdown(self, mode="powerdown"):
+        # guest-shutdown never answers on success: the agent goes away together with the guest
+        self.execute("guest-shutdown", {"mode": mode}, reply=False)
+
+    def close(self):
+        try:
+            if self.reader:
+                self.reader.close()
+            if self.sock:
+                self.sock.close()
+        except OSError:
+            pass
+        self.sock = None
+        self.reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def guest_stats(client, qmp_port=None):
+    stats = {"cpu_ticks": None, "filesystems": [], "memory": None}
+    try:
+        # qemu-ga 7.1+, Linux guests only
+        busy = total = 0
+        for cpu in client.execute("guest-get-cpustats"):
+            busy += sum(cpu.get(key, 0) for key in QGA_CPU_BUSY)
+            total += sum(cpu.get(key, 0) for key in QGA_CPU_BUSY + ("idle", "iowait"))
+        stats["cpu_ticks"] = (busy, total)
+    except QmpError:
+        pass
+    for fs in client.execute("guest-get-fsinfo"):
+        if "total-bytes" in fs:
+            stats["filesystems"].append((fs["mountpoint"], fs.get("used-bytes", 0), fs["total-bytes"]))
+    if qmp_port is not None and not monitor_busy(qmp_port):
+        # The agent has no memory usage command; the balloon driver reports it to QEMU instead
+        with QmpClient(qmp_port, timeout=2.0) as qmp:
+            qmp.connect()
+            qmp.execute("qom-set", {"path": BALLOON_QOM_PATH, "property": "guest-stats-polling-interval", "value": 5})
+            mem = qmp.execute("qom-get", {"path": BALLOON_QOM_PATH, "property": "guest-stats"}).get("stats", {})
+            if mem.get("stat-total-memory", -1) >= 0 and mem.get("stat-available-memory", -1) >= 0:
+                stats["memory"] = (mem["stat-total-memory"] - mem["stat-available-memory"], mem["stat-total-memory"])
+    return stats
+
+
+class GuestAgentWorker(QThread):
+    result = Signal(str, object)
+    failed = Signal(str, str)
+
+    def __init__(self, targets, action, parent=None):
+        super().__init__(parent)
+        # targets: [(vm name, agent socket, QMP port of a ballooned VM or None)]
+        self.targets = targets
+        self.action = action
+
+    def run(self):
+        for name, path, qmp_port in self.targets:
+            try:
+                with GuestAgentClient(path, timeout=3.0) as client:
+                    client.connect()
+                    if self.action == "stats":
+                        self.result.emit(name, guest_stats(client, qmp_port))
+                    elif self.action == "shutdown":
+                        client.shutdown()
+                        self.result.emit(name, "shutdown requested")
+                    else:
+                        # Freezing waits for every filesystem to be synced, which can take a while
+                        client.sock.settimeout(60.0)
+                        count = client.execute(f"guest-fsfreeze-{self.action}")
+                        self.result.emit(name, f"fsfreeze-{self.action}: {count} filesystem(s)")
+            except (OSError, QmpError, ValueError, KeyError, TypeError) as exc:
+                self.failed.emit(name, str(exc) or type(exc).__name__)
+
+
+# Suspend to file / resume through QMP migration streams
+SUSPEND_STATE_FILE = "suspend.state"
+STATE_COMPRESSORS = {
+    # name: (compress command, decompress command)
+    "zstd": ("zstd -q -T0 -3", "zstd -q -dc"),
+    "gzip": ("gzip -1", "gzip -dc"),
+}
+
+
+def state_meta_path(state_path):
+    return Path(str(state_path) + ".json")
+
+
+def load_state_meta(state_path):
+    # A state without metadata is treated as a plain uncompressed migration stream
+    try:
+        with open(state_meta_path(state_path), "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, JSONDecodeError):
+        return {"kind": "exec", "compress": ""}
+
+
+def discard_state(state_path):
+    for p in (Path(state_path), state_meta_path(state_path)):
+        try:
+            p.unlink(missing_ok=True)
+        except OSError as exc:
+            print(f"State cleanup error: {exc}")
+
+
+def saved_state_for(base_path, cfg):
+    # Every launch goes through here: (state path, meta, fingerprint matches) for a suspended state of this
+    # VM, or None. A state saved from another configuration must never be loaded, and a cold boot moves the
+    # disks on, so callers either resume from a matching state or discard it first. -snapshot launches
+    # leave the disks untouched and the state alone.
+    if base_path is None or cfg.get("snapshot", False):
+        return None
+    state_path = Path(base_path) / (cfg.get("name", "").strip() or "unnamed_vm") / SUSPEND_STATE_FILE
+    if not state_path.exists():
+        return None
+    meta = load_state_meta(state_path)
+    return state_path, meta, meta.get("fingerprint") == config_fingerprint(cfg)
+
+
+def incoming_args(state_path, meta):
+    if meta.get("kind") == "file":
+        # mapped-ram/multifd have to be enabled over QMP before the stream is read
+        return ["-incoming", "defer"]
+    reader = STATE_COMPRESSORS.get(meta.get("compress", ""), ("", "cat"))[1]
+    return ["-incoming", f"exec:{reader} {shlex.quote(str(state_path))}"]
+
+
+def start_deferred_incoming(client, state_path, meta):
+    if meta.get("kind") != "file":
+        return
+    caps = [{"capability": c, "state": True} for c in meta.get("capabilities", [])]
+    client.execute("migrate-set-capabilities", {"capabilities": caps})
+    if meta.get("multifd_channels"):
+        client.execute("migrate-set-parameters", {"multifd-channels": meta["multifd_channels"]})
+    client.execute("migrate-incoming", {"uri": f"file:{state_path}"})
+
+
+def wait_migration(client, progress=None, timeout=3600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = client.execute("query-migrate") or {}
+        status = info.get("status", "")
+        if status == "completed":
+            return info
+        if status in ("failed", "cancelled"):
+            raise QmpError(f"migration {status}: {info.get('error-desc', '')}")
+        ram = info.get("ram") or {}
+        if progress and ram.get("total"):
+            progress(min(99, int(ram.get("transferred", 0) * 100 / ram["total"])))
+        time.sleep(0.1)
+    raise QmpError("migration timed out")
+
+
+def exec_writer_command(writer, partial, status_path):
+    # QEMU runs exec: URIs through /bin/sh; the writer's exit status lands in status_path once it is done
+    return f"{writer} > {shlex.quote(str(partial))}; echo $? > {shlex.quote(str(status_path))}"
+
+
+def wait_writer(status_path, timeout=600):
+    # "completed" only means QEMU wrote everything into the pipe; the compressor may still be flushing
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            text = Path(status_path).read_text(encoding='utf-8')
+        except FileNotFoundError:
+            text = ""
+        if text.endswith("\n"):
+            if text.strip() != "0":
+                raise QmpError(f"state writer exited with status {text.strip()}")
+            return
+        time.sleep(0.05)
+    raise QmpError("state writer did not finish")
+
+
+def suspend_to_file(port, state_path, compress="", multifd_channels=4, progress=None):
+    state_path = Path(state_path)
+    partial = state_path.with_suffix(".partial")
+    status_path = state_path.with_suffix(".status")
+    status_path.unlink(missing_ok=True)
+    with QmpClient(port, timeout=30) as client:
+        client.connect()
+        version = client.execute("query-version")["qemu"]
+        # QEMU 9.0+ can write RAM straight into a file from several threads (mapped-ram + multifd);
+        # older versions or compressed states go through an exec: pipe instead.
+        if not compress and (version["major"], version["minor"]) >= (9, 0):
+            caps = ["mapped-ram", "multifd"]
+            meta = {"kind": "file", "capabilities": caps, "multifd_channels": multifd_channels}
+            client.execute("migrate-set-capabilities",
+                           {"capabilities": [{"capability": c, "state": True} for c in caps]})
+            client.execute("migrate-set-parameters", {"multifd-channels": multifd_channels})
+            uri = f"file:{partial}"
+        else:
+            writer = STATE_COMPRESSORS.get(compress, ("cat", ""))[0]
+            meta = {"kind": "exec", "compress": compress if compress in STATE_COMPRESSORS else ""}
+            uri = f"exec:{exec_writer_command(writer, partial, status_path)}"
+        meta["qemu_version"] = f"{version['major']}.{version['minor']}.{version['micro']}"
+
+        client.execute("stop")
+        try:
+            client.execute("migrate", {"uri": uri})
+            wait_migration(client, progress)
+            if meta["kind"] == "exec":
+                wait_writer(status_path)
+        except (OSError, QmpError):
+            client.execute("cont")
+            partial.unlink(missing_ok=True)
+            raise
+        finally:
+            status_path.unlink(missing_ok=True)
+        # Only a complete state may replace the old one and stop the VM
+        os.replace(partial, state_path)
+        client.execute("quit")
+    return meta
+
+
+class SuspendWorker(QThread):
+    progress = Signal(int)
+    done = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, mode, port, state_path, meta=None, compress="", parent=None):
+        super().__init__(parent)
+        self.mode = mode
+        self.port = port
+        self.state_path = Path(state_path)
+        self.meta = meta or {}
+        self.compress = compress
+
+    def run(self):
+        with MonitorJob(self.port, self.mode):
+            t0 = time.perf_counter()
+            try:
+                if self.mode == "suspend":
+                    meta = suspend_to_file(self.port, self.state_path, self.compress,
+                                           min(8, os.cpu_count() or 1), self.progress.emit)
+                    meta.update(self.meta)
+                    meta["created"] = time.time()
+                    with open(state_meta_path(self.state_path), "w", encoding='utf-8') as f:
+                        json.dump(meta, f, indent=4)
+                else:
+                    with QmpClient(self.port, timeout=30) as client:
+                        client.connect(wait=30)
+                        start_deferred_incoming(client, self.state_path, self.meta)
+                        wait_migration(client, self.progress.emit)
+                    # The disks move on from here, so the saved RAM must never be loaded twice
+                    discard_state(self.state_path)
+                self.done.emit(f"{(time.perf_counter() - t0):.2f} s")
+            except (OSError, QmpError, ValueError, KeyError) as exc:
+                self.failed.emit(str(exc))
+
+
+# Internal snapshots of running VMs (QMP snapshot-save/load/delete jobs)
+def writable_block_nodes(client):
+    nodes = []
+    for dev in client.execute("query-block") or []:
+        inserted = dev.get("inserted")
+        if inserted and not inserted.get("ro") and inserted.get("drv") == "qcow2":
+            nodes.append(inserted)
+    return nodes
+
+
+def live_snapshot_list(client):
+    nodes = writable_block_nodes(client)
+    if not nodes:
+        return []
+    result = []
+    for snap in (nodes[0].get("image") or {}).get("snapshots", []):
+        result.append({
+            "id": snap.get("id", ""),
+            "name": snap.get("name", ""),
+            "date": snap.get("date-sec", 0),
+            "vm_clock_ns": snap.get("vm-clock-sec", 0) * 1_000_000_000 + snap.get("vm-clock-nsec", 0),
+            "vm_state_size": snap.get("vm-state-size", 0),
+        })
+    return result
+
+
+def run_qmp_job(client, command, arguments, progress=None, timeout=3600):
+    job_id = f"mgui-{command}-{int(time.time() * 1000)}"
+    client.execute(command, dict(arguments, **{"job-id": job_id}))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = next((j for j in client.execute("query-jobs") or [] if j.get("id") == job_id), None)
+        if job is None:
+            return
+        if progress and job.get("total-progress"):
+            progress(int(job.get("current-progress", 0) * 100 / job["total-progress"]))
+        if job.get("status") == "concluded":
+            client.execute("job-dismiss", {"id": job_id})
+            if job.get("error"):
+                raise QmpError(f"{command}: {job['error']}")
+            return
+        time.sleep(0.05)
+    raise QmpError(f"{command} timed out")
+
+
+class SnapshotWorker(QThread):
+    progress = Signal(int)
+    listed = Signal(object)
+    done = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, port, action, tag="", parent=None):
+        super().__init__(parent)
+        self.port = port
+        self.action = action
+        self.tag = tag
+
+    def run(self):
+        with MonitorJob(self.port, f"snapshot-{self.action}"):
+            try:
+                with QmpClient(self.port, timeout=30) as client:
+                    client.connect()
+                    if self.action != "list":
+                        nodes = [n["node-name"] for n in writable_block_nodes(client)]
+                        if not nodes:
+                            raise QmpError("no writable qcow2 disk to snapshot")
+                        args = {"tag": self.tag, "devices": nodes}
+                        if self.action != "delete":
+                            args["vmstate"] = nodes[0]
+                        t0 = time.perf_counter()
+                        run_qmp_job(client, f"snapshot-{self.action}", args, self.progress.emit)
+                        self.done.emit(f"snapshot-{self.action} '{self.tag}' took {time.perf_counter() - t0:.2f} s")
+                    self.listed.emit(live_snapshot_list(client))
+            except (OSError, QmpError, ValueError, KeyError) as exc:
+                self.failed.emit(str(exc))
+
+
+# Accelerator detection
+HOST_ARCH_ALIASES = {
+    "amd64": "x86_64", "x64": "x86_64", "i686": "i386", "i586": "i386", "x86": "i386",
+    "arm64": "aarch64", "armv8l": "arm", "armv7l": "arm", "armv6l": "arm", "ppc64le": "ppc64",
+}
+OS_ACCELS = {"Linux": ["kvm"], "Windows": ["whpx"], "Darwin": ["hvf"], "NetBSD": ["nvmm"]}
+_accel_help_cache = {}
+
+
+def host_arch_code():
+    machine = platform.machine().lower()
+    return HOST_ARCH_ALIASES.get(machine, machine)
+
+
+def is_native_arch(arch_code):
+    host = host_arch_code()
+    return arch_code == host or (host, arch_code) in (("x86_64", "i386"), ("aarch64", "arm"))
+
+
+def cpu_flags(path="/proc/cpuinfo"):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    return set(line.partition(":")[2].split())
+    except OSError:
+        pass
+    return set()
+
+
+def kvm_nested():
+    for module in ("kvm_intel", "kvm_amd"):
+        try:
+            value = Path(f"/sys/module/{module}/parameters/nested").read_text().strip()
+        except OSError:
+            continue
+        return value in ("Y", "1")
+    return None
+
+
+def kvm_status(device="/dev/kvm"):
+    flags = cpu_flags()
+    if not os.path.exists(device):
+        if flags and not flags & {"vmx", "svm"} and host_arch_code() in ("x86_64", "i386"):
+            return False, "the CPU reports no VT-x/AMD-V (missing or disabled in firmware)"
+        return False, f"{device} not found (is the kvm_intel/kvm_amd module loaded?)"
+    if not os.access(device, os.R_OK | os.W_OK):
+        return False, f"no read/write access to {device} (add your user to the 'kvm' group)"
+    reason = f"{device} is accessible"
+    if "hypervisor" in flags:
+        reason += ", running nested inside another hypervisor"
+    if kvm_nested():
+        reason += ", nested virtualization available to guests"
+    return True, reason
+
+
+def binary_accels(qemu_bin, probe=True):
+    # "-accel help" output cached per binary path + mtime; None when the binary can't be run.
+    # With probe=False nothing is run: None until a probe has filled the cache.
+    executable = resolve_qemu_binary(qemu_bin)
+    if not executable:
+        return None
+    try:
+        stamp = os.stat(executable).st_mtime_ns
+    except OSError:
+        return None
+    cached = _accel_help_cache.get(executable)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    if not probe:
+        return None
+    try:
+        out = subprocess.run([executable, "-accel", "help"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError) as exc:
+        print(f"Accel probe error: {exc}")
+        return None
+    accels = [line.strip() for line in out.splitlines()[1:] if line.strip()]
+    _accel_help_cache[executable] = (stamp, accels)
+    return accels
+
+
+def detect_accelerators(arch_code, qemu_bin="", probe=True):
+    # Returns (accelerators fastest first, reason for the first one)
+    qemu_bin = qemu_bin or f"qemu-system-{arch_code}"
+    supported = binary_accels(qemu_bin, probe)
+    hw_accels = [a for a in OS_ACCELS.get(platform.system(), [])
+                 if supported is None or a in supported]
+    if supported:
+        hw_accels += [a for a in supported if a not in hw_accels and a not in ("tcg", "qtest")]
+    # What "auto" picks for this guest on this host
+    tcg = f"{tcg_thread_mode(arch_code)}-threaded TCG"
+    if not is_native_arch(arch_code):
+        return ["tcg"], f"{arch_code} guest on a {host_arch_code()} host: emulated with {tcg}"
+    if supported is not None and not hw_accels:
+        return ["tcg"], f"{Path(qemu_bin).name} was built without hardware acceleration; using {tcg}"
+    if "kvm" in hw_accels:
+        usable, why = kvm_status()
+        if usable:
+            return hw_accels + ["tcg"], f"KVM: {why}"
+        return [a for a in hw_accels if a != "kvm"] + ["tcg", "kvm"], f"KVM unusable: {why}; falling back"
+    if hw_accels:
+        return hw_accels + ["tcg"], f"{hw_accels[0]}: native {arch_code} on {platform.system()}"
+    return ["tcg"], f"no hardware accelerator for this host; using {tcg}"
+
+
+# CPU model resolution (query-cpu-definitions / query-cpu-model-expansion)
+CPU_PROFILE_DIR = "cpu_profiles"
+GENERIC_CPU_MODELS = {"host", "max", "base", "qemu64", "qemu32", "kvm64", "kvm32"}
+# Boolean expansion properties that aren't guest-visible instruction set features
+NON_FEATURE_PROPS = {"migratable", "check", "enforce", "pmu", "lmce", "invtsc", "l3-cache", "fill-mtrr-mask",
+                     "full-cpuid-auto-level", "cpuid-0xb", "legacy-cache", "vmware-cpuid-freq", "tcg-cpuid",
+                     "kvm", "hypervisor"}
+NON_FEATURE_PREFIXES = ("hv-", "kvm-", "kvmclock", "x-", "host-")
+
+
+def cpu_features(props):
+    return sorted(k for k, v in props.items()
+                  if v is True and k not in NON_FEATURE_PROPS and not k.startswith(NON_FEATURE_PREFIXES))
+
+
+def cpu_model_string(model, extras):
+    return ",".join([model] + [f"{feature}=on" for feature in extras])
+
+
+def cpu_profile_path(base_path, executable):
+    key = hashlib.sha1(executable.encode()).hexdigest()[:8]
+    return Path(base_path) / CPU_PROFILE_DIR / f"{socket.gethostname()}-{key}.json"
+
+
+def probe_cpu_profile(qemu_bin, accel="kvm", timeout=30.0):
+    executable = resolve_qemu_binary(qemu_bin)
+    if not executable:
+        raise FileNotFoundError(f"QEMU binary not found: {qemu_bin}")
+    port = find_free_port()
+    proc = subprocess.Popen([executable, "-machine", "none", "-nodefaults", "-display", "none",
+                             "-accel", accel] + qmp_args(port),
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with QmpClient(port, timeout=timeout) as client:
+            client.connect(wait=10.0)
+            top = "max" if accel == "tcg" else "host"
+            host = client.execute("query-cpu-model-expansion", {"type": "full", "model": {"name": top}})
+            model_features = {}
+            for definition in client.execute("query-cpu-definitions"):
+                name = definition["name"]
+                # Aliases ("Haswell" -> "Haswell-v1") would only duplicate work
+                if definition.get("unavailable-features") or definition.get("alias-of") or name in GENERIC_CPU_MODELS:
+                    continue
+                if definition.get("deprecated"):
+                    continue
+                expansion = client.execute("query-cpu-model-expansion", {"type": "full", "model": {"name": name}})
+                model_features[name] = cpu_features(expansion["model"]["props"])
+            try:
+                client.execute("quit")
+            except (OSError, QmpError):
+                pass
+    finally:
+        try:
+            proc.wait(5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+    host_features = cpu_features(host["model"]["props"])
+    profile = {
+        "host": socket.gethostname(),
+        "binary": executable,
+        "binary_mtime": os.stat(executable).st_mtime_ns,
+        "accel": accel,
+        "probed_at": time.time(),
+        "host_features": host_features,
+        "model_features": model_features,
+    }
+    profile.update(best_cpu_model(profile))
+    return profile
+
+
+def best_cpu_model(profile, candidates=None, host_features=None):
+    # The runnable named model with the most features, topped up with host features it lacks
+    models = profile["model_features"]
+    candidates = sorted(models if candidates is None else candidates)
+    if not candidates:
+        return {"best_model": "", "extras": [], "model_string": ""}
+    best = max(candidates, key=lambda name: len(models[name]))
+    extras = sorted(set(profile["host_features"] if host_features is None else host_features) - set(models[best]))
+    return {"best_model": best, "extras": extras, "model_string": cpu_model_string(best, extras)}
+
+
+def load_cpu_profile(base_path, qemu_bin):
+    executable = resolve_qemu_binary(qemu_bin)
+    if not executable:
+        return None
+    try:
+        with open(cpu_profile_path(base_path, executable), "r", encoding='utf-8') as f:
+            profile = json.load(f)
+    except (OSError, JSONDecodeError):
+        return None
+    try:
+        if profile.get("binary_mtime") != os.stat(executable).st_mtime_ns:
+            return None
+    except OSError:
+        return None
+    return profile
+
+
+def save_cpu_profile(base_path, profile):
+    path = cpu_profile_path(base_path, profile["binary"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding='utf-8') as f:
+        json.dump(profile, f, indent=4)
+    return path
+
+
+def load_cluster_profiles(base_path):
+    # Newest profile per host; profiles from other hosts are copied into the same folder
+    latest = {}
+    for path in sorted((Path(base_path) / CPU_PROFILE_DIR).glob("*.json")):
+        try:
+            with open(path, "r", encoding='utf-8') as f:
+                profile = json.load(f)
+        except (OSError, JSONDecodeError):
+            continue
+        host = profile.get("host", path.stem)
+        if "model_features" in profile and profile.get("probed_at", 0) >= latest.get(host, {}).get("probed_at", 0):
+            latest[host] = profile
+    return list(latest.values())
+
+
+def cluster_cpu_baseline(profiles, local=None):
+    # Named models runnable everywhere, plus only the features every host has
+    if not profiles:
+        return None
+    local = local or profiles[0]
+    common = set(local["model_features"])
+    shared = set(local["host_features"])
+    for profile in profiles:
+        common &= set(profile["model_features"])
+        shared &= set(profile["host_features"])
+    if not common:
+        return None
+    return best_cpu_model(local, common, shared)
+
+
+class AccelProbeWorker(QThread):
+    # "-accel help" runs the QEMU binary, which can be slow or hang: fill the cache off the GUI thread
+    def __init__(self, arch_code, qemu_bin, parent=None):
+        super().__init__(parent)
+        self.qemu_bin = qemu_bin or f"qemu-system-{arch_code}"
+
+    def run(self):
+        binary_accels(self.qemu_bin)
+
+
+class CpuProbeWorker(QThread):
+    done = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, base_path, qemu_bin, accel, parent=None):
+        super().__init__(parent)
+        self.base_path = base_path
+        self.qemu_bin = qemu_bin
+        self.accel = accel
+
+    def run(self):
+        try:
+            profile = probe_cpu_profile(self.qemu_bin, self.accel)
+            profile["path"] = str(save_cpu_profile(self.base_path, profile))
+            self.done.emit(profile)
+        except (OSError, QmpError, ValueError, KeyError, TypeError, subprocess.SubprocessError) as exc:
+            self.failed.emit(str(exc))
+
+
+# TCG tuning for emulated guests
+# Guests whose QEMU target supports multi-threaded TCG
+MTTCG_TARGETS = {"x86_64", "i386", "aarch64", "arm", "riscv64", "riscv32", "ppc64", "ppc", "s390x",
+                 "mips64", "mips64el", "mips", "mipsel", "loongarch64", "sparc64", "alpha", "hppa", "xtensa"}
+# Hosts with weakly ordered memory can't safely run strongly ordered (x86) guests in parallel
+TSO_GUESTS = {"x86_64", "i386", "s390x", "sparc64"}
+TCG_ARCH_DEFAULTS = {
+    "x86_64": {"machine": "q35", "cpu": "max", "machines": ("q35", "pc", "microvm")},
+    "i386": {"machine": "pc", "cpu": "max", "machines": ("q35", "pc", "microvm")},
+    "aarch64": {"machine": "virt", "cpu": "max,pauth-impdef=on", "machines": ("virt",)},
+    "arm": {"machine": "virt", "cpu": "max", "machines": ("virt",)},
+    "riscv64": {"machine": "virt", "cpu": "rv64", "machines": ("virt",)},
+    "riscv32": {"machine": "virt", "cpu": "rv32", "machines": ("virt",)},
+}
+# Targets that share CPU model names
+CPU_FAMILIES = {"i386": "x86_64"}
+
+
+def tcg_thread_mode(arch_code, requested="auto", icount=""):
+    if icount:
+        return "single"  # -icount only works with a single TCG thread
+    if requested in ("multi", "single"):
+        return requested
+    if arch_code not in MTTCG_TARGETS:
+        return "single"
+    if arch_code in TSO_GUESTS and host_arch_code() not in ("x86_64", "i386", "s390x"):
+        return "single"
+    return "multi"
+
+
+def tcg_accel_options(cfg):
+    arch_code = ARCH_MAP.get(cfg.get("arch", ""), cfg.get("arch", "") or "x86_64")
+    icount = cfg.get("icount", "").strip()
+    opts = f"tcg,thread={tcg_thread_mode(arch_code, cfg.get('tcg_thread', 'auto'), icount)}"
+    # 0 = QEMU's own default; the argv only changes when a size was chosen
+    tb_size = int(cfg.get("tcg_tb_size", 0))
+    if tb_size:
+        opts += f",tb-size={tb_size}"
+    return opts
+
+
+# Boot-time benchmarks
+BENCH_FILE = "bench.jsonl"
+BENCH_METRICS = [("spawn_ms", "Process spawn"), ("qmp_ms", "QMP ready"),
+                 ("first_output_ms", "First output"), ("ready_ms", "Ready marker")]
+
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[max(0, min(len(ordered) - 1, -(-len(ordered) * pct // 100) - 1))]
+
+
+def summarize(samples, key):
+    values = [s[key] for s in samples if s.get(key) is not None]
+    if not values:
+        return None
+    return {"n": len(values), "min": min(values), "median": percentile(values, 50), "p95": percentile(values, 95)}
+
+
+def qemu_version_string(greeting):
+    version = ((greeting or {}).get("QMP", {}).get("version") or {}).get("qemu")
+    if not version:
+        return ""
+    return f"{version.get('major', 0)}.{version.get('minor', 0)}.{version.get('micro', 0)}"
+
+
+def bench_config(cfg, headless=True):
+    # Runs must not touch the VM's disks and may not daemonize away from us
+    bench = dict(cfg, snapshot=True, daemonize=False, pidfile="", S=False, pool_state="")
+    if headless:
+        bench["display"] = "none"
+    return bench
+
+
+def append_bench_results(vm_dir, records):
+    try:
+        with open(Path(vm_dir) / BENCH_FILE, "a", encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    except OSError as exc:
+        print(f"Benchmark save error: {exc}")
+
+
+def load_bench_history(vm_dir):
+    records = []
+    try:
+        with open(Path(vm_dir) / BENCH_FILE, "r", encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+class BootBenchmark(QObject):
+    progress = Signal(str)
+    sample_done = Signal(str, object)
+    done = Signal(object)
+    qmp_ready = Signal(int, float, str)
+
+    def __init__(self, runs=5, marker=DEFAULT_BOOT_MARKER, timeout_s=120, parent=None):
+        super().__init__(parent)
+        self.runs = runs
+        self.marker = re.compile(marker or DEFAULT_BOOT_MARKER)
+        self.timeout_s = timeout_s
+        self.queue = deque()
+        self.results = {}
+        self.current = None
+        self.run_id = 0
+        self.cancelled = threading.Event()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+        self.qmp_ready.connect(self.on_qmp_ready)
+
+    def start(self, variants):
+        # Interleave A/B runs so host noise (thermal, cache, other load) hits both equally
+        self.results = {label: [] for label, _cfg in variants}
+        self.queue = deque((label, cfg) for _ in range(self.runs) for label, cfg in variants)
+        self.cancelled.clear()
+        self.next_run()
+
+    def cancel(self):
+        self.queue.clear()
+        self.cancelled.set()
+        if self.current is not None:
+            self.finish_run("cancelled")
+
+    def next_run(self):
+        if not self.queue:
+            self.done.emit(self.results)
+            return
+        label, cfg = self.queue.popleft()
+        self.run_id += 1
+        port = find_free_port()
+        try:
+            args = build_command(cfg) + qmp_args(port)
+        except ValueError as exc:
+            self.progress.emit(str(exc))
+            self.queue.clear()
+            self.done.emit(self.results)
+            return
+        executable_path = resolve_qemu_binary(str(args[0]))
+        if not executable_path:
+            self.progress.emit(f"QEMU binary not found: {args[0]}")
+            self.queue.clear()
+            self.done.emit(self.results)
+            return
+        proc = QProcess(self)
+        proc.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        self.current = {"label": label, "proc": proc, "tail": "", "run_id": self.run_id,
+                        "sample": {"label": label, "binary": executable_path, "qemu": "", "error": "",
+                                   "spawn_ms": None, "qmp_ms": None, "first_output_ms": None, "ready_ms": None}}
+        proc.started.connect(lambda: self.mark("spawn_ms"))
+        proc.readyReadStandardOutput.connect(self.on_output)
+        proc.finished.connect(lambda _code, _status, p=proc: self.on_finished(p))
+        proc.errorOccurred.connect(lambda err, p=proc: self.on_finished(p) if err == QProcess.ProcessError.FailedToStart else None)
+        done = len(self.results[label]) + 1
+        self.progress.emit(f"{label}: run {done}/{self.runs}")
+        self.t0 = time.perf_counter()
+        proc.start(executable_path, [str(arg) for arg in args[1:]])
+        self.timer.start(self.timeout_s * 1000)
+        threading.Thread(target=self.wait_qmp, args=(port, self.run_id, self.t0), daemon=True).start()
+
+    def wait_qmp(self, port, run_id, t0):
+        deadline = time.monotonic() + self.timeout_s
+        while not self.cancelled.is_set() and time.monotonic() < deadline and run_id == self.run_id:
+            try:
+                with QmpClient(port, timeout=2.0) as client:
+                    client.connect()
+                    elapsed = (time.perf_counter() - t0) * 1000
+                    self.qmp_ready.emit(run_id, elapsed, qemu_version_string(client.greeting))
+                return
+            except (OSError, QmpError, ValueError):
+                time.sleep(0.01)
+
+    def on_qmp_ready(self, run_id, elapsed, version):
+        if self.current is not None and self.current["run_id"] == run_id:
+            self.current["sample"]["qmp_ms"] = elapsed
+            self.current["sample"]["qemu"] = version
+            if self.current["sample"]["ready_ms"] is not None:
+                self.finish_run()
+
+    def on_timeout(self):
+        if self.current is not None:
+            self.finish_run("" if self.current["sample"]["ready_ms"] is not None else "timeout")
+
+    def mark(self, key):
+        if self.current is not None and self.current["sample"][key] is None:
+            self.current["sample"][key] = (time.perf_counter() - self.t0) * 1000
+
+    def on_output(self):
+        if self.current is None:
+            return
+        text = self.current["proc"].readAllStandardOutput().data().decode(errors='replace')
+        if not text:
+            return
+        self.mark("first_output_ms")
+        self.current["tail"] = (self.current["tail"] + text)[-4096:]
+        if self.current["sample"]["ready_ms"] is None and self.marker.search(self.current["tail"]):
+            self.mark("ready_ms")
+            if self.current["sample"]["qmp_ms"] is None:
+                self.timer.start(2000)  # give QMP a moment to come up before stopping the run
+            else:
+                self.finish_run()
+
+    def on_finished(self, proc):
+        if self.current is not None and self.current["proc"] is proc:
+            self.finish_run("QEMU exited before the ready marker: " + self.current["tail"].strip()[-200:])
+        proc.deleteLater()
+        QTimer.singleShot(200, self.next_run)  # let the host settle between runs
+
+    def finish_run(self, error=""):
+        current, self.current = self.current, None
+        if current is None:
+            return
+        self.timer.stop()
+        current["sample"]["error"] = error
+        current["sample"]["time"] = time.time()
+        self.results[current["label"]].append(current["sample"])
+        self.sample_done.emit(current["label"], current["sample"])
+        if current["proc"].state() != QProcess.ProcessState.NotRunning:
+            current["proc"].kill()
+
+
+# Launching VMs outside the editor (bulk launch, pools, ...)
+def resolve_qemu_binary(qemu_bin):
+    executable_path = shutil.which(qemu_bin)
+    # Fallback for Windows if only name is provided
+    if not executable_path and platform.system() == "Windows" and not qemu_bin.lower().endswith(".exe"):
+        executable_path = shutil.which(qemu_bin + ".exe")
+    if not executable_path and Path(qemu_bin).exists():
+        executable_path = str(Path(qemu_bin))
+    return executable_path
+
+
+def read_meminfo():
+    values = {}
+    try:
+        with open("/proc/meminfo", "r", encoding='utf-8') as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                values[key] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+def host_resources():
+    # Free RAM / hugepages in MiB and the 1-minute load average
+    meminfo = read_meminfo()
+    if psutil is not None:
+        vm = psutil.virtual_memory()
+        mem_available = vm.available // (1024 * 1024)
+        mem_total = vm.total // (1024 * 1024)
+    else:
+        mem_available = meminfo.get("MemAvailable", 0) // 1024
+        mem_total = meminfo.get("MemTotal", 0) // 1024
+    huge_kb = meminfo.get("Hugepagesize", 0)
+    try:
+        load1 = os.getloadavg()[0]
+    except (OSError, AttributeError):
+        load1 = psutil.cpu_percent() / 100 * (os.cpu_count() or 1) if psutil is not None else 0.0
+    return {
+        "mem_available_mb": mem_available,
+        "mem_total_mb": mem_total,
+        "hugepages_free_mb": meminfo.get("HugePages_Free", 0) * huge_kb // 1024,
+        "hugepages_total_mb": meminfo.get("HugePages_Total", 0) * huge_kb // 1024,
+        "cpu_count": os.cpu_count() or 1,
+        "load1": load1,
+    }
+
+
+def uses_hugepages(cfg):
+    return "huge" in cfg.get("mem_path", "").lower()
+
+
+def _shift_hostfwd(hostfwd, offset):
+    # tcp::2222-:22 -> tcp::2223-:22 so instances don't fight over host ports
+    return re.sub(r"(^|,)((?:tcp|udp)?:[^:,]*:)(\d+)-",
+                  lambda m: f"{m.group(1)}{m.group(2)}{int(m.group(3)) + offset}-", hostfwd)
+
+
+def instance_configs(cfg, count):
+    # N copies of one config; copies share the disks, so they run in -snapshot mode.
+    # Supervised instances have to stay in the foreground: no -daemonize, no shared -pidfile.
+    if count <= 1:
+        return [dict(cfg, pidfile="", daemonize=False)]
+    result = []
+    for i in range(count):
+        inst = dict(cfg)
+        inst["name"] = f"{cfg.get('name') or 'vm'}-{i + 1}"
+        inst["uuid"] = ""
+        inst["pidfile"] = ""
+        inst["daemonize"] = False
+        inst["snapshot"] = True
+        shift_ports(inst, i)
+        result.append(inst)
+    return result
+
+
+def shift_ports(cfg, offset):
+    # Host-side ports (hostfwd, VNC display) of a copy, so copies don't fight over them
+    if cfg.get("hostfwd"):
+        cfg["hostfwd"] = _shift_hostfwd(cfg["hostfwd"], offset)
+    m = re.match(r"^(.*):(\d+)(.*)$", cfg.get("vnc", ""))
+    if m:
+        cfg["vnc"] = f"{m.group(1)}:{int(m.group(2)) + offset}{m.group(3)}"
+
+
+def load_saved_config(base_path, name):
+    try:
+        with open(Path(base_path) / name / "config.json", "r", encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, JSONDecodeError) as exc:
+        print(f"Load error: {exc}")
+        return None
+
+
+def config_fingerprint(cfg):
+    # UI-only settings don't change what QEMU runs
+    relevant = {k: v for k, v in cfg.items()
+                if k not in ("lang_idx", "intuitive", "suspend_compress", "restart_policy", "restart_max", "restart_window")}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+
+
+# Config edit history: a step keeps only the fields it changed (as (old, new) pairs), and consecutive
+# steps share the value objects, so hundreds of steps per VM cost little more than the edits themselves
+HISTORY_LIMIT = 500
+HISTORY_COALESCE_S = 1.5
+HISTORY_VMS = 20
+HISTORY_IGNORED = ("lang_idx", "intuitive")
+
+
+class ConfigHistory:
+    def __init__(self, cfg, limit=HISTORY_LIMIT, coalesce_s=HISTORY_COALESCE_S):
+        self.current = dict(cfg)
+        self.undo_steps = deque(maxlen=limit)
+        self.redo_steps = []
+        self.coalesce_s = coalesce_s
+        self.last_edit = 0.0
+
+    def record(self, cfg, now=None):
+        now = time.monotonic() if now is None else now
+        changes = {key: (self.current.get(key), value) for key, value in cfg.items()
+                   if key not in HISTORY_IGNORED and self.current.get(key) != value}
+        if not changes:
+            return False
+        self.current.update({key: new for key, (_old, new) in changes.items()})
+        last = self.undo_steps[-1] if self.undo_steps else None
+        if (last is not None and not self.redo_steps and now - self.last_edit < self.coalesce_s
+                and changes.keys() == last.keys()):
+            # Typing into the same field: extend the previous step instead of adding one per keystroke
+            for key, (_old, new) in changes.items():
+                last[key] = (last[key][0], new)
+            if all(old == new for old, new in last.values()):
+                self.undo_steps.pop()
+        else:
+            self.undo_steps.append(changes)
+        self.redo_steps.clear()
+        self.last_edit = now
+        return True
+
+    def undo(self):
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.current.update({key: old for key, (old, _new) in step.items()})
+        self.redo_steps.append(step)
+        self.last_edit = 0.0
+        return dict(self.current)
+
+    def redo(self):
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.current.update({key: new for key, (_old, new) in step.items()})
+        self.undo_steps.append(step)
+        self.last_edit = 0.0
+        return dict(self.current)
+
+
+# VM templates: built-in definitions plus user JSON files, each optionally extending another template
+TEMPLATE_DIR = "templates"
+
+MACOS_EXTRA = [
+    "-smbios type=2",
+    "-global ICH9-LPC.acpi-pci-hotplug-with-bridge-support=off",
+    "-device pcie-root-port,id=pcie.1,bus=pcie.0,slot=1,chassis=1",
+    "-device pcie-root-port,id=pcie.2,bus=pcie.0,slot=2,chassis=2",
+    "# --- MacOS Boot & Storage Configuration ---",
+    "# You MUST provide paths to these files for macOS to boot:",
+    "# -drive if=pflash,format=raw,readonly=on,file=\"OVMF_CODE.fd\"",
+    "# -drive if=pflash,format=raw,file=\"OVMF_VARS-1024x768.fd\"",
+    "# -device ide-hd,bus=sata.2,drive=OpenCoreBoot",
+    "# -drive id=OpenCoreBoot,if=none,snapshot=on,format=qcow2,file=\"OpenCore.qcow2\"",
+    "# -device ide-hd,bus=sata.3,drive=InstallMedia",
+    "# -drive id=InstallMedia,if=none,snapshot=on,format=raw,file=\"BaseSystem.img\"",
+    "# -device ide-hd,bus=sata.4,drive=SystemDisk",
+    "# -drive id=SystemDisk,if=none,format=qcow2,file=\"mac_hdd_ng.img\""
+]
+
+BUILTIN_TEMPLATES = {
+    "x86_64-desktop": {
+        "abstract": True,
+        "config": {
+            "arch": "x86_64", "machine": "q35", "cpu": "host", "ram": 2048, "smp": 2,
+            "net_type": "user", "net_device": "virtio-net-pci", "display": "gtk", "vga": "virtio"
+        }
+    },
+    "Debian Linux": {"extends": "x86_64-desktop", "tags": ["linux", "debian"], "config": {"name": "Debian_VM"}},
+    "Fedora Linux": {"extends": "x86_64-desktop", "tags": ["linux", "fedora"], "config": {"name": "Fedora_VM", "ram": 4096}},
+    "Arch Linux": {"extends": "x86_64-desktop", "tags": ["linux", "arch"], "config": {"name": "Arch_VM"}},
+    "Windows 10/11": {
+        "extends": "x86_64-desktop",
+        "tags": ["windows"],
+        "config": {
+            "name": "Windows_VM", "ram": 4096, "smp": 4, "net_device": "e1000-82545em", "vga": "qxl",
+            "usb": True, "usb_device": "usb-tablet"
+        }
+    },
+    "MacOS (OSX-KVM)": {
+        "extends": "x86_64-desktop",
+        "tags": ["macos", "kvm"],
+        "description": "Settings from the OSX-KVM project",
+        "config": {
+            "name": "MacOS_VM", "mode": 1, "accel": "kvm", "ram": 4096, "smp": 4,
+            "cpu": "Haswell-noTSX,vendor=GenuineIntel,+invtsc,vmware-cpuid-freq=on,+ssse3,+sse4.2,+popcnt,+avx,+aes,+xsave,+xsaveopt,check,kvm=on",
+            "net_device": "vmxnet3", "hostfwd": "tcp::2222-:22", "vga": "vmware", "usb": True, "usb_device": "usb-tablet",
+            "device_extra": "isa-applesmc,osk=\"ourhardworkbythesewordsguardedpleasedontsteal(c)AppleComputerInc\"",
+            "nodefaults": True, "extra": "\n".join(MACOS_EXTRA)
+        },
+        "notes": (
+            "MacOS template applied! 🚀\n\n"
+            "Settings adjusted to match OSX-KVM project requirements:\n"
+            "• Mode: Virtualization (KVM)\n"
+            "• CPU: Haswell-noTSX (with invtsc and kvm=on)\n"
+            "• Machine: q35\n"
+            "• Net: vmxnet3\n"
+            "• SMC: OSK string included\n\n"
+            "Note: You still need to provide:\n"
+            "1. OpenCore boot image (BaseSystem.img)\n"
+            "2. MacOS Virtual Disk (qcow2)\n"
+            "3. OVMF UEFI Firmware\n\n"
+            "Recommended host tweak:\n"
+            "sudo modprobe kvm; echo 1 | sudo tee /sys/module/kvm/parameters/ignore_msrs"
+        )
+    }
+}
+
+
+class TemplateRegistry:
+    # User templates are <name>.json files: {"extends": ..., "tags": [...], "description": ..., "config": {...}}.
+    # Nothing is read until the first lookup; after that the directory is only re-read when a file changes.
+    def __init__(self, user_dir, builtins=BUILTIN_TEMPLATES):
+        self.user_dir = Path(user_dir)
+        self.builtins = builtins
+        self.templates = None
+        self.signature = None
+        self.resolved = {}
+        self.index = None
+        self.errors = []
+
+    def scan(self):
+        try:
+            entries = sorted((e.name, e.stat().st_mtime_ns) for e in os.scandir(self.user_dir) if e.name.endswith(".json"))
+        except OSError:
+            entries = []
+        if self.templates is not None and entries == self.signature:
+            return
+        templates = {name: dict(t, name=name, source="built-in") for name, t in self.builtins.items()}
+        self.errors = []
+        for file_name, _ in entries:
+            path = self.user_dir / file_name
+            try:
+                with open(path, "r", encoding='utf-8') as f:
+                    data = json.load(f)
+                if not isinstance(data, dict) or not isinstance(data.get("config", {}), dict):
+                    raise ValueError("expected an object with a \"config\" object")
+            except (OSError, ValueError) as exc:
+                self.errors.append(f"{file_name}: {exc}")
+                continue
+            name = data.get("name") or path.stem
+            templates[name] = dict(data, name=name, source=str(path))
+        self.templates = templates
+        self.signature = entries
+        self.resolved = {}
+        self.index = None
+
+    def resolve(self, name, chain=()):
+        if name in self.resolved:
+            return self.resolved[name]
+        if name in chain:
+            raise ValueError(f"template inheritance loop: {' -> '.join(chain + (name,))}")
+        template = self.templates.get(name)
+        if template is None:
+            raise KeyError(f"unknown template '{name}'" + (f" (extended by '{chain[-1]}')" if chain else ""))
+        config = {}
+        tags = []
+        if template.get("extends"):
+            parent = self.resolve(template["extends"], chain + (name,))
+            config.update(parent["config"])
+            tags += parent["tags"]
+        config.update(template.get("config", {}))
+        tags += [tag for tag in template.get("tags", []) if tag not in tags]
+        resolved = dict(template, config=config, tags=tags)
+        self.resolved[name] = resolved
+        return resolved
+
+    def get(self, name):
+        self.scan()
+        return self.resolve(name)
+
+    def build_index(self):
+        # (kind, value) -> names, kinds being "arch" and "tag"; abstract and broken templates are left out
+        self.index = {}
+        for name, template in self.templates.items():
+            if template.get("abstract"):
+                continue
+            try:
+                resolved = self.resolve(name)
+            except (KeyError, ValueError) as exc:
+                self.errors.append(f"{name}: {exc.args[0]}")
+                continue
+            self.index.setdefault(("all", ""), []).append(name)
+            self.index.setdefault(("arch", resolved["config"].get("arch", "")), []).append(name)
+            for tag in resolved["tags"]:
+                self.index.setdefault(("tag", tag.lower()), []).append(name)
+
+    def find(self, text="", arch="", tag=""):
+        self.scan()
+        if self.index is None:
+            self.build_index()
+        names = self.index.get(("all", ""), [])
+        for key in [("arch", arch)] * bool(arch) + [("tag", tag.lower())] * bool(tag):
+            matching = set(self.index.get(key, []))
+            names = [n for n in names if n in matching]
+        text = text.strip().lower()
+        if text:
+            names = [n for n in names if text in n.lower() or any(text in t.lower() for t in self.resolved[n]["tags"])]
+        return names
+
+    def architectures(self):
+        self.find()
+        return sorted(value for kind, value in self.index if kind == "arch" and value)
+
+
+# Host capacity planning over the saved VM library
+_requirements_cache = {}
+
+
+def vm_requirements(base_path, name):
+    # Parsed configs are cached by mtime/size; disks go through the inspect_image cache
+    cfg_path = os.path.join(base_path, name, "config.json")
+    try:
+        st = os.stat(cfg_path)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _requirements_cache.get(cfg_path)
+    if cached is None or cached[0] != stamp:
+        cfg = load_saved_config(base_path, name)
+        if cfg is None:
+            return None
+        # Hand-edited or imported configs may hold anything: leave such a VM out of the plan
+        try:
+            ram = int(cfg.get("ram", 2048))
+            cached = (stamp, {
+                "name": name,
+                "ram_mb": ram,
+                "vcpus": int(cfg.get("smp", 2)),
+                "hugepages_mb": ram if uses_hugepages(cfg) else 0,
+                "disks": [cfg.get(key, "").strip() for key in ["hda", "hdb", "hdc", "hdd"] if cfg.get(key, "").strip()],
+            })
+        except (TypeError, ValueError, AttributeError) as exc:
+            print(f"Capacity error: {name}: invalid config ({exc})")
+            return None
+        _requirements_cache[cfg_path] = cached
+    req = dict(cached[1], disk_virtual=0, disk_allocated=0)
+    for path in req["disks"]:
+        info = inspect_image(path)
+        if info:
+            req["disk_virtual"] += info["virtual_size"]
+            req["disk_allocated"] += info["allocated_size"]
+    return req
+
+
+def library_requirements(base_path, names=None):
+    if names is None:
+        names = [entry.name for entry in os.scandir(base_path) if entry.is_dir()]
+    return [req for req in (vm_requirements(base_path, name) for name in names) if req is not None]
+
+
+def plan_capacity(reqs, host, running=(), reserve_mb=512):
+    totals = {key: sum(req[key] for req in reqs)
+              for key in ("ram_mb", "vcpus", "hugepages_mb", "disk_virtual", "disk_allocated")}
+    mem_total = host.get("mem_total_mb") or 1
+    disk_capacity = totals["disk_allocated"] + host.get("disk_free", 0)
+    report = dict(totals, count=len(reqs),
+                  ram_ratio=totals["ram_mb"] / mem_total,
+                  vcpu_ratio=totals["vcpus"] / host["cpu_count"],
+                  hugepages_ratio=(totals["hugepages_mb"] / host["hugepages_total_mb"] if host["hugepages_total_mb"]
+                                   else float("inf") if totals["hugepages_mb"] else 0.0),
+                  disk_ratio=totals["disk_virtual"] / disk_capacity if disk_capacity else 0.0,
+                  startable=[], blocked={})
+    # Running VMs are already accounted for in the host's free memory
+    for req in reqs:
+        if req["name"] in running:
+            report["blocked"][req["name"]] = "running"
+            continue
+        reasons = []
+        if req["hugepages_mb"]:
+            if req["hugepages_mb"] > host["hugepages_free_mb"]:
+                reasons.append(f"needs {req['hugepages_mb']} MiB hugepages, {host['hugepages_free_mb']} free")
+        elif req["ram_mb"] + reserve_mb > host["mem_available_mb"]:
+            reasons.append(f"needs {req['ram_mb']} MiB RAM, {host['mem_available_mb']} available")
+        if req["vcpus"] > host["cpu_count"]:
+            reasons.append(f"{req['vcpus']} vCPUs > {host['cpu_count']} host CPUs")
+        if reasons:
+            report["blocked"][req["name"]] = "; ".join(reasons)
+        else:
+            report["startable"].append(req["name"])
+    return report
+
+
+# Kernel samepage merging (KSM)
+KSM_SYSFS = "/sys/kernel/mm/ksm"
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def sparkline(values):
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return "".join(SPARK_CHARS[int((v - low) * (len(SPARK_CHARS) - 1) / span)] for v in values)
+
+
+class KsmControl:
+    TUNABLES = ("run", "pages_to_scan", "sleep_millisecs")
+    COUNTERS = ("pages_shared", "pages_sharing", "pages_unshared", "pages_volatile", "full_scans")
+
+    def __init__(self, sysfs_root=KSM_SYSFS, history=120):
+        self.root = Path(sysfs_root)
+        self.history = deque(maxlen=history)
+
+    def available(self):
+        return (self.root / "run").is_file()
+
+    def read(self, key):
+        try:
+            return int((self.root / key).read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key, value):
+        if key not in self.TUNABLES:
+            raise ValueError(f"unknown KSM tunable: {key}")
+        (self.root / key).write_text(f"{int(value)}\n")
+
+    def settings(self):
+        return {key: self.read(key) for key in self.TUNABLES}
+
+    def sample(self):
+        stats = {key: self.read(key) or 0 for key in self.COUNTERS}
+        # pages_sharing counts the duplicates that now point at a shared page, i.e. pages saved
+        stats["saved_bytes"] = stats["pages_sharing"] * mmap.PAGESIZE
+        self.history.append((time.time(), stats["pages_shared"], stats["pages_sharing"]))
+        return stats
+
+
+# Memory balloon auto-balancing driven by host memory pressure
+BALLOON_QOM_PATH = "/machine/peripheral/balloon0"
+PSI_MEMORY = "/proc/pressure/memory"
+MIB = 1024 * 1024
+
+
+def read_memory_pressure(path=PSI_MEMORY):
+    # "some avg10=1.53 avg60=0.87 avg300=0.20 total=1234" -> {"some": 1.53, "full": ...}
+    pressure = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                kind, *fields = line.split()
+                values = dict(field.split("=", 1) for field in fields)
+                pressure[kind] = float(values.get("avg10", 0))
+    except (OSError, ValueError):
+        return None
+    return pressure
+
+
+def host_memory_pressure(high=10.0):
+    pressure = read_memory_pressure()
+    if pressure is not None:
+        return pressure.get("some", 0.0)
+    # No PSI (old kernel, not Linux): treat less than 10% available RAM as high pressure
+    info = read_meminfo()
+    total = info.get("MemTotal", 0)
+    if total and info.get("MemAvailable", total) < total * 0.1:
+        return high
+    return 0.0
+
+
+def balloon_target(actual_mb, available_mb, min_mb, max_mb, pressure, low=1.0, high=10.0):
+    if pressure >= high:
+        if available_mb is None:
+            return None
+        # Take back half of what the guest itself reports as available
+        target = actual_mb - available_mb // 2
+    elif pressure <= low:
+        if available_mb is not None and available_mb >= actual_mb * 0.15:
+            return None
+        target = actual_mb + max(256, actual_mb // 4) if available_mb is not None else max_mb
+    else:
+        return None
+    target = max(min_mb, min(max_mb, target))
+    return target if abs(target - actual_mb) >= 64 else None
+
+
+class BalloonBalancer(QThread):
+    adjusted = Signal(str, int, int)
+
+    def __init__(self, interval=5.0, low=1.0, high=10.0, parent=None):
+        super().__init__(parent)
+        self.interval = interval
+        self.low = low
+        self.high = high
+        self.targets = {}
+        self.polling = set()
+        self.warnings = PollWarnings("Balloon")
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def set_target(self, port, name, min_mb, max_mb):
+        with self.lock:
+            self.targets[port] = (name, min_mb, max_mb)
+        if not self.isRunning():
+            self.stopping.clear()
+            self.start()
+
+    def remove_target(self, port):
+        with self.lock:
+            self.targets.pop(port, None)
+            self.polling.discard(port)
+
+    def stop(self):
+        self.stopping.set()
+        self.wait()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.balance()
+
+    def balance(self):
+        pressure = host_memory_pressure(self.high)
+        with self.lock:
+            targets = dict(self.targets)
+        for port, (name, min_mb, max_mb) in targets.items():
+            job = monitor_busy(port)
+            if job:
+                self.warnings.warn(name, f"monitor busy with {job}, not balancing")
+                continue
+            try:
+                self.balance_one(port, name, min_mb, max_mb, pressure)
+                self.warnings.clear(name)
+            except (OSError, QmpError, ValueError, KeyError, TypeError) as exc:
+                self.warnings.warn(name, f"error: {exc}")
+
+    def balance_one(self, port, name, min_mb, max_mb, pressure):
+        with QmpClient(port, timeout=2.0) as client:
+            client.connect()
+            if port not in self.polling:
+                client.execute("qom-set", {"path": BALLOON_QOM_PATH, "property": "guest-stats-polling-interval",
+                                           "value": max(1, int(self.interval))})
+                self.polling.add(port)
+            actual_mb = client.execute("query-balloon")["actual"] // MIB
+            stats = client.execute("qom-get", {"path": BALLOON_QOM_PATH, "property": "guest-stats"}).get("stats", {})
+            available = stats.get("stat-available-memory", -1)  # -1 until the guest driver reports
+            target = balloon_target(actual_mb, available // MIB if available >= 0 else None,
+                                    min_mb, max_mb, pressure, self.low, self.high)
+            if target is not None:
+                client.execute("balloon", {"value": target * MIB})
+                self.adjusted.emit(name, actual_mb, target)
+
+
+# Block I/O statistics (QMP query-blockstats)
+BLOCKSTATS_INTERVAL = 10  # seconds; QEMU-side averaging window for queue depth (stats-intervals)
+BLOCKSTATS_HISTORY = 150
+BLOCKSTATS_COUNTERS = ("rd_operations", "wr_operations", "rd_bytes", "wr_bytes", "rd_total_time_ns", "wr_total_time_ns")
+
+
+def blockstats_rates(prev, cur, elapsed):
+    # prev/cur are the "stats" of one device from two query-blockstats calls `elapsed` seconds apart
+    delta = {key: cur.get(key, 0) - prev.get(key, 0) for key in BLOCKSTATS_COUNTERS}
+    if elapsed <= 0 or min(delta.values()) < 0:
+        return None  # counters went backwards: the drive was reopened
+    ops = delta["rd_operations"] + delta["wr_operations"]
+    # Only drives launched with stats-intervals (plain -hdX disks aren't) report a queue depth
+    timed = (cur.get("timed_stats") or [None])[0]
+    return {
+        "read_iops": delta["rd_operations"] / elapsed,
+        "write_iops": delta["wr_operations"] / elapsed,
+        "read_bps": delta["rd_bytes"] / elapsed,
+        "write_bps": delta["wr_bytes"] / elapsed,
+        "latency_ms": (delta["rd_total_time_ns"] + delta["wr_total_time_ns"]) / ops / 1e6 if ops else 0.0,
+        "queue_depth": (timed.get("avg_rd_queue_depth", 0.0) + timed.get("avg_wr_queue_depth", 0.0)
+                        if timed else None),
+    }
+
+
+class VmStatsSampler(QThread):
+    # Polls every running VM from a worker thread and keeps a ring buffer of rates per (VM, device).
+    # read(port, name, info) returns raw counters per device (None if the VM has none);
+    # rates(prev, cur, elapsed) turns two readings into a series entry (None to drop it).
+    sampled = Signal()
+
+    def __init__(self, read, rates, interval=2.0, history=BLOCKSTATS_HISTORY, parent=None):
+        super().__init__(parent)
+        self.read = read
+        self.rates = rates
+        self.interval = interval
+        self.history = history
+        self.targets = {}
+        self.last = {}
+        self.series = {}
+        self.unavailable = set()
+        self.warnings = PollWarnings(type(self).__name__)
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def set_target(self, port, name, **info):
+        with self.lock:
+            self.targets[port] = (name, info)
+        if not self.isRunning():
+            self.stopping.clear()
+            self.start()
+
+    def remove_target(self, port):
+        with self.lock:
+            name = self.targets.pop(port, (None, None))[0]
+            self.last.pop(port, None)
+            self.unavailable.discard(name)
+            for key in [k for k in self.series if k[0] == name]:
+                del self.series[key]
+
+    def stop(self):
+        self.stopping.set()
+        self.wait()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            self.sample_all()
+
+    def sample_all(self):
+        with self.lock:
+            targets = dict(self.targets)
+        for port, (name, info) in targets.items():
+            job = monitor_busy(port)
+            if job:
+                self.warnings.warn(name, f"monitor busy with {job}, skipping samples")
+                continue
+            try:
+                self.sample_one(port, name, info)
+                self.warnings.clear(name)
+            except (OSError, QmpError, ValueError, KeyError, TypeError) as exc:
+                self.warnings.warn(name, f"error: {exc}")
+        self.sampled.emit()
+
+    def sample_one(self, port, name, info):
+        current = self.read(port, name, info)
+        now = time.monotonic()
+        with self.lock:
+            if self.targets.get(port, (None,))[0] != name:
+                return
+            if current is None:
+                self.unavailable.add(name)
+                return
+            prev_time, prev = self.last.get(port, (None, {}))
+            self.last[port] = (now, current)
+            for device, counters in current.items():
+                if device not in prev:
+                    continue
+                rates = self.rates(prev[device], counters, now - prev_time)
+                if rates is not None:
+                    self.series.setdefault((name, device), deque(maxlen=self.history)).append((now, rates))
+
+    def snapshot(self):
+        with self.lock:
+            return {key: list(samples) for key, samples in self.series.items()}, set(self.unavailable)
+
+
+def read_blockstats(port, name, info):
+    with QmpClient(port, timeout=2.0) as client:
+        client.connect()
+        entries = client.execute("query-blockstats")
+    return {entry.get("device") or entry.get("qdev") or entry.get("node-name", "?"): entry["stats"]
+            for entry in entries}
+
+
+class BlockStatsSampler(VmStatsSampler):
+    def __init__(self, **kwargs):
+        super().__init__(read_blockstats, blockstats_rates, **kwargs)
+
+
+# Network throughput (host side of tap/bridge backends)
+NET_SYSFS = "/sys/class/net"
+NET_COUNTER_BACKENDS = ("tap", "bridge")
+
+
+def tap_interfaces_of(pid):
+    # Every tap QEMU holds, including ones opened by qemu-bridge-helper: tun fds list "iff: <name>" in fdinfo
+    names = []
+    try:
+        fds = os.listdir(f"/proc/{pid}/fdinfo")
+    except OSError:
+        return names
+    for fd in fds:
+        try:
+            with open(f"/proc/{pid}/fdinfo/{fd}", "r", encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith("iff:"):
+                        names.append(line.split()[1])
+        except (OSError, IndexError):
+            continue
+    return sorted(set(names))
+
+
+def tap_interfaces_hmp(client):
+    # Fallback without /proc access: "net0: index=0,type=tap,ifname=tap0,script=..." from HMP info network
+    text = client.execute("human-monitor-command", {"command-line": "info network"})
+    return sorted(set(re.findall(r"\bifname=([^,\s]+)", text)))
+
+
+def read_net_counters(ifname, sysfs_root=NET_SYSFS):
+    # The tap's transmit side is what the guest receives, so swap directions to get the guest's view
+    stats = Path(sysfs_root) / ifname / "statistics"
+    values = []
+    for counter in ("tx_bytes", "rx_bytes", "tx_packets", "rx_packets"):
+        with open(stats / counter, "r", encoding='utf-8') as f:
+            values.append(int(f.read()))
+    return tuple(values)
+
+
+def net_rates(prev, cur, elapsed):
+    delta = [c - p for p, c in zip(prev, cur)]
+    if elapsed <= 0 or min(delta) < 0:
+        return None
+    return tuple(value / elapsed for value in delta)
+
+
+class NetStatsSampler(VmStatsSampler):
+    # Series entries are compact tuples: (rx bytes/s, tx bytes/s, rx packets/s, tx packets/s) as seen by the guest
+    def __init__(self, sysfs_root=NET_SYSFS, **kwargs):
+        super().__init__(self.read_counters, net_rates, **kwargs)
+        self.sysfs_root = sysfs_root
+        self.ifnames = {}
+
+    def remove_target(self, port):
+        super().remove_target(port)
+        self.ifnames.pop(port, None)
+
+    def read_counters(self, port, name, info):
+        if info.get("net_type") not in NET_COUNTER_BACKENDS:
+            return None  # user/socket/stream/vde have no host interface to count on
+        ifnames = self.ifnames.get(port)
+        if not ifnames:
+            ifnames = tap_interfaces_of(info["pid"]) if info.get("pid") else []
+            if not ifnames:
+                with QmpClient(port, timeout=2.0) as client:
+                    client.connect()
+                    ifnames = tap_interfaces_hmp(client)
+            self.ifnames[port] = ifnames
+        try:
+            return {ifname: read_net_counters(ifname, self.sysfs_root) for ifname in ifnames}
+        except OSError:
+            self.ifnames.pop(port, None)  # the tap went away; look it up again next time
+            raise
+
+
+# Prometheus metrics exporter (HTTP on localhost and/or a node_exporter textfile)
+METRICS_PREFIX = "mgui_qemu"
+
+
+def prometheus_escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_metrics(families):
+    # families: {name: (type, help, [(labels, value), ...])} in the Prometheus text exposition format
+    lines = []
+    for name, (kind, text, samples) in families.items():
+        lines.append(f"# HELP {METRICS_PREFIX}_{name} {text}")
+        lines.append(f"# TYPE {METRICS_PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{prometheus_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{METRICS_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                         else f"{METRICS_PREFIX}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, text):
+    # node_exporter may read at any moment, so replace the file atomically
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class MetricsExporter(QThread):
+    # Collects on its own thread every `interval` seconds; scrapes only ever read the cached text
+    def __init__(self, port=None, textfile=None, interval=10.0, sysfs_root=NET_SYSFS, parent=None):
+        super().__init__(parent)
+        self.port = port
+        self.textfile = textfile
+        self.interval = interval
+        self.sysfs_root = sysfs_root
+        self.targets = {}
+        self.restarts = {}
+        self.launch_latency = {}
+        self.ifnames = {}
+        self.warnings = PollWarnings("Metrics")
+        self.collect_duration = 0.0
+        self.text = format_metrics({})
+        self.server = None
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def start_exporting(self):
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    with exporter.lock:
+                        body = exporter.text.encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.stopping.clear()
+        self.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.wait()
+
+    def set_target(self, qmp_port, name, pid=None, net_type="user"):
+        with self.lock:
+            self.restarts[name] = self.restarts.get(name, -1) + 1
+            self.launch_latency.pop(name, None)
+            self.targets[qmp_port] = {"name": name, "pid": pid, "net_type": net_type,
+                                      "started": time.monotonic()}
+        threading.Thread(target=self.measure_launch, args=(qmp_port, name), daemon=True).start()
+
+    def remove_target(self, qmp_port):
+        with self.lock:
+            self.targets.pop(qmp_port, None)
+            self.ifnames.pop(qmp_port, None)
+
+    def measure_launch(self, qmp_port, name):
+        # Launch latency: from spawning QEMU until its QMP monitor answers
+        with self.lock:
+            started = self.targets.get(qmp_port, {}).get("started", time.monotonic())
+        try:
+            with QmpClient(qmp_port, timeout=5.0) as client:
+                client.connect(wait=60.0)
+        except (OSError, QmpError, ValueError):
+            return
+        with self.lock:
+            self.launch_latency[name] = time.monotonic() - started
+
+    def run(self):
+        while True:
+            self.collect()
+            if self.stopping.wait(self.interval):
+                return
+
+    def collect_vm(self, qmp_port, target):
+        vm = {"up": 0, "state": None, "rtt": None, "block": [], "net": {}, "cpu": None, "rss": None}
+        job = monitor_busy(qmp_port)
+        if job:
+            # Our own job holds the monitor: the VM is up, its QMP-based series just pause
+            vm["up"] = 1
+            self.warnings.warn(target["name"], f"monitor busy with {job}, skipping QMP metrics")
+        else:
+            self.collect_qmp(qmp_port, target, vm)
+        if psutil is not None and target["pid"]:
+            try:
+                proc = psutil.Process(target["pid"])
+                with proc.oneshot():
+                    times = proc.cpu_times()
+                    vm["cpu"] = times.user + times.system
+                    vm["rss"] = proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return vm
+
+    def collect_qmp(self, qmp_port, target, vm):
+        try:
+            with QmpClient(qmp_port, timeout=2.0) as client:
+                client.connect()
+                t0 = time.perf_counter()
+                vm["state"] = client.execute("query-status")["status"]
+                vm["rtt"] = time.perf_counter() - t0
+                vm["up"] = 1
+                vm["block"] = client.execute("query-blockstats")
+                if target["net_type"] in NET_COUNTER_BACKENDS:
+                    ifnames = self.ifnames.get(qmp_port)
+                    if not ifnames:
+                        ifnames = (tap_interfaces_of(target["pid"]) if target["pid"] else []) or tap_interfaces_hmp(client)
+                        self.ifnames[qmp_port] = ifnames
+                    for ifname in ifnames:
+                        try:
+                            vm["net"][ifname] = read_net_counters(ifname, self.sysfs_root)
+                        except OSError:
+                            self.ifnames.pop(qmp_port, None)
+            self.warnings.clear(target["name"])
+        except (OSError, QmpError, ValueError, KeyError, TypeError) as exc:
+            self.warnings.warn(target["name"], f"error: {exc}")
+
+    def collect(self):
+        t0 = time.perf_counter()
+        with self.lock:
+            targets = {port: dict(target) for port, target in self.targets.items()}
+            restarts = dict(self.restarts)
+            launch_latency = dict(self.launch_latency)
+        families = {
+            "vm_up": ("gauge", "1 if the VM's QMP monitor answered the last collection "
+                               "(or was busy with a snapshot/suspend job).", []),
+            "vm_state": ("gauge", "Run state reported by QMP query-status.", []),
+            "vm_uptime_seconds": ("gauge", "Seconds since the launcher started this QEMU process.", []),
+            "vm_restarts_total": ("counter", "Times this VM was launched again by this launcher.", []),
+            "vm_cpu_seconds_total": ("counter", "User+system CPU time of the QEMU process.", []),
+            "vm_resident_memory_bytes": ("gauge", "Resident set size of the QEMU process.", []),
+            "block_bytes_total": ("counter", "Bytes transferred per disk (query-blockstats).", []),
+            "block_ops_total": ("counter", "I/O operations per disk (query-blockstats).", []),
+            "block_time_seconds_total": ("counter", "Time spent on I/O per disk (query-blockstats).", []),
+            "net_bytes_total": ("counter", "Bytes per tap interface, seen from the guest.", []),
+            "net_packets_total": ("counter", "Packets per tap interface, seen from the guest.", []),
+            "launch_latency_seconds": ("gauge", "Time from spawning QEMU until its QMP monitor answered.", []),
+            "qmp_rtt_seconds": ("gauge", "Round trip time of a QMP query-status.", []),
+        }
+        now = time.monotonic()
+        for port, target in targets.items():
+            name = target["name"]
+            vm = self.collect_vm(port, target)
+            labels = {"vm": name}
+            families["vm_up"][2].append((labels, vm["up"]))
+            if vm["state"]:
+                families["vm_state"][2].append(({"vm": name, "state": vm["state"]}, 1))
+            families["vm_uptime_seconds"][2].append((labels, now - target["started"]))
+            families["vm_restarts_total"][2].append((labels, restarts.get(name, 0)))
+            if vm["cpu"] is not None:
+                families["vm_cpu_seconds_total"][2].append((labels, vm["cpu"]))
+                families["vm_resident_memory_bytes"][2].append((labels, vm["rss"]))
+            for entry in vm["block"]:
+                device = entry.get("device") or entry.get("qdev") or entry.get("node-name", "?")
+                stats = entry["stats"]
+                for op, prefix in (("read", "rd"), ("write", "wr")):
+                    op_labels = {"vm": name, "device": device, "op": op}
+                    families["block_bytes_total"][2].append((op_labels, stats.get(f"{prefix}_bytes", 0)))
+                    families["block_ops_total"][2].append((op_labels, stats.get(f"{prefix}_operations", 0)))
+                    families["block_time_seconds_total"][2].append(
+                        (op_labels, stats.get(f"{prefix}_total_time_ns", 0) / 1e9))
+            for ifname, (rx_bytes, tx_bytes, rx_packets, tx_packets) in vm["net"].items():
+                for direction, nbytes, packets in (("rx", rx_bytes, rx_packets), ("tx", tx_bytes, tx_packets)):
+                    dir_labels = {"vm": name, "interface": ifname, "direction": direction}
+                    families["net_bytes_total"][2].append((dir_labels, nbytes))
+                    families["net_packets_total"][2].append((dir_labels, packets))
+            if name in launch_latency:
+                families["launch_latency_seconds"][2].append((labels, launch_latency[name]))
+            if vm["rtt"] is not None:
+                families["qmp_rtt_seconds"][2].append((labels, vm["rtt"]))
+        families["vms"] = ("gauge", "QEMU processes managed by this launcher.", [({}, len(targets))])
+        families["collect_duration_seconds"] = ("gauge", "Duration of the previous metrics collection.",
+                                                [({}, self.collect_duration)])
+        text = format_metrics(families)
+        self.collect_duration = time.perf_counter() - t0
+        with self.lock:
+            self.text = text
+        if self.textfile:
+            try:
+                write_textfile(self.textfile, text)
+            except OSError as exc:
+                print(f"Metrics textfile error: {exc}")
+
+
+# Lifecycle event journal: one append-only JSONL file per VM, written by a background thread
+JOURNAL_DIR = "journal"
+JOURNAL_MAX_BYTES = 4 * 1024 * 1024
+JOURNAL_KEEP = 3
+
+
+def journal_path(base_path, name, generation=0):
+    stem = re.sub(r"[^\w.-]", "_", name or "vm")
+    return Path(base_path) / JOURNAL_DIR / (f"{stem}.{generation}.jsonl" if generation else f"{stem}.jsonl")
+
+
+class EventJournal:
+    def __init__(self, base_path, max_bytes=JOURNAL_MAX_BYTES, keep=JOURNAL_KEEP):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def record(self, name, event, **fields):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        self.queue.put((name, {"ts": round(time.time(), 3), "vm": name, "event": event, **fields}))
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(5)
+            self.thread = None
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            # Batch whatever else is queued so a burst of events costs one open/write per VM
+            batch = [item]
+            while item is not None and len(batch) < 1000:
+                try:
+                    item = self.queue.get(timeout=0.2)
+                except queue.Empty:
+                    break
+                batch.append(item)
+            per_vm = {}
+            for entry in batch:
+                if entry is not None:
+                    per_vm.setdefault(entry[0], []).append(json.dumps(entry[1]) + "\n")
+            for name, lines in per_vm.items():
+                try:
+                    self.write(name, "".join(lines))
+                except OSError as exc:
+                    print(f"Journal {name} error: {exc}")
+            if batch[-1] is None:
+                return
+
+    def write(self, name, text):
+        path = journal_path(self.base_path, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if path.stat().st_size >= self.max_bytes:
+                for generation in range(self.keep - 1, 0, -1):
+                    older = journal_path(self.base_path, name, generation)
+                    if older.exists():
+                        os.replace(older, journal_path(self.base_path, name, generation + 1))
+                os.replace(path, journal_path(self.base_path, name, 1))
+        except FileNotFoundError:
+            pass
+        with open(path, "a", encoding='utf-8') as f:
+            f.write(text)
+
+
+class JournalSession:
+    # One QEMU process. A second QMP monitor stays connected for the whole run, so no event is missed
+    # while the main monitor is busy serving short-lived clients.
+    def __init__(self, journal, name):
+        self.journal = journal
+        self.name = name
+        self.event_port = find_free_port()
+        self.started = None
+        self.shutdown_reason = None
+
+    def args(self):
+        return qmp_args(self.event_port)
+
+    def launched(self, args, pid):
+        self.started = time.monotonic()
+        # Monitor ports are random per launch, so they are left out of the hash
+        argv = [str(arg) for arg in args]
+        argv = [arg for i, arg in enumerate(argv) if arg != "-qmp" and (i == 0 or argv[i - 1] != "-qmp")]
+        argv_sha1 = hashlib.sha1("\0".join(argv).encode()).hexdigest()
+        self.journal.record(self.name, "launch", pid=pid, argv_sha1=argv_sha1)
+        threading.Thread(target=self.listen, daemon=True).start()
+
+    def listen(self):
+        try:
+            with QmpClient(self.event_port, timeout=5.0) as client:
+                client.connect(wait=60.0)
+                self.journal.record(self.name, "qmp_ready", boot_s=round(time.monotonic() - self.started, 3),
+                                    qemu=qemu_version_string(client.greeting))
+                client.sock.settimeout(None)
+                pending = client.events
+                while True:
+                    for msg in pending:
+                        if msg["event"] == "SHUTDOWN":
+                            self.shutdown_reason = msg.get("data", {}).get("reason")
+                        self.journal.record(self.name, "qmp_event", qmp_event=msg["event"], data=msg.get("data", {}))
+                    pending = [msg for msg in [client._read_message()] if "event" in msg]
+        except (OSError, QmpError, ValueError):
+            return
+
+    def booted(self, boot_s):
+        self.journal.record(self.name, "userspace", boot_s=round(boot_s, 3))
+
+    def finished(self, code, crashed):
+        uptime = time.monotonic() - self.started if self.started is not None else 0.0
+        self.journal.record(self.name, "exit", exit_code=code, crashed=crashed or code != 0,
+                            uptime_s=round(uptime, 3), shutdown_reason=self.shutdown_reason)
+
+
+def read_journal(base_path, since=0.0, events=(), name=None):
+    # Files (rotated ones included) untouched since `since` are skipped by mtime, and lines are
+    # filtered on the raw text before being parsed, so scanning a day of history stays cheap.
+    folder = Path(base_path) / JOURNAL_DIR
+    if not folder.is_dir():
+        return
+    needles = [f'"event": "{event}"' for event in events]
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if not entry.name.endswith(".jsonl") or entry.stat().st_mtime < since:
+            continue
+        with open(entry.path, "r", encoding='utf-8') as f:
+            for line in f:
+                if needles and not any(needle in line for needle in needles):
+                    continue
+                try:
+                    rec = json.loads(line)
+                except JSONDecodeError:
+                    continue
+                if rec.get("ts", 0) >= since and (name is None or rec.get("vm") == name):
+                    yield rec
+
+
+def journal_report(base_path, since):
+    # Per VM: launches, crashes, boot times (time to userspace when known, otherwise to QMP ready)
+    report = {}
+    boots = {}
+    for rec in read_journal(base_path, since, ("launch", "exit", "qmp_ready", "userspace")):
+        vm = report.setdefault(rec["vm"], {"launches": 0, "crashes": [], "boot_s": []})
+        if rec["event"] == "launch":
+            vm["launches"] += 1
+        elif rec["event"] == "exit" and rec.get("crashed"):
+            vm["crashes"].append(rec)
+        elif rec["event"] in ("qmp_ready", "userspace"):
+            boots.setdefault(rec["vm"], {})[rec["event"]] = rec["boot_s"]
+        if rec["event"] == "exit":
+            boot = boots.pop(rec["vm"], {})
+            if boot:
+                vm["boot_s"].append(boot.get("userspace", boot.get("qmp_ready")))
+    for name, boot in boots.items():
+        report[name]["boot_s"].append(boot.get("userspace", boot.get("qmp_ready")))
+    return report
+
+
+def print_journal_report(base_path, hours):
+    report = journal_report(base_path, time.time() - hours * 3600)
+    print(f"{'VM':<24} {'Launches':>8} {'Crashes':>8} {'Median boot':>12}  Last crash")
+    for name in sorted(report, key=lambda n: (-len(report[n]["crashes"]), n)):
+        vm = report[name]
+        boot = f"{percentile(vm['boot_s'], 50):.2f} s" if vm["boot_s"] else "-"
+        last = vm["crashes"][-1] if vm["crashes"] else None
+        last_text = (f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last['ts']))} "
+                     f"code {last['exit_code']} {last.get('shutdown_reason') or ''}") if last else ""
+        print(f"{name:<24} {vm['launches']:>8} {len(vm['crashes']):>8} {boot:>12}  {last_text}")
+    return 0
+
+
+# Restart policies for service VMs: exponential backoff with jitter, giving up on crash loops
+RESTART_POLICIES = ("never", "on-failure", "always")
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+RESTART_STABLE_AFTER = 60.0
+
+
+def restart_backoff(attempt, base=RESTART_BACKOFF_BASE, cap=RESTART_BACKOFF_MAX):
+    # Half of the delay is random, so VMs that died together (host OOM, storage hiccup) don't restart in lockstep
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RestartPolicy:
+    def __init__(self, policy="never", max_restarts=5, window=300.0):
+        self.policy = policy if policy in RESTART_POLICIES else "never"
+        self.max_restarts = max_restarts
+        self.window = window
+        self.restarts = deque()
+        self.attempt = 0
+        self.crash_loop = False
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(cfg.get("restart_policy", "never"), cfg.get("restart_max", 5), cfg.get("restart_window", 300))
+
+    def next_delay(self, code, crashed, uptime, now=None):
+        # Seconds to wait before restarting, or None to leave the VM stopped
+        self.crash_loop = False
+        if self.policy == "never" or (self.policy == "on-failure" and code == 0 and not crashed):
+            return None
+        now = time.monotonic() if now is None else now
+        while self.restarts and now - self.restarts[0] > self.window:
+            self.restarts.popleft()
+        if len(self.restarts) >= self.max_restarts:
+            self.crash_loop = True
+            return None
+        # A VM that stayed up for a while starts over with a short delay
+        if uptime >= RESTART_STABLE_AFTER:
+            self.attempt = 0
+        delay = restart_backoff(self.attempt)
+        self.attempt += 1
+        self.restarts.append(now)
+        return delay
+
+
+class ManagedVm:
+    def __init__(self, name, cfg, args, process, qmp_port=None):
+        self.name = name
+        self.cfg = cfg
+        self.args = args
+        self.process = process
+        self.qmp_port = qmp_port
+        self.started_at = time.monotonic()
+        self.journal_session = None
+        self.extra_args = ()
+        self.stopping = False
+
+
+def instance_name(cfg):
+    # "instance" tells apart copies that run under the same -name (e.g. pooled ones)
+    return cfg.get("instance") or cfg.get("name") or "vm"
+
+
+class VmSupervisor(QObject):
+    instance_started = Signal(str)
+    instance_finished = Signal(str, int)
+    instance_output = Signal(str, str)
+    restart_scheduled = Signal(str, int, float)
+    crash_loop = Signal(str, int)
+
+    def __init__(self, parent=None, journal=None, base_path=None):
+        super().__init__(parent)
+        self.instances = {}
+        self.journal = journal
+        self.base_path = base_path
+        self.policies = {}
+        self.pending_restarts = {}
+        self.scheduler = None
+
+    def is_running(self, name):
+        return name in self.instances
+
+    def launch(self, cfg, extra_args=(), restart=False):
+        name = instance_name(cfg)
+        if name in self.instances:
+            raise RuntimeError(f"VM '{name}' is already running")
+        self.cancel_restart(name)
+        if not restart or name not in self.policies:
+            self.policies[name] = RestartPolicy.from_config(cfg)
+        qmp_port = find_free_port()
+        try:
+            args = build_command(cfg) + qmp_args(qmp_port) + list(extra_args)
+        except ValueError as exc:
+            raise RuntimeError(str(exc)) from exc
+        executable_path = resolve_qemu_binary(str(args[0]))
+        if not executable_path:
+            raise FileNotFoundError(f"QEMU binary not found: {args[0]}")
+        state = saved_state_for(self.base_path, cfg)
+        if state is not None and not state[2]:
+            self.instance_output.emit(name, "Configuration changed since the VM was suspended: discarding the saved state")
+            discard_state(state[0])
+            state = None
+        if state is not None:
+            args += incoming_args(state[0], state[1])
+        session = JournalSession(self.journal, name) if self.journal is not None else None
+        if session is not None:
+            args += session.args()
+        proc = QProcess(self)
+        proc.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
+        vm = ManagedVm(name, cfg, args, proc, qmp_port)
+        vm.journal_session = session
+        vm.extra_args = tuple(extra_args)
+        proc.readyReadStandardOutput.connect(lambda: self.instance_output.emit(
+            name, proc.readAllStandardOutput().data().decode(errors='replace')))
+        proc.finished.connect(lambda code, status: self.on_finished(
+            name, code, status == QProcess.ExitStatus.CrashExit))
+        proc.errorOccurred.connect(lambda err: self.on_error(name, err))
+        self.instances[name] = vm
+        proc.start(executable_path, [str(arg) for arg in args[1:]])
+        if session is not None:
+            session.launched(args, proc.processId())
+        if state is not None:
+            worker = SuspendWorker("resume", qmp_port, state[0], state[1], parent=self)
+            worker.done.connect(lambda elapsed: self.instance_output.emit(name, f"Resumed from {state[0]} in {elapsed}"))
+            worker.failed.connect(lambda msg: self.instance_output.emit(name, f"Resume failed: {msg}"))
+            worker.finished.connect(worker.deleteLater)
+            worker.start()
+        self.instance_started.emit(name)
+        return vm
+
+    def on_error(self, name, error):
+        if error == QProcess.ProcessError.FailedToStart:
+            vm = self.instances.get(name)
+            if vm is not None:
+                self.instance_output.emit(name, f"Failed to start QEMU: {vm.process.errorString()}")
+            self.on_finished(name, -1, True)
+
+    def on_finished(self, name, code, crashed=False):
+        vm = self.instances.pop(name, None)
+        if vm is None:
+            return
+        if vm.journal_session is not None:
+            vm.journal_session.finished(code, crashed)
+        vm.process.deleteLater()
+        # Schedule before announcing the exit, so listeners already see the pending restart
+        if not vm.stopping:
+            self.schedule_restart(vm, code, crashed)
+        self.instance_finished.emit(name, code)
+
+    def schedule_restart(self, vm, code, crashed):
+        policy = self.policies.get(vm.name)
+        if policy is None:
+            return
+        delay = policy.next_delay(code, crashed, time.monotonic() - vm.started_at)
+        if delay is None:
+            if policy.crash_loop:
+                self.record(vm.name, "crash_loop", restarts=len(policy.restarts), window_s=policy.window)
+                self.crash_loop.emit(vm.name, len(policy.restarts))
+            return
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self.restart(vm))
+        timer.start(int(delay * 1000))
+        self.pending_restarts[vm.name] = timer
+        self.record(vm.name, "restart_scheduled", attempt=policy.attempt, delay_s=round(delay, 3))
+        self.restart_scheduled.emit(vm.name, policy.attempt, delay)
+
+    def restart(self, vm):
+        # The VM already reported its exit; a failed restart is only logged, not finished a second time
+        self.pending_restarts.pop(vm.name, None)
+        if self.scheduler is not None:
+            self.scheduler.enqueue([vm.cfg], vm.extra_args, restart=True)
+            return
+        try:
+            self.launch(vm.cfg, vm.extra_args, restart=True)
+        except (RuntimeError, OSError) as exc:
+            self.instance_output.emit(vm.name, f"Restart failed: {exc}")
+
+    def cancel_restart(self, name):
+        timer = self.pending_restarts.pop(name, None)
+        if timer is not None:
+            timer.stop()
+            timer.deleteLater()
+        if self.scheduler is not None:
+            self.scheduler.drop_restart(name)
+
+    def record(self, name, event, **fields):
+        if self.journal is not None:
+            self.journal.record(name, event, **fields)
+
+    def release(self, name):
+        # Hand a running VM over to someone else (e.g. the main window) without stopping it
+        vm = self.instances.pop(name, None)
+        if vm is None:
+            return None
+        vm.process.readyReadStandardOutput.disconnect()
+        vm.process.finished.disconnect()
+        vm.process.errorOccurred.disconnect()
+        return vm
+
+    def stop(self, name):
+        self.cancel_restart(name)
+        vm = self.instances.get(name)
+        if vm is None:
+            return
+        vm.stopping = True
+        vm.process.terminate()
+        if not vm.process.waitForFinished(3000):
+            vm.process.kill()
+
+    def stop_all(self):
+        for name in list(self.pending_restarts):
+            self.cancel_restart(name)
+        for name in list(self.instances):
+            self.stop(name)
+
+
+class BulkLaunchScheduler(QObject):
+    # Admission control: stagger starts, cap concurrent boots and only start a VM
+    # while the host still has RAM/hugepages and CPU headroom for its -m/-smp.
+    status_changed = Signal(str)
+    drained = Signal()
+
+    def __init__(self, supervisor, parent=None):
+        super().__init__(parent)
+        self.supervisor = supervisor
+        self.queue = deque()
+        self.max_concurrent_boots = 4
+        self.stagger_ms = 500
+        self.boot_window_s = 20
+        self.reserve_mb = 1024
+        self.max_load_per_cpu = 1.5
+        self.last_start = 0.0
+        self.booting = {}
+        self.launched = 0
+        self.failed = 0
+        self.skipped = []
+        self.timer = QTimer(self)
+        self.timer.setInterval(200)
+        self.timer.timeout.connect(self.tick)
+        supervisor.instance_finished.connect(lambda name, _code: self.booting.pop(name, None))
+        supervisor.scheduler = self  # restart policies queue up here too
+
+    def enqueue(self, configs, extra_args=(), restart=False):
+        # Entries are (config, extra QEMU args, restart of a supervised VM)
+        self.queue.extend((cfg, tuple(extra_args), restart) for cfg in configs)
+        if not self.timer.isActive():
+            self.timer.start()
+        self.tick()
+
+    def drop_restart(self, name):
+        # A VM stopped or launched by hand while its restart waits in the queue
+        self.queue = deque(entry for entry in self.queue if not (entry[2] and instance_name(entry[0]) == name))
+
+    def clear(self):
+        self.queue.clear()
+        self.skipped = []
+        self.report("Queue cleared")
+
+    def never_fits(self, cfg, host):
+        # Entries the host can't hold even when idle would otherwise block the queue forever
+        try:
+            ram = int(cfg.get("ram", 2048))
+            int(cfg.get("smp", 2))
+        except (TypeError, ValueError):
+            return f"invalid RAM/CPU count ({cfg.get('ram', 2048)!r} MiB, {cfg.get('smp', 2)!r} CPUs)"
+        if uses_hugepages(cfg):
+            if ram > host["hugepages_total_mb"]:
+                return f"needs {ram} MiB of hugepages, the host has {host['hugepages_total_mb']} MiB"
+        elif host["mem_total_mb"] and ram > host["mem_total_mb"] - self.reserve_mb:
+            return f"needs {ram} MiB RAM (+{self.reserve_mb} MiB reserve), the host has {host['mem_total_mb']} MiB"
+        return ""
+
+    def admit(self, cfg, host):
+        # Booting guests haven't touched their RAM yet, so count them as reserved
+        ram = int(cfg.get("ram", 2048))
+        smp = int(cfg.get("smp", 2))
+        booting = [self.supervisor.instances[n].cfg for n in self.booting if n in self.supervisor.instances]
+        reserved = sum(int(c.get("ram", 2048)) for c in booting if not uses_hugepages(c))
+        if uses_hugepages(cfg):
+            reserved_huge = sum(int(c.get("ram", 2048)) for c in booting if uses_hugepages(c))
+            if host["hugepages_free_mb"] - reserved_huge < ram:
+                return False, f"waiting for {ram} MiB of free hugepages"
+        elif host["mem_available_mb"] - reserved - ram < self.reserve_mb:
+            return False, f"waiting for {ram} MiB RAM (+{self.reserve_mb} MiB reserve)"
+        pending_cpu = host["load1"] + sum(int(c.get("smp", 2)) for c in booting) + smp
+        if booting and pending_cpu / host["cpu_count"] > self.max_load_per_cpu:
+            return False, "waiting for CPU load to drop"
+        return True, ""
+
+    def tick(self):
+        now = time.monotonic()
+        for name, started in list(self.booting.items()):
+            if now - started >= self.boot_window_s:
+                del self.booting[name]
+        if not self.queue:
+            if not self.booting:
+                self.timer.stop()
+                self.drained.emit()
+            return
+        if (now - self.last_start) * 1000 < self.stagger_ms:
+            return
+        if len(self.booting) >= self.max_concurrent_boots:
+            self.report(f"{len(self.queue)} queued, {len(self.booting)} booting (limit reached)")
+            return
+        cfg, extra_args, restart = self.queue[0]
+        host = host_resources()
+        reason = self.never_fits(cfg, host)
+        if reason:
+            self.queue.popleft()
+            self.failed += 1
+            self.skipped.append(f"{cfg.get('name')}: {reason}")
+            if restart:
+                self.supervisor.instance_output.emit(instance_name(cfg), f"Restart failed: {reason}")
+            self.report(f"{len(self.queue)} queued, {len(self.booting)} booting")
+            return
+        ok, reason = self.admit(cfg, host)
+        if not ok:
+            self.report(f"{len(self.queue)} queued, {len(self.booting)} booting: {cfg.get('name')} {reason}")
+            return
+        self.queue.popleft()
+        self.last_start = now
+        try:
+            vm = self.supervisor.launch(cfg, extra_args, restart=restart)
+            self.booting[vm.name] = now
+            self.launched += 1
+        except (OSError, RuntimeError) as exc:
+            self.failed += 1
+            if restart:
+                self.supervisor.instance_output.emit(instance_name(cfg), f"Restart failed: {exc}")
+            self.report(f"{cfg.get('name')}: {exc}")
+            return
+        self.report(f"{len(self.queue)} queued, {len(self.booting)} booting, {self.launched} started")
+
+    def report(self, message):
+        if self.skipped:
+            message += "\nSkipped (can never fit on this host):\n" + "\n".join(self.skipped)
+        self.status_changed.emit(message)
+
+
+class WarmPool(QObject):
+    # Keeps `size` paused (-S) copies of one config spawned; acquire() resumes one with QMP "cont".
+    # Pooled copies share the disks, so only configs that already run with -snapshot can be pooled.
+    status_changed = Signal(str)
+    instance_ready = Signal(str)
+    instance_broken = Signal(str, str)
+    instance_resumed = Signal(str, float)
+
+    def __init__(self, supervisor, parent=None):
+        super().__init__(parent)
+        self.supervisor = supervisor
+        self.size = 0
+        self.cfg = None
+        self.fingerprint = None
+        self.spawning = set()
+        self.ready = []
+        self.counter = 0
+        self.failures = 0
+        self.instance_ready.connect(self.on_ready)
+        self.instance_broken.connect(self.on_broken)
+        supervisor.instance_finished.connect(self.on_finished)
+
+    def configure(self, cfg, size):
+        if size and not cfg.get("snapshot", False):
+            self.size = 0
+            self.drain()
+            self.status_changed.emit("Only VMs in Snapshot mode (-snapshot) can be pooled")
+            return
+        fingerprint = config_fingerprint(cfg)
+        if fingerprint != self.fingerprint:
+            self.drain()
+        self.cfg = dict(cfg)
+        self.fingerprint = fingerprint
+        self.size = size
+        self.failures = 0
+        # Shrink from the not-yet-ready end first
+        while len(self.spawning) + len(self.ready) > size:
+            name = self.spawning.pop() if self.spawning else self.ready.pop()
+            self.supervisor.stop(name)
+        self.refill()
+
+    def matches(self, cfg):
+        return self.size > 0 and cfg.get("snapshot", False) and config_fingerprint(cfg) == self.fingerprint
+
+    def refill(self):
+        while self.cfg and self.failures < 3 and len(self.spawning) + len(self.ready) < self.size:
+            if not self.spawn():
+                break
+        self.report()
+
+    def instance_config(self):
+        self.counter += 1
+        name = f"{self.cfg.get('name') or 'vm'}-pool{self.counter}"
+        inst = dict(self.cfg)
+        # The guest keeps its own -name; the supervisor tells the copies apart by "instance".
+        # Offsets start at 1: offset 0 is what a cold boot of the same config binds.
+        inst.update(instance=name, S=True, uuid="", pidfile="", daemonize=False, restart_policy="never")
+        shift_ports(inst, self.counter)
+        return name, inst
+
+    def spawn(self):
+        name, inst = self.instance_config()
+        extra = []
+        state = inst.get("pool_state", "").strip()
+        if state:
+            extra = incoming_args(state, load_state_meta(state))
+        try:
+            vm = self.supervisor.launch(inst, extra)
+        except (OSError, RuntimeError) as exc:
+            self.failures += 1
+            self.status_changed.emit(f"Pool spawn failed: {exc}")
+            return False
+        self.spawning.add(name)
+        threading.Thread(target=self.wait_ready, args=(name, vm.qmp_port, state), daemon=True).start()
+        return True
+
+    def wait_ready(self, name, port, state):
+        # Worker thread: ready once QEMU sits paused (after the incoming migration, if any)
+        try:
+            with MonitorJob(port, "incoming"), QmpClient(port) as client:
+                client.connect(wait=60)
+                if state:
+                    start_deferred_incoming(client, state, load_state_meta(state))
+                deadline = time.monotonic() + 600
+                while True:
+                    status = client.execute("query-status")["status"]
+                    if status in ("prelaunch", "paused"):
+                        break
+                    if status != "inmigrate" or time.monotonic() > deadline:
+                        raise QmpError(f"unexpected VM state '{status}'")
+                    time.sleep(0.05)
+            self.instance_ready.emit(name)
+        except (OSError, QmpError, ValueError) as exc:
+            self.instance_broken.emit(name, str(exc))
+
+    def on_ready(self, name):
+        if name in self.spawning:
+            self.spawning.discard(name)
+            self.ready.append(name)
+            self.failures = 0
+        self.report()
+
+    def on_broken(self, name, reason):
+        if name in self.spawning:
+            self.spawning.discard(name)
+            self.failures += 1
+            self.supervisor.stop(name)
+            self.status_changed.emit(f"Pool instance {name} failed: {reason}")
+
+    def on_finished(self, name, _code):
+        if name in self.spawning or name in self.ready:
+            self.spawning.discard(name)
+            if name in self.ready:
+                self.ready.remove(name)
+            self.failures += 1
+            QTimer.singleShot(1000, self.refill)
+
+    def acquire(self):
+        # Hands out a paused copy right away; "cont" runs on a worker thread and ends in
+        # instance_resumed or instance_broken
+        while self.ready:
+            name = self.ready.pop(0)
+            vm = self.supervisor.instances.get(name)
+            if vm is None:
+                continue
+            threading.Thread(target=self.resume, args=(name, vm.qmp_port), daemon=True).start()
+            QTimer.singleShot(0, self.refill)
+            return vm
+        return None
+
+    def resume(self, name, port):
+        t0 = time.perf_counter()
+        try:
+            qmp_execute(port, "cont", timeout=2)
+        except (OSError, QmpError) as exc:
+            self.instance_broken.emit(name, str(exc))
+            return
+        self.instance_resumed.emit(name, (time.perf_counter() - t0) * 1000)
+
+    def drain(self):
+        members = list(self.spawning) + self.ready
+        self.spawning.clear()
+        self.ready = []
+        for name in members:
+            self.supervisor.stop(name)
+        self.report()
+
+    def report(self):
+        if self.size:
+            self.status_changed.emit(f"{len(self.ready)}/{self.size} ready, {len(self.spawning)} starting")
+        else:
+            self.status_changed.emit("")
+
+
+class BulkLaunchDialog(QDialog):
+    def __init__(self, scheduler, base_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulk Launch")
+        self.scheduler = scheduler
+        self.base_path = base_path
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel("Saved VMs to launch:"))
+        self.vm_select = QListWidget()
+        self.vm_select.setSelectionMode(QListWidget.SelectionMode.MultiSelection)
+        for d in sorted(base_path.iterdir()):
+            if d.is_dir() and (d / "config.json").exists():
+                self.vm_select.addItem(d.name)
+        layout.addWidget(self.vm_select)
+
+        form = QFormLayout()
+        self.f_instances = QSpinBox()
+        self.f_instances.setRange(1, 1000)
+        self.f_max_boots = QSpinBox()
+        self.f_max_boots.setRange(1, 256)
+        self.f_max_boots.setValue(scheduler.max_concurrent_boots)
+        self.f_stagger = QSpinBox()
+        self.f_stagger.setRange(0, 60000)
+        self.f_stagger.setSuffix(" ms")
+        self.f_stagger.setValue(scheduler.stagger_ms)
+        self.f_boot_window = QSpinBox()
+        self.f_boot_window.setRange(1, 600)
+        self.f_boot_window.setSuffix(" s")
+        self.f_boot_window.setValue(scheduler.boot_window_s)
+        self.f_reserve = QSpinBox()
+        self.f_reserve.setRange(0, 1024 * 1024)
+        self.f_reserve.setSuffix(" MB")
+        self.f_reserve.setValue(scheduler.reserve_mb)
+        form.addRow("Instances per VM:", self.f_instances)
+        form.addRow("Max concurrent boots:", self.f_max_boots)
+        form.addRow("Stagger:", self.f_stagger)
+        form.addRow("Boot window:", self.f_boot_window)
+        form.addRow("Host RAM reserve:", self.f_reserve)
+        layout.addLayout(form)
+
+        self.status = QLabel("Idle")
+        self.status.setWordWrap(True)
+        layout.addWidget(self.status)
+        scheduler.status_changed.connect(self.status.setText)
+
+        buttons = QHBoxLayout()
+        btn_start = QPushButton("🚀 Start")
+        btn_start.clicked.connect(self.start)
+        btn_clear = QPushButton("⏹ Clear Queue")
+        btn_clear.clicked.connect(scheduler.clear)
+        btn_stop = QPushButton("🛑 Stop All")
+        btn_stop.clicked.connect(lambda: (scheduler.clear(), scheduler.supervisor.stop_all()))
+        buttons.addWidget(btn_start)
+        buttons.addWidget(btn_clear)
+        buttons.addWidget(btn_stop)
+        layout.addLayout(buttons)
+
+    def start(self):
+        self.scheduler.max_concurrent_boots = self.f_max_boots.value()
+        self.scheduler.stagger_ms = self.f_stagger.value()
+        self.scheduler.boot_window_s = self.f_boot_window.value()
+        self.scheduler.reserve_mb = self.f_reserve.value()
+        configs = []
+        for item in self.vm_select.selectedItems():
+            cfg = load_saved_config(self.base_path, item.text())
+            if cfg is not None:
+                cfg.setdefault("name", item.text())
+                configs.extend(instance_configs(cfg, self.f_instances.value()))
+        if configs:
+            self.scheduler.enqueue(configs)
+
+
+class CapacityDialog(QDialog):
+    def __init__(self, base_path, running, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Capacity Planner")
+        self.resize(760, 520)
+        self.base_path = base_path
+        self.running = running
+        self.reqs = []
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget(0, 6)
+        self.table.setHorizontalHeaderLabels(["VM", "RAM", "vCPUs", "Hugepages", "Disk (virtual / used)", "Start now"])
+        self.table.horizontalHeader().setSectionResizeMode(5, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.itemChanged.connect(lambda item: self.update_summary() if item.column() == 0 else None)
+        layout.addWidget(self.table)
+
+        self.summary = QLabel()
+        self.summary.setWordWrap(True)
+        layout.addWidget(self.summary)
+
+        form = QFormLayout()
+        self.f_reserve = QSpinBox()
+        self.f_reserve.setRange(0, 1024 * 1024)
+        self.f_reserve.setSuffix(" MB")
+        self.f_reserve.setValue(512)
+        self.f_reserve.valueChanged.connect(lambda _: self.update_summary())
+        form.addRow("Host RAM reserve:", self.f_reserve)
+        layout.addLayout(form)
+
+        btn_refresh = QPushButton("🔄 Refresh")
+        btn_refresh.clicked.connect(self.refresh)
+        layout.addWidget(btn_refresh)
+        self.refresh()
+
+    def refresh(self):
+        self.reqs = library_requirements(self.base_path)
+        self.reqs.sort(key=lambda req: req["name"].lower())
+        self.table.blockSignals(True)
+        self.table.setRowCount(len(self.reqs))
+        for row, req in enumerate(self.reqs):
+            item = QTableWidgetItem(req["name"])
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.table.setItem(row, 0, item)
+            values = [f"{req['ram_mb']} MB", str(req["vcpus"]),
+                      f"{req['hugepages_mb']} MB" if req["hugepages_mb"] else "-",
+                      f"{format_size(req['disk_virtual'])} / {format_size(req['disk_allocated'])}", ""]
+            for col, value in enumerate(values, 1):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+        self.table.blockSignals(False)
+        self.update_summary()
+
+    def update_summary(self):
+        t0 = time.perf_counter()
+        selected = [req for row, req in enumerate(self.reqs)
+                    if self.table.item(row, 0).checkState() == Qt.CheckState.Checked]
+        host = host_resources()
+        try:
+            host["disk_free"] = shutil.disk_usage(self.base_path).free
+        except OSError:
+            host["disk_free"] = 0
+        report = plan_capacity(selected, host, self.running(), self.f_reserve.value())
+        elapsed = (time.perf_counter() - t0) * 1000
+        self.table.blockSignals(True)
+        for row, req in enumerate(self.reqs):
+            if req["name"] in report["blocked"]:
+                text = report["blocked"][req["name"]]
+            else:
+                text = "✔" if req["name"] in report["startable"] else ""
+            self.table.item(row, 5).setText(text)
+        self.table.blockSignals(False)
+        self.summary.setText(
+            f"{report['count']} VMs: {report['ram_mb']} MB RAM for {host['mem_total_mb']} MB host "
+            f"(overcommit {report['ram_ratio']:.2f}x), {report['vcpus']} vCPUs for {host['cpu_count']} CPUs "
+            f"({report['vcpu_ratio']:.2f}x), hugepages {report['hugepages_mb']}/{host['hugepages_total_mb']} MB "
+            f"({report['hugepages_ratio']:.2f}x), disks {format_size(report['disk_virtual'])} provisioned / "
+            f"{format_size(report['disk_allocated'])} used, {format_size(host['disk_free'])} free "
+            f"({report['disk_ratio']:.2f}x).\n"
+            f"{len(report['startable'])} can start now ({host['mem_available_mb']} MB RAM available). "
+            f"Computed in {elapsed:.1f} ms."
+        )
+
+
+class BenchmarkDialog(QDialog):
+    def __init__(self, base_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Boot Benchmark")
+        self.resize(720, 560)
+        self.base_path = base_path
+        self.bench = None
+        self.variants = {}
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        names = sorted(d.name for d in base_path.iterdir() if d.is_dir() and (d / "config.json").exists())
+        self.f_vm_a = QComboBox()
+        self.f_vm_a.addItems(names)
+        self.f_vm_a.currentTextChanged.connect(self.show_history)
+        self.f_vm_b = QComboBox()
+        self.f_vm_b.addItems(["(none)"] + names)
+        self.f_runs = QSpinBox()
+        self.f_runs.setRange(1, 1000)
+        self.f_runs.setValue(5)
+        self.f_marker = QLineEdit()
+        self.f_marker.setPlaceholderText(DEFAULT_BOOT_MARKER)
+        self.f_timeout = QSpinBox()
+        self.f_timeout.setRange(1, 3600)
+        self.f_timeout.setValue(120)
+        self.f_timeout.setSuffix(" s")
+        self.f_headless = QCheckBox("Headless (-display none, serial on stdout)")
+        self.f_headless.setChecked(True)
+        form.addRow("VM A:", self.f_vm_a)
+        form.addRow("VM B (compare):", self.f_vm_b)
+        form.addRow("Runs:", self.f_runs)
+        form.addRow("Ready Marker (regex):", self.f_marker)
+        form.addRow("Timeout per run:", self.f_timeout)
+        form.addRow(self.f_headless)
+        layout.addLayout(form)
+
+        buttons = QHBoxLayout()
+        self.btn_start = QPushButton("⏱ Run")
+        self.btn_start.clicked.connect(self.start)
+        self.btn_cancel = QPushButton("✖ Cancel")
+        self.btn_cancel.clicked.connect(lambda: self.bench.cancel() if self.bench else None)
+        buttons.addWidget(self.btn_start)
+        buttons.addWidget(self.btn_cancel)
+        layout.addLayout(buttons)
+
+        self.status = QLabel("Idle")
+        layout.addWidget(self.status)
+        self.table = QTableWidget(len(BENCH_METRICS), 3)
+        self.table.setHorizontalHeaderLabels(["A: min / median / p95", "B: min / median / p95", "Δ median"])
+        self.table.setVerticalHeaderLabels([title for _key, title in BENCH_METRICS])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.history = QPlainTextEdit()
+        self.history.setReadOnly(True)
+        layout.addWidget(self.history)
+        self.show_history()
+
+    def start(self):
+        if self.bench is not None or not self.f_vm_a.currentText():
+            return
+        try:
+            marker = self.f_marker.text().strip() or DEFAULT_BOOT_MARKER
+            re.compile(marker)
+        except re.error as exc:
+            self.status.setText(f"Invalid marker: {exc}")
+            return
+        self.variants = {}
+        for label, name in [("A", self.f_vm_a.currentText()), ("B", self.f_vm_b.currentText())]:
+            if name == "(none)":
+                continue
+            cfg = load_saved_config(self.base_path, name)
+            if cfg is None:
+                self.status.setText(f"Cannot read the configuration of {name}")
+                return
+            cfg.setdefault("name", name)
+            self.variants[label] = (name, cfg)
+        self.table.clearContents()
+        self.bench = BootBenchmark(self.f_runs.value(), marker, self.f_timeout.value(), self)
+        self.bench.progress.connect(self.status.setText)
+        self.bench.done.connect(self.on_done)
+        self.bench.start([(label, bench_config(cfg, self.f_headless.isChecked()))
+                          for label, (_name, cfg) in self.variants.items()])
+
+    def on_done(self, results):
+        def cell(summary):
+            return f"{summary['min']:.0f} / {summary['median']:.0f} / {summary['p95']:.0f} ms" if summary else "-"
+
+        for row, (key, _title) in enumerate(BENCH_METRICS):
+            a = summarize(results.get("A", []), key)
+            b = summarize(results.get("B", []), key)
+            self.table.setItem(row, 0, QTableWidgetItem(cell(a)))
+            self.table.setItem(row, 1, QTableWidgetItem(cell(b)))
+            if a and b and a["median"]:
+                self.table.setItem(row, 2, QTableWidgetItem(f"{(b['median'] - a['median']) / a['median'] * 100:+.1f}%"))
+        for label, samples in results.items():
+            name, cfg = self.variants[label]
+            fingerprint = config_fingerprint(cfg)
+            append_bench_results(self.base_path / name, [dict(s, fingerprint=fingerprint) for s in samples
+                                                         if s["error"] != "cancelled"])
+        failures = sum(1 for samples in results.values() for s in samples if s["error"])
+        self.status.setText(f"Done: {sum(len(s) for s in results.values())} runs, {failures} without a ready marker")
+        self.bench.deleteLater()
+        self.bench = None
+        self.show_history()
+
+    def show_history(self):
+        # Median time-to-ready per QEMU version, so upgrades that regress boot time stand out
+        name = self.f_vm_a.currentText()
+        by_version = {}
+        for record in load_bench_history(self.base_path / name) if name else []:
+            if record.get("ready_ms") is not None:
+                by_version.setdefault(record.get("qemu") or "unknown", []).append(record["ready_ms"])
+        lines = [f"QEMU {version}: median ready {percentile(values, 50):.0f} ms over {len(values)} runs"
+                 for version, values in sorted(by_version.items())]
+        self.history.setPlainText("\n".join(lines) or f"No stored benchmark results for {name}")
+
+
+# Same order as the language combo box
+LANG_CODES = ("en", "ua", "de", "zh", "ru")
+
 
 class MguiQemu(QMainWindow):
     def __init__(self):
@@ -25,6 +4253,25 @@ class MguiQemu(QMainWindow):
         # UI attributes
         self.is_dark = False
         self.vm_list = None
+        self.btn_del_vm = None
+        self.btn_clone_vm = None
+        self.btn_export_vm = None
+        self.copy_worker = None
+        self.copy_progress = None
+        self.btn_bulk_launch = None
+        self.bulk_dialog = None
+        self.btn_capacity = None
+        self.capacity_dialog = None
+        self.btn_benchmark = None
+        self.btn_import_scripts = None
+        self.import_worker = None
+        self.benchmark_dialog = None
+        self.label_warm_pool = None
+        self.f_pool_size = None
+        self.pool_status = None
+        self.pool_resuming = None
+        self.btn_suspend = None
+        self.suspend_worker = None
         self.status_label = None
         self.btn_run = None
         self.tabs = None
@@ -46,6 +4293,17 @@ class MguiQemu(QMainWindow):
         self.f_machine = None
         self.f_cpu = None
         self.f_accel = None
+        self.accel_hint = None
+        self.accel_probe_worker = None
+        self.accel_probe_pending = False
+        self.cpu_family = None
+        self.cpu_resolver_row = None
+        self.btn_cpu_best = None
+        self.btn_cpu_cluster = None
+        self.cpu_probe_worker = None
+        self.f_tcg_thread = None
+        self.f_tcg_tb_size = None
+        self.f_icount = None
         self.f_ram = None
         self.f_smp = None
         self.f_uuid = None
@@ -61,6 +4319,16 @@ class MguiQemu(QMainWindow):
         self.f_mem_path = None
         self.f_mem_prealloc = None
         self.f_numa = None
+        self.f_pool_state = None
+        self.f_suspend_compress = None
+        self.f_balloon = None
+        self.f_mem_merge = None
+        self.f_balloon_min = None
+        self.f_balloon_max = None
+        self.f_guest_agent = None
+        self.f_restart_policy = None
+        self.f_restart_max = None
+        self.f_restart_window = None
 
         # Storage
         self.f_hda = None
@@ -75,6 +4343,7 @@ class MguiQemu(QMainWindow):
         self.f_sd = None
         self.f_snapshot = None
         self.f_boot = None
+        self.storage_info = None
 
         # Network
         self.f_net_type = None
@@ -103,6 +4372,11 @@ class MguiQemu(QMainWindow):
         self.f_dtb = None
         self.f_bios = None
         self.f_L = None
+        self.f_fast_boot = None
+        self.f_boot_marker = None
+        self.boot_started = 0.0
+        self.boot_marker = None
+        self.boot_tail = ""
 
         # Debug
         self.f_debug_item = None
@@ -126,6 +4400,63 @@ class MguiQemu(QMainWindow):
         self.cmd_preview = None
         self.log_output = None
 
+        # Disk Images
+        self.img_queue = None
+        self.f_img_op = None
+        self.f_img_src = None
+        self.f_img_dst = None
+        self.f_img_fmt = None
+        self.f_img_size = None
+        self.f_img_tag = None
+        self.f_img_snap_action = None
+        self.f_img_compress = None
+        self.f_img_parallel = None
+        self.img_jobs_table = None
+        self.btn_queue_job = None
+        self.btn_cancel_job = None
+
+        # Snapshots
+        self.snap_table = None
+        self.f_snap_tag = None
+        self.snap_progress = None
+        self.btn_snap_refresh = None
+        self.btn_snap_take = None
+        self.btn_snap_revert = None
+        self.btn_snap_delete = None
+        self.snapshot_worker = None
+        self.snap_jobs = set()
+
+        # Guest agent
+        self.guest_target = None
+        self.guest_tab = None
+        self.agent_shutdown_pending = False
+        self.guest_table = None
+        self.guest_status = None
+        self.btn_guest_refresh = None
+        self.btn_guest_freeze = None
+        self.btn_guest_thaw = None
+        self.btn_guest_shutdown = None
+        self.guest_worker = None
+        self.guest_timer = None
+        self.guest_cpu_ticks = {}
+
+        # Metrics
+        self.metrics_tab = None
+        self.metrics_table = None
+        self.net_table = None
+        self.metrics_status = None
+
+        # KSM
+        self.ksm = None
+        self.ksm_timer = None
+        self.f_ksm_root = None
+        self.f_ksm_run = None
+        self.f_ksm_pages_to_scan = None
+        self.f_ksm_sleep = None
+        self.btn_ksm_apply = None
+        self.ksm_stats = None
+        self.ksm_history = None
+
         # Language and Mode
         self.f_lang = None
         self.f_intuitive = None
@@ -141,6 +4472,15 @@ class MguiQemu(QMainWindow):
                 "window_title": "MGUI_QEMU - Launch Configuration",
                 "saved_vms": "📂 Saved VMs:",
                 "delete_vm": "🗑 Delete VM",
+                "clone_vm": "⧉ Clone VM",
+                "export_vm": "📦 Export VM",
+                "bulk_launch": "🚀 Bulk Launch...",
+                "capacity": "📊 Capacity...",
+                "benchmark": "⏱ Benchmark...",
+                "import_scripts": "📥 Import Scripts...",
+                "import_title": "Import QEMU launch scripts",
+                "warm_pool": "🔥 Warm Pool:",
+                "suspend": "💤 Suspend to Disk",
                 "launch": "🚀 LAUNCH",
                 "stop": "🛑 STOP VM",
                 "status_idle": "● Status: Idle",
@@ -165,6 +4505,9 @@ class MguiQemu(QMainWindow):
                 "arch": "Architecture:",
                 "machine": "Machine Type:",
                 "cpu": "CPU Model:",
+                "cpu_resolver": "CPU Resolver:",
+                "cpu_best": "🔍 Best for this host",
+                "cpu_cluster": "🖧 Cluster baseline",
                 "accel": "Accelerator:",
                 "ram": "RAM Size:",
                 "cores": "Cores:",
@@ -181,6 +4524,19 @@ class MguiQemu(QMainWindow):
                 "no_reboot": "No Reboot",
                 "daemonize": "Daemonize",
                 "prealloc_ram": "Prealloc RAM",
+                "pool_state": "Pool State (-incoming):",
+                "suspend_compress": "Suspend Compression:",
+                "mem_merge": "KSM Merging (mem-merge):",
+                "tcg_thread": "TCG Threads:",
+                "tcg_tb_size": "TCG Translation Cache:",
+                "icount": "Instruction Counting (-icount):",
+                "balloon": "Memory Balloon (virtio-balloon, free page reporting)",
+                "balloon_min": "Balloon Min:",
+                "balloon_max": "Balloon Max:",
+                "restart_policy": "Restart Policy:",
+                "restart_max": "Max Restarts:",
+                "restart_window": "Restart Window:",
+                "guest_agent": "Guest Agent (qemu-ga over virtio-serial)",
                 "hda": "Hard Disk A:",
                 "hdb": "Hard Disk B:",
                 "hdc": "Hard Disk C:",
@@ -241,14 +4597,43 @@ class MguiQemu(QMainWindow):
                 "delete_ask": "Are you sure you want to delete '{}'?",
                 "err": "Error",
                 "tab_templates": "Templates",
+                "tab_images": "Disk Images",
+                "tab_snapshots": "Snapshots",
+                "tab_ksm": "KSM",
+                "ksm_apply": "Apply KSM Settings",
+                "snap_refresh": "Refresh",
+                "snap_take": "Take",
+                "snap_revert": "Revert",
+                "snap_delete": "Delete",
+                "tab_guest": "Guest",
+                "guest_refresh": "Refresh",
+                "guest_freeze": "Freeze FS",
+                "guest_thaw": "Thaw FS",
+                "guest_shutdown": "Shut Down",
+                "tab_metrics": "Metrics",
+                "queue_job": "➕ Queue Job",
+                "cancel_job": "✖ Cancel Selected",
                 "apply_template": "Apply Template",
                 "select_template": "Select a Template to apply:",
-                "clear": "Clear All Fields"
+                "template_filter": "Filter by name or tag...",
+                "any_arch": "Any architecture",
+                "clear": "Clear All Fields",
+                "undo": "↶ Undo",
+                "redo": "↷ Redo"
             },
             "ua": {
                 "window_title": "MGUI_QEMU - Налаштування запуску",
                 "saved_vms": "📂 Збережені VM:",
                 "delete_vm": "🗑 Видалити VM",
+                "clone_vm": "⧉ Клонувати VM",
+                "export_vm": "📦 Експортувати VM",
+                "bulk_launch": "🚀 Масовий запуск...",
+                "capacity": "📊 Ємність хоста...",
+                "benchmark": "⏱ Тест швидкості...",
+                "import_scripts": "📥 Імпорт скриптів...",
+                "import_title": "Імпорт скриптів запуску QEMU",
+                "warm_pool": "🔥 Пул готових VM:",
+                "suspend": "💤 Призупинити на диск",
                 "launch": "🚀 ЗАПУСК",
                 "stop": "🛑 ЗУПИНИТИ VM",
                 "status_idle": "● Статус: Очікування",
@@ -266,6 +4651,22 @@ class MguiQemu(QMainWindow):
                 "tab_debug": "Відладка",
                 "tab_expert": "Експерт",
                 "tab_templates": "Шаблони",
+                "tab_images": "Образи дисків",
+                "tab_snapshots": "Знімки",
+                "tab_ksm": "KSM",
+                "ksm_apply": "Застосувати налаштування KSM",
+                "snap_refresh": "Оновити",
+                "snap_take": "Створити",
+                "snap_revert": "Відкотити",
+                "snap_delete": "Видалити",
+                "tab_guest": "Гість",
+                "guest_refresh": "Оновити",
+                "guest_freeze": "Заморозити ФС",
+                "guest_thaw": "Розморозити ФС",
+                "guest_shutdown": "Вимкнути",
+                "tab_metrics": "Метрики",
+                "queue_job": "➕ Додати в чергу",
+                "cancel_job": "✖ Скасувати вибране",
                 "cmd_preview": "🛠 Попередній перегляд команди:",
                 "logs": "📜 Логи QEMU:",
                 "save_config": "💾 Зберегти конфігурацію",
@@ -274,6 +4675,9 @@ class MguiQemu(QMainWindow):
                 "arch": "Архітектура:",
                 "machine": "Тип машини:",
                 "cpu": "Модель CPU:",
+                "cpu_resolver": "Підбір CPU:",
+                "cpu_best": "🔍 Найкраща для цього хоста",
+                "cpu_cluster": "🖧 Базова для кластера",
                 "accel": "Прискорювач:",
                 "ram": "Об'єм ОЗП:",
                 "cores": "Ядра:",
@@ -290,6 +4694,19 @@ class MguiQemu(QMainWindow):
                 "no_reboot": "Без перезавантаження",
                 "daemonize": "У фоновому режимі",
                 "prealloc_ram": "Попередньо виділити ОЗП",
+                "pool_state": "Стан пулу (-incoming):",
+                "suspend_compress": "Стиснення стану:",
+                "mem_merge": "Злиття KSM (mem-merge):",
+                "tcg_thread": "Потоки TCG:",
+                "tcg_tb_size": "Кеш трансляції TCG:",
+                "icount": "Підрахунок інструкцій (-icount):",
+                "balloon": "Балон пам'яті (virtio-balloon, звільнення сторінок)",
+                "balloon_min": "Мін. балона:",
+                "balloon_max": "Макс. балона:",
+                "restart_policy": "Політика перезапуску:",
+                "restart_max": "Макс. перезапусків:",
+                "restart_window": "Вікно перезапусків:",
+                "guest_agent": "Гостьовий агент (qemu-ga через virtio-serial)",
                 "hda": "Жорсткий диск A:",
                 "hdb": "Жорсткий диск B:",
                 "hdc": "Жорсткий диск C:",
@@ -350,12 +4767,25 @@ class MguiQemu(QMainWindow):
                 "err": "Помилка",
                 "apply_template": "Застосувати шаблон",
                 "select_template": "Виберіть шаблон для застосування:",
-                "clear": "Очистити поля"
+                "template_filter": "Фільтр за назвою або тегом...",
+                "any_arch": "Будь-яка архітектура",
+                "clear": "Очистити поля",
+                "undo": "↶ Скасувати",
+                "redo": "↷ Повторити"
             },
             "de": {
                 "window_title": "MGUI_QEMU - Startkonfiguration",
                 "saved_vms": "📂 Gespeicherte VMs:",
                 "delete_vm": "🗑 VM löschen",
+                "clone_vm": "⧉ VM klonen",
+                "export_vm": "📦 VM exportieren",
+                "bulk_launch": "🚀 Massenstart...",
+                "capacity": "📊 Kapazität...",
+                "benchmark": "⏱ Benchmark...",
+                "import_scripts": "📥 Skripte importieren...",
+                "import_title": "QEMU-Startskripte importieren",
+                "warm_pool": "🔥 Warmer Pool:",
+                "suspend": "💤 Auf Datenträger sichern",
                 "launch": "🚀 STARTEN",
                 "stop": "🛑 VM STOPPEN",
                 "status_idle": "● Status: Leerlauf",
@@ -373,6 +4803,22 @@ class MguiQemu(QMainWindow):
                 "tab_debug": "Debug",
                 "tab_expert": "Experte",
                 "tab_templates": "Vorlagen",
+                "tab_images": "Datenträgerabbilder",
+                "tab_snapshots": "Snapshots",
+                "tab_ksm": "KSM",
+                "ksm_apply": "KSM-Einstellungen anwenden",
+                "snap_refresh": "Aktualisieren",
+                "snap_take": "Erstellen",
+                "snap_revert": "Zurücksetzen",
+                "snap_delete": "Löschen",
+                "tab_guest": "Gast",
+                "guest_refresh": "Aktualisieren",
+                "guest_freeze": "FS einfrieren",
+                "guest_thaw": "FS auftauen",
+                "guest_shutdown": "Herunterfahren",
+                "tab_metrics": "Metriken",
+                "queue_job": "➕ Auftrag einreihen",
+                "cancel_job": "✖ Auswahl abbrechen",
                 "cmd_preview": "🛠 Befehlsvorschau:",
                 "logs": "📜 QEMU-Logs:",
                 "save_config": "💾 Konfiguration speichern",
@@ -381,6 +4827,9 @@ class MguiQemu(QMainWindow):
                 "arch": "Architektur:",
                 "machine": "Maschinentyp:",
                 "cpu": "CPU-Modell:",
+                "cpu_resolver": "CPU-Auswahl:",
+                "cpu_best": "🔍 Beste für diesen Host",
+                "cpu_cluster": "🖧 Cluster-Basis",
                 "accel": "Beschleuniger:",
                 "ram": "RAM-Größe:",
                 "cores": "Kerne:",
@@ -397,6 +4846,19 @@ class MguiQemu(QMainWindow):
                 "no_reboot": "Kein Neustart",
                 "daemonize": "Daemonisieren",
                 "prealloc_ram": "RAM vorab zuweisen",
+                "pool_state": "Pool-Zustand (-incoming):",
+                "suspend_compress": "Zustandskompression:",
+                "mem_merge": "KSM-Zusammenführung (mem-merge):",
+                "tcg_thread": "TCG-Threads:",
+                "tcg_tb_size": "TCG-Übersetzungscache:",
+                "icount": "Befehlszählung (-icount):",
+                "balloon": "Speicher-Balloon (virtio-balloon, Free Page Reporting)",
+                "balloon_min": "Balloon-Minimum:",
+                "balloon_max": "Balloon-Maximum:",
+                "restart_policy": "Neustart-Richtlinie:",
+                "restart_max": "Max. Neustarts:",
+                "restart_window": "Neustart-Zeitfenster:",
+                "guest_agent": "Gast-Agent (qemu-ga über virtio-serial)",
                 "hda": "Festplatte A:",
                 "hdb": "Festplatte B:",
                 "hdc": "Festplatte C:",
@@ -457,12 +4919,25 @@ class MguiQemu(QMainWindow):
                 "err": "Fehler",
                 "apply_template": "Vorlage anwenden",
                 "select_template": "Wählen Sie eine Vorlage zum Anwenden:",
-                "clear": "Felder löschen"
+                "template_filter": "Nach Name oder Tag filtern...",
+                "any_arch": "Jede Architektur",
+                "clear": "Felder löschen",
+                "undo": "↶ Rückgängig",
+                "redo": "↷ Wiederholen"
             },
             "zh": {
                 "window_title": "MGUI_QEMU - 启动配置",
                 "saved_vms": "📂 已保存的虚拟机:",
                 "delete_vm": "🗑 删除虚拟机",
+                "clone_vm": "⧉ 克隆虚拟机",
+                "export_vm": "📦 导出虚拟机",
+                "bulk_launch": "🚀 批量启动...",
+                "capacity": "📊 容量规划...",
+                "benchmark": "⏱ 启动基准测试...",
+                "import_scripts": "📥 导入脚本...",
+                "import_title": "导入 QEMU 启动脚本",
+                "warm_pool": "🔥 预热池:",
+                "suspend": "💤 挂起到磁盘",
                 "launch": "🚀 启动",
                 "stop": "🛑 停止虚拟机",
                 "status_idle": "● 状态: 空闲",
@@ -480,6 +4955,22 @@ class MguiQemu(QMainWindow):
                 "tab_debug": "调试",
                 "tab_expert": "专家",
                 "tab_templates": "模板",
+                "tab_images": "磁盘镜像",
+                "tab_snapshots": "快照",
+                "tab_ksm": "KSM",
+                "ksm_apply": "应用 KSM 设置",
+                "snap_refresh": "刷新",
+                "snap_take": "创建",
+                "snap_revert": "回滚",
+                "snap_delete": "删除",
+                "tab_guest": "客户机",
+                "guest_refresh": "刷新",
+                "guest_freeze": "冻结文件系统",
+                "guest_thaw": "解冻文件系统",
+                "guest_shutdown": "关机",
+                "tab_metrics": "指标",
+                "queue_job": "➕ 加入队列",
+                "cancel_job": "✖ 取消所选",
                 "cmd_preview": "🛠 命令预览:",
                 "logs": "📜 QEMU 日志:",
                 "save_config": "💾 保存配置",
@@ -488,6 +4979,9 @@ class MguiQemu(QMainWindow):
                 "arch": "架构:",
                 "machine": "机器类型:",
                 "cpu": "CPU 型号:",
+                "cpu_resolver": "CPU 解析:",
+                "cpu_best": "🔍 本机最佳",
+                "cpu_cluster": "🖧 集群基线",
                 "accel": "加速器:",
                 "ram": "内存大小:",
                 "cores": "核心数:",
@@ -504,6 +4998,19 @@ class MguiQemu(QMainWindow):
                 "no_reboot": "不重启",
                 "daemonize": "后台运行",
                 "prealloc_ram": "预分配内存",
+                "pool_state": "预热池状态 (-incoming):",
+                "suspend_compress": "挂起压缩:",
+                "mem_merge": "KSM 合并 (mem-merge):",
+                "tcg_thread": "TCG 线程:",
+                "tcg_tb_size": "TCG 翻译缓存:",
+                "icount": "指令计数 (-icount):",
+                "balloon": "内存气球 (virtio-balloon, 空闲页报告)",
+                "balloon_min": "气球下限:",
+                "balloon_max": "气球上限:",
+                "restart_policy": "重启策略:",
+                "restart_max": "最大重启次数:",
+                "restart_window": "重启时间窗口:",
+                "guest_agent": "客户机代理 (qemu-ga, virtio-serial)",
                 "hda": "硬盘 A:",
                 "hdb": "硬盘 B:",
                 "hdc": "硬盘 C:",
@@ -564,12 +5071,25 @@ class MguiQemu(QMainWindow):
                 "err": "错误",
                 "apply_template": "应用模板",
                 "select_template": "选择要应用的模板：",
-                "clear": "清除所有字段"
+                "template_filter": "按名称或标签筛选...",
+                "any_arch": "任意架构",
+                "clear": "清除所有字段",
+                "undo": "↶ 撤销",
+                "redo": "↷ 重做"
             },
             "ru": {
                 "window_title": "MGUI_QEMU - Настройка запуска",
                 "saved_vms": "📂 Сохраненные VM:",
                 "delete_vm": "🗑 Удалить VM",
+                "clone_vm": "⧉ Клонировать VM",
+                "export_vm": "📦 Экспортировать VM",
+                "bulk_launch": "🚀 Массовый запуск...",
+                "capacity": "📊 Ёмкость хоста...",
+                "benchmark": "⏱ Тест скорости...",
+                "import_scripts": "📥 Импорт скриптов...",
+                "import_title": "Импорт скриптов запуска QEMU",
+                "warm_pool": "🔥 Пул готовых VM:",
+                "suspend": "💤 Приостановить на диск",
                 "launch": "🚀 ЗАПУСК",
                 "stop": "🛑 ОСТАНОВИТЬ VM",
                 "status_idle": "● Статус: Ожидание",
@@ -587,6 +5107,22 @@ class MguiQemu(QMainWindow):
                 "tab_debug": "Отладка",
                 "tab_expert": "Эксперт",
                 "tab_templates": "Шаблоны",
+                "tab_images": "Образы дисков",
+                "tab_snapshots": "Снимки",
+                "tab_ksm": "KSM",
+                "ksm_apply": "Применить настройки KSM",
+                "snap_refresh": "Обновить",
+                "snap_take": "Создать",
+                "snap_revert": "Откатить",
+                "snap_delete": "Удалить",
+                "tab_guest": "Гость",
+                "guest_refresh": "Обновить",
+                "guest_freeze": "Заморозить ФС",
+                "guest_thaw": "Разморозить ФС",
+                "guest_shutdown": "Выключить",
+                "tab_metrics": "Метрики",
+                "queue_job": "➕ Добавить в очередь",
+                "cancel_job": "✖ Отменить выбранное",
                 "cmd_preview": "🛠 Предпросмотр команды:",
                 "logs": "📜 Логи QEMU:",
                 "save_config": "💾 Сохранить конфигурацию",
@@ -595,6 +5131,9 @@ class MguiQemu(QMainWindow):
                 "arch": "Архитектура:",
                 "machine": "Тип машины:",
                 "cpu": "Модель CPU:",
+                "cpu_resolver": "Подбор CPU:",
+                "cpu_best": "🔍 Лучшая для этого хоста",
+                "cpu_cluster": "🖧 Базовая для кластера",
                 "accel": "Ускоритель:",
                 "ram": "Объем ОЗУ:",
                 "cores": "Ядра:",
@@ -611,6 +5150,19 @@ class MguiQemu(QMainWindow):
                 "no_reboot": "Без перезагрузки",
                 "daemonize": "В фоновом режиме",
                 "prealloc_ram": "Предварительно выделить ОЗУ",
+                "pool_state": "Состояние пула (-incoming):",
+                "suspend_compress": "Сжатие состояния:",
+                "mem_merge": "Слияние KSM (mem-merge):",
+                "tcg_thread": "Потоки TCG:",
+                "tcg_tb_size": "Кэш трансляции TCG:",
+                "icount": "Подсчёт инструкций (-icount):",
+                "balloon": "Баллон памяти (virtio-balloon, возврат свободных страниц)",
+                "balloon_min": "Мин. баллона:",
+                "balloon_max": "Макс. баллона:",
+                "restart_policy": "Политика перезапуска:",
+                "restart_max": "Макс. перезапусков:",
+                "restart_window": "Окно перезапусков:",
+                "guest_agent": "Гостевой агент (qemu-ga через virtio-serial)",
                 "hda": "Жесткий диск A:",
                 "hdb": "Жесткий диск B:",
                 "hdc": "Жесткий диск C:",
@@ -671,31 +5223,97 @@ class MguiQemu(QMainWindow):
                 "err": "Ошибка",
                 "apply_template": "Применить шаблон",
                 "select_template": "Выберите шаблон для применения:",
-                "clear": "Очистить поля"
+                "template_filter": "Фильтр по имени или тегу...",
+                "any_arch": "Любая архитектура",
+                "clear": "Очистить поля",
+                "undo": "↶ Отменить",
+                "redo": "↷ Повторить"
             }
         }
 
         self.base_path = Path.home() / "MGUI_QEMU_VMs"
         self.base_path.mkdir(exist_ok=True)
         self.process = QProcess()
+        self.qmp_port = None
+        self.journal = EventJournal(self.base_path)
+        self.template_registry = TemplateRegistry(self.base_path / TEMPLATE_DIR)
+        self.histories = {}
+        self.history = None
+        # Coalesces the burst of widget signals from one action (template, clear, arch change) into one step
+        self.history_timer = QTimer(self)
+        self.history_timer.setSingleShot(True)
+        self.history_timer.timeout.connect(self.record_config_edit)
+        self.journal_session = None
+        self.restart_policy = None
+        self.restart_cfg = None
+        self.stop_requested = False
+        self.vm_started_at = 0.0
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.timeout.connect(self.restart_vm)
+        self.supervisor = VmSupervisor(self, self.journal, self.base_path)
+        self.supervisor.instance_output.connect(
+            lambda name, text: self.log_output.appendPlainText(f"[{name}] {text.strip()}") if text.strip() else None
+        )
+        self.supervisor.instance_finished.connect(
+            lambda name, code: self.log_output.appendPlainText(f"[{name}] QEMU exited with code {code}")
+        )
+        self.supervisor.restart_scheduled.connect(
+            lambda name, attempt, delay: self.log_output.appendPlainText(
+                f"[{name}] restarting in {delay:.1f} s (attempt {attempt})")
+        )
+        self.supervisor.crash_loop.connect(
+            lambda name, count: self.log_output.appendPlainText(
+                f"[{name}] crash loop: {count} restarts within the restart window, giving up")
+        )
+        self.bulk_scheduler = BulkLaunchScheduler(self.supervisor, self)
+        self.warm_pool = WarmPool(self.supervisor, self)
+        self.warm_pool.instance_resumed.connect(self.on_pool_resumed)
+        self.warm_pool.instance_broken.connect(self.on_pool_resume_failed)
+        self.balloon_balancer = BalloonBalancer(parent=self)
+        self.balloon_balancer.adjusted.connect(
+            lambda name, old, new: self.log_output.appendPlainText(f"[{name}] balloon {old} MB -> {new} MB")
+        )
+        self.supervisor.instance_started.connect(
+            lambda name: self.track_balloon(self.supervisor.instances[name])
+        )
+        self.blockstats_sampler = BlockStatsSampler(parent=self)
+        self.netstats_sampler = NetStatsSampler(parent=self)
+        self.metrics_exporter = None
+        self.supervisor.instance_started.connect(
+            lambda name: self.track_vm_stats(self.supervisor.instances[name])
+        )
 
-        self.arch_map = {
-            "x86_64": "x86_64",
-            "i386": "i386",
-            "Arm (64-bit)": "aarch64",
-            "Arm (32-bit)": "arm",
-            "RISC-V (64-bit)": "riscv64",
-            "RISC-V (32-bit)": "riscv32"
-        }
+        self.arch_map = ARCH_MAP
 
         self.init_ui()
         self.apply_system_theme()
 
         # Signals
-        self.process.started.connect(self.update_status_ui)
-        self.process.finished.connect(lambda: self.on_process_finished())
-        self.process.readyReadStandardError.connect(self.read_output)
-        self.process.readyReadStandardOutput.connect(self.read_output)
+        self.bind_process(self.process)
+
+    def closeEvent(self, event):
+        # Supervised VMs are children of the window; stop them cleanly instead of orphaning QProcess
+        self.bulk_scheduler.clear()
+        self.warm_pool.size = 0
+        self.warm_pool.drain()
+        self.restart_timer.stop()
+        self.supervisor.stop_all()
+        self.balloon_balancer.stop()
+        self.blockstats_sampler.stop()
+        self.netstats_sampler.stop()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        self.process.finished.disconnect()
+        self.journal.close()
+        super().closeEvent(event)
+
+    def bind_process(self, proc):
+        self.process = proc
+        proc.started.connect(self.update_status_ui)
+        proc.finished.connect(lambda code, status: self.on_process_finished(code, status))
+        proc.readyReadStandardError.connect(self.read_output)
+        proc.readyReadStandardOutput.connect(self.read_output)
 
     def apply_system_theme(self):
         qapp = QApplication.instance()
@@ -723,13 +5341,55 @@ class MguiQemu(QMainWindow):
         sidebar.addWidget(self.label_saved_vms)
         sidebar.addWidget(self.vm_list)
 
-        btn_del_vm = QPushButton("🗑 Delete VM")
-        btn_del_vm.clicked.connect(self.delete_vm)
-        sidebar.addWidget(btn_del_vm)
+        self.btn_del_vm = QPushButton("🗑 Delete VM")
+        self.btn_del_vm.clicked.connect(self.delete_vm)
+        sidebar.addWidget(self.btn_del_vm)
+
+        self.btn_clone_vm = QPushButton("⧉ Clone VM")
+        self.btn_clone_vm.clicked.connect(self.clone_vm)
+        sidebar.addWidget(self.btn_clone_vm)
+
+        self.btn_export_vm = QPushButton("📦 Export VM")
+        self.btn_export_vm.clicked.connect(self.export_vm)
+        sidebar.addWidget(self.btn_export_vm)
+
+        self.btn_bulk_launch = QPushButton("🚀 Bulk Launch...")
+        self.btn_bulk_launch.clicked.connect(self.show_bulk_launch)
+        sidebar.addWidget(self.btn_bulk_launch)
+        self.btn_capacity = QPushButton("📊 Capacity...")
+        self.btn_capacity.clicked.connect(self.show_capacity_planner)
+        sidebar.addWidget(self.btn_capacity)
+        self.btn_benchmark = QPushButton("⏱ Benchmark...")
+        self.btn_benchmark.clicked.connect(self.show_benchmark)
+        sidebar.addWidget(self.btn_benchmark)
+
+        self.btn_import_scripts = QPushButton("📥 Import Scripts...")
+        self.btn_import_scripts.clicked.connect(self.import_scripts_dialog)
+        sidebar.addWidget(self.btn_import_scripts)
 
         sidebar.addStretch()
+
+        pool_row = QHBoxLayout()
+        self.label_warm_pool = QLabel("🔥 Warm Pool:")
+        self.f_pool_size = QSpinBox()
+        self.f_pool_size.setRange(0, 16)
+        self.f_pool_size.setToolTip("Keep this many paused copies of the current VM ready; Launch resumes one instantly.\n"
+                                    "Only for VMs in Snapshot mode: pooled copies discard their disk writes on exit.")
+        self.f_pool_size.valueChanged.connect(self.update_warm_pool)
+        pool_row.addWidget(self.label_warm_pool)
+        pool_row.addWidget(self.f_pool_size)
+        sidebar.addLayout(pool_row)
+        self.pool_status = QLabel()
+        self.pool_status.setStyleSheet("color: gray;")
+        self.warm_pool.status_changed.connect(self.pool_status.setText)
+        sidebar.addWidget(self.pool_status)
+
         sidebar.addWidget(self.status_label)
 
+        self.btn_suspend = QPushButton("💤 Suspend to Disk")
+        self.btn_suspend.clicked.connect(self.suspend_vm)
+        sidebar.addWidget(self.btn_suspend)
+
         self.btn_run = QPushButton("🚀 LAUNCH")
         self.btn_run.setFixedHeight(50)
         self.btn_run.setStyleSheet(
@@ -767,6 +5427,17 @@ class MguiQemu(QMainWindow):
         top_bar.addWidget(self.f_intuitive)
         
         top_bar.addStretch()
+        self.btn_undo = QPushButton("↶ Undo")
+        self.btn_undo.setToolTip("Undo the last configuration change (Ctrl+Z)")
+        self.btn_undo.clicked.connect(self.undo_config)
+        top_bar.addWidget(self.btn_undo)
+        self.btn_redo = QPushButton("↷ Redo")
+        self.btn_redo.setToolTip("Redo (Ctrl+Y)")
+        self.btn_redo.clicked.connect(self.redo_config)
+        top_bar.addWidget(self.btn_redo)
+        QShortcut(QKeySequence.StandardKey.Undo, self, self.undo_config)
+        QShortcut(QKeySequence.StandardKey.Redo, self, self.redo_config)
+        QShortcut(QKeySequence("Ctrl+Y"), self, self.redo_config)
         right_layout.addLayout(top_bar)
 
         # Tabs
@@ -781,6 +5452,11 @@ class MguiQemu(QMainWindow):
         self.tabs.addTab(self.create_debug_tab(), "Debug")
         self.tabs.addTab(self.create_expert_tab(), "Expert")
         self.tabs.addTab(self.create_templates_tab(), "Templates")
+        self.tabs.addTab(self.create_images_tab(), "Disk Images")
+        self.tabs.addTab(self.create_snapshots_tab(), "Snapshots")
+        self.tabs.addTab(self.create_ksm_tab(), "KSM")
+        self.tabs.addTab(self.create_guest_tab(), "Guest")
+        self.tabs.addTab(self.create_metrics_tab(), "Metrics")
         right_layout.addWidget(self.tabs)
 
         self.cmd_preview = QPlainTextEdit()
@@ -812,6 +5488,8 @@ class MguiQemu(QMainWindow):
         self.on_mode_changed()
         self.retranslate_ui()
         self.refresh_list()
+        self.watch_config_edits()
+        self.switch_history("")
 
     @staticmethod
     def create_scroll_widget(layout):
@@ -828,26 +5506,152 @@ class MguiQemu(QMainWindow):
         self.f_arch.clear()
 
         if is_virt:
-            self.f_accel.addItems(["kvm", "whpx", "hvf", "hax"])
             native = self.get_native_arch()
             self.f_arch.addItem(native)
             self.f_cpu.setCurrentText("host")
+            # Fastest usable accelerator first, the rest stay selectable
+            self.f_accel.addItems(self.update_accel_hint())
         else:
             self.f_accel.addItem("tcg")
             self.f_arch.addItems(list(self.arch_map.keys()))
-            if self.f_cpu.findText("qemu64") >= 0:
-                self.f_cpu.setCurrentText("qemu64")
+            self.apply_arch_defaults()
+            self.update_accel_hint()
+        self.update_tcg_fields()
+
+    def set_cpu_model(self, model_string):
+        if self.f_cpu.findText(model_string) < 0:
+            self.f_cpu.addItem(model_string)
+        self.f_cpu.setCurrentText(model_string)
+
+    def resolve_best_cpu(self):
+        qemu_bin = self.f_qemu_path.text().strip()
+        profile = load_cpu_profile(self.base_path, qemu_bin)
+        if profile is not None and profile.get("accel") == self.f_accel.currentText():
+            self.on_cpu_profile(profile)
+            return
+        if self.cpu_probe_worker is not None:
+            return
+        self.log_output.appendPlainText(f"Probing CPU models of {qemu_bin} ({self.f_accel.currentText()})...")
+        self.cpu_probe_worker = CpuProbeWorker(self.base_path, qemu_bin, self.f_accel.currentText(), self)
+        self.cpu_probe_worker.done.connect(self.on_cpu_profile)
+        self.cpu_probe_worker.failed.connect(
+            lambda msg: self.log_output.appendPlainText(f"CPU probe failed: {msg}"))
+        self.cpu_probe_worker.finished.connect(self.on_cpu_probe_finished)
+        self.cpu_probe_worker.start()
+
+    def on_cpu_profile(self, profile):
+        if not profile["best_model"]:
+            self.log_output.appendPlainText("No named CPU model is runnable on this host; keeping the current model.")
+            return
+        self.log_output.appendPlainText(
+            f"Best CPU for {profile['host']}: {profile['best_model']} + {len(profile['extras'])} host features "
+            f"({len(profile['model_features'])} runnable models, profile {cpu_profile_path(self.base_path, profile['binary'])})"
+        )
+        self.set_cpu_model(profile["model_string"])
+
+    def on_cpu_probe_finished(self):
+        self.cpu_probe_worker.deleteLater()
+        self.cpu_probe_worker = None
+
+    def resolve_cluster_cpu(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        profiles = load_cluster_profiles(self.base_path)
+        local = load_cpu_profile(self.base_path, self.f_qemu_path.text().strip())
+        if len(profiles) < 2:
+            QMessageBox.information(
+                self, d["cpu_cluster"],
+                "A cluster baseline needs CPU profiles from at least two hosts.\n"
+                "Run 'Best for this host' on each host and copy the JSON files into\n"
+                f"{self.base_path / CPU_PROFILE_DIR}"
+            )
+            return
+        baseline = cluster_cpu_baseline(profiles, local)
+        if baseline is None or not baseline["best_model"]:
+            QMessageBox.critical(self, d["err"], "These hosts have no named CPU model in common.")
+            return
+        hosts = ", ".join(sorted(p["host"] for p in profiles))
+        self.log_output.appendPlainText(
+            f"Cluster baseline for {hosts}: {baseline['best_model']} + {len(baseline['extras'])} shared features")
+        self.set_cpu_model(baseline["model_string"])
+
+    def apply_arch_defaults(self):
+        if self.f_mode.currentIndex() != 0:
+            return
+        # Only replace what the new arch can't run; a machine or CPU the user picked stays otherwise
+        arch_code = self.arch_map.get(self.f_arch.currentText(), self.f_arch.currentText())
+        defaults = TCG_ARCH_DEFAULTS.get(arch_code, {})
+        family = CPU_FAMILIES.get(arch_code, arch_code)
+        if "machine" in defaults and self.f_machine.currentText() not in defaults["machines"]:
+            self.f_machine.setCurrentText(defaults["machine"])
+        cpu = self.f_cpu.currentText().strip()
+        # "host" needs KVM; "max" without properties exists on every target
+        if "cpu" in defaults and (cpu in ("", "host") or (cpu != "max" and family != self.cpu_family)):
+            self.f_cpu.setCurrentText(defaults["cpu"])
+        self.cpu_family = family
+
+    def update_tcg_fields(self):
+        is_tcg = self.f_accel.currentText() == "tcg"
+        for w in [self.f_tcg_thread, self.f_tcg_tb_size, self.f_icount]:
+            w.setEnabled(is_tcg)
+        # MTTCG and -icount are mutually exclusive
+        if self.f_icount.currentText().strip():
+            self.f_tcg_thread.setToolTip("-icount forces thread=single")
+        else:
+            arch_code = self.arch_map.get(self.f_arch.currentText(), self.f_arch.currentText() or "x86_64")
+            self.f_tcg_thread.setToolTip(f"auto = {tcg_thread_mode(arch_code)} for {arch_code} on {host_arch_code()}")
+
+    def update_accel_hint(self):
+        # Answers at once from what is already known; the binary itself is probed on a worker thread
+        # and the hint (and accelerator list) refreshed once it answers
+        arch_code = self.arch_map.get(self.f_arch.currentText(), self.f_arch.currentText() or "x86_64")
+        qemu_bin = self.f_qemu_path.text().strip()
+        accels = self.show_accel_hint(arch_code, qemu_bin)
+        if self.accel_probe_worker is not None:
+            self.accel_probe_pending = True
+            return accels
+        self.accel_probe_worker = AccelProbeWorker(arch_code, qemu_bin, self)
+        self.accel_probe_worker.finished.connect(self.on_accel_probe_finished)
+        self.accel_probe_worker.start()
+        return accels
+
+    def show_accel_hint(self, arch_code, qemu_bin):
+        accels, reason = detect_accelerators(arch_code, qemu_bin, probe=False)
+        if self.f_mode.currentIndex() == 0 and accels[0] != "tcg":
+            reason = f"Emulation mode runs on TCG; {accels[0]} is available for {arch_code} in Virtualization mode"
+        self.accel_hint.setText(reason)
+        return accels
+
+    def on_accel_probe_finished(self):
+        self.accel_probe_worker.deleteLater()
+        self.accel_probe_worker = None
+        if self.accel_probe_pending:
+            # The arch or binary changed while probing
+            self.accel_probe_pending = False
+            self.update_accel_hint()
+            return
+        arch_code = self.arch_map.get(self.f_arch.currentText(), self.f_arch.currentText() or "x86_64")
+        accels = self.show_accel_hint(arch_code, self.f_qemu_path.text().strip())
+        current = self.f_accel.currentText()
+        if self.f_mode.currentIndex() != 1 or [self.f_accel.itemText(i) for i in range(self.f_accel.count())] == accels:
+            return
+        self.f_accel.blockSignals(True)
+        self.f_accel.clear()
+        self.f_accel.addItems(accels)
+        if current in accels:
+            self.f_accel.setCurrentText(current)
+        self.f_accel.blockSignals(False)
+        if self.f_accel.currentText() != current:
+            self.update_tcg_fields()
+            self.update_preview()
 
     @staticmethod
     def get_native_arch():
-        m = platform.machine().lower()
-        if m in ["x86_64", "amd64"]:
-            return "x86_64"
-        if m in ["i386", "i686"]:
-            return "i386"
-        if m in ["aarch64", "arm64"]:
-            return "Arm (64-bit)"
-        return "x86_64"
+        host = host_arch_code()
+        for label, code in ARCH_MAP.items():
+            if code == host:
+                return label
+        return host
 
     def create_hw_tab(self):
         self.hw_layout = QFormLayout()
@@ -857,12 +5661,35 @@ class MguiQemu(QMainWindow):
         # Початкове заповнення буде в on_mode_changed
 
         self.f_machine = QComboBox()
-        self.f_machine.addItems(["q35", "pc", "virt", "microvm"])
+        self.f_machine.addItems(MACHINE_TYPES)
         self.f_cpu = QComboBox()
         self.f_cpu.setEditable(True)
         self.f_cpu.addItems(["host", "max", "qemu64", "qemu32", "pentium3"])
 
+        self.cpu_resolver_row = QWidget()
+        resolver_l = QHBoxLayout(self.cpu_resolver_row)
+        resolver_l.setContentsMargins(0, 0, 0, 0)
+        self.btn_cpu_best = QPushButton("🔍 Best for this host")
+        self.btn_cpu_best.clicked.connect(self.resolve_best_cpu)
+        self.btn_cpu_cluster = QPushButton("🖧 Cluster baseline")
+        self.btn_cpu_cluster.clicked.connect(self.resolve_cluster_cpu)
+        resolver_l.addWidget(self.btn_cpu_best)
+        resolver_l.addWidget(self.btn_cpu_cluster)
+
         self.f_accel = QComboBox()
+        self.accel_hint = QLabel()
+        self.accel_hint.setWordWrap(True)
+        self.accel_hint.setStyleSheet("color: gray;")
+        self.f_tcg_thread = QComboBox()
+        self.f_tcg_thread.addItems(["auto", "multi", "single"])
+        self.f_tcg_tb_size = QSpinBox()
+        self.f_tcg_tb_size.setRange(0, 8192)
+        self.f_tcg_tb_size.setSuffix(" MB")
+        self.f_tcg_tb_size.setSpecialValueText("auto (QEMU default)")
+        self.f_icount = QComboBox()
+        self.f_icount.setEditable(True)
+        self.f_icount.addItems(["", "shift=auto", "shift=auto,sleep=off", "shift=0,align=off,sleep=off"])
+        self.f_icount.lineEdit().setPlaceholderText("off (fastest)")
         self.f_ram = QSpinBox()
         self.f_ram.setRange(128, 1024 * 128)
         self.f_ram.setValue(2048)
@@ -886,18 +5713,58 @@ class MguiQemu(QMainWindow):
         self.f_mem_path = QLineEdit()
         self.f_numa = QLineEdit()
         self.f_numa.setPlaceholderText("node,nodeid=0,cpus=0-1,mem=1G")
+        self.f_pool_state = QLineEdit()
+        self.f_pool_state.setPlaceholderText("saved VM state to restore pooled copies from (optional)")
+        self.f_suspend_compress = QComboBox()
+        self.f_suspend_compress.addItems(["none (multifd)"] + list(STATE_COMPRESSORS))
+        self.f_mem_merge = QComboBox()
+        self.f_mem_merge.addItems(["default", "on", "off"])
+        self.f_balloon = QCheckBox("Memory Balloon (virtio-balloon, free page reporting)")
+        self.f_balloon_min = QSpinBox()
+        self.f_balloon_min.setRange(64, 1024 * 128)
+        self.f_balloon_min.setValue(512)
+        self.f_balloon_min.setSuffix(" MB")
+        self.f_balloon_max = QSpinBox()
+        self.f_balloon_max.setRange(0, 1024 * 128)
+        self.f_balloon_max.setSuffix(" MB")
+        self.f_balloon_max.setSpecialValueText("= RAM")
+        self.f_guest_agent = QCheckBox("Guest Agent (qemu-ga over virtio-serial)")
+        self.f_restart_policy = QComboBox()
+        self.f_restart_policy.addItems(list(RESTART_POLICIES))
+        self.f_restart_policy.setToolTip("Restart QEMU automatically when it exits (on-failure: only on a crash or non-zero exit code)")
+        self.f_restart_max = QSpinBox()
+        self.f_restart_max.setRange(1, 100)
+        self.f_restart_max.setValue(5)
+        self.f_restart_max.setToolTip("Stop restarting after this many restarts within the restart window (crash loop)")
+        self.f_restart_window = QSpinBox()
+        self.f_restart_window.setRange(10, 86400)
+        self.f_restart_window.setValue(300)
+        self.f_restart_window.setSuffix(" s")
 
         layout.addRow("VM Name:", self.f_name)
         layout.addRow("Architecture:", self.f_arch)
         layout.addRow("Machine Type (-machine):", self.f_machine)
         layout.addRow("CPU Model (-cpu):", self.f_cpu)
+        layout.addRow("CPU Resolver:", self.cpu_resolver_row)
         layout.addRow("Accelerator (-accel):", self.f_accel)
+        layout.addRow(self.accel_hint)
+        layout.addRow("TCG Threads:", self.f_tcg_thread)
+        layout.addRow("TCG Translation Cache:", self.f_tcg_tb_size)
+        layout.addRow("Instruction Counting (-icount):", self.f_icount)
         layout.addRow("RAM Size (-m):", self.f_ram)
         layout.addRow("Cores (-smp):", self.f_smp)
         layout.addRow("UUID (-uuid):", self.f_uuid)
         layout.addRow("PID File (-pidfile):", self.add_browse(self.f_pidfile))
         layout.addRow("Mem Path (-mem-path):", self.f_mem_path)
         layout.addRow("NUMA (-numa):", self.f_numa)
+        layout.addRow("Pool State (-incoming):", self.add_browse(self.f_pool_state))
+        layout.addRow("Suspend Compression:", self.f_suspend_compress)
+        layout.addRow("KSM Merging (mem-merge):", self.f_mem_merge)
+        layout.addRow("Balloon Min:", self.f_balloon_min)
+        layout.addRow("Balloon Max:", self.f_balloon_max)
+        layout.addRow("Restart Policy:", self.f_restart_policy)
+        layout.addRow("Max Restarts:", self.f_restart_max)
+        layout.addRow("Restart Window:", self.f_restart_window)
 
         layout.addRow(self.f_nodefaults)
         layout.addRow(self.f_no_user_config)
@@ -908,6 +5775,8 @@ class MguiQemu(QMainWindow):
         layout.addRow(self.f_no_reboot)
         layout.addRow(self.f_daemonize)
         layout.addRow(self.f_mem_prealloc)
+        layout.addRow(self.f_balloon)
+        layout.addRow(self.f_guest_agent)
 
         return self.create_scroll_widget(layout)
 
@@ -936,20 +5805,25 @@ class MguiQemu(QMainWindow):
         layout.addRow("SD Card (-sd):", self.add_browse(self.f_sd))
         self.f_snapshot = QCheckBox("Snapshot Mode (-snapshot)")
         self.f_boot = QComboBox()
-        self.f_boot.addItems(["", "a (Floppy)", "c (Hard Disk)", "d (CD-ROM)", "n (Network)"])
+        self.f_boot.addItems(BOOT_ORDERS)
 
         layout.addRow(self.f_snapshot)
         layout.addRow("Boot Order (-boot):", self.f_boot)
+
+        self.storage_info = QLabel()
+        self.storage_info.setWordWrap(True)
+        self.storage_info.setStyleSheet("color: gray; font-family: 'Consolas';")
+        layout.addRow(self.storage_info)
         return self.create_scroll_widget(layout)
 
     def create_network_tab(self):
         self.net_layout = QFormLayout()
         layout = self.net_layout
         self.f_net_type = QComboBox()
-        self.f_net_type.addItems(["user", "tap", "bridge", "socket", "stream", "vde", "none"])
+        self.f_net_type.addItems(NET_TYPES)
 
         self.f_net_device = QComboBox()
-        self.f_net_device.addItems(["virtio-net-pci", "e1000", "rtl8139", "pcnet", "vmxnet3"])
+        self.f_net_device.addItems(NET_DEVICES)
 
         self.f_nic = QLineEdit()
         self.f_nic.setPlaceholderText("model=virtio-net-pci,netdev=n1")
@@ -972,10 +5846,10 @@ class MguiQemu(QMainWindow):
         self.gfx_layout = QFormLayout()
         layout = self.gfx_layout
         self.f_display = QComboBox()
-        self.f_display.addItems(["gtk", "sdl", "curses", "spice-app", "egl-headless", "none"])
+        self.f_display.addItems(DISPLAYS)
 
         self.f_vga = QComboBox()
-        self.f_vga.addItems(["virtio", "std", "vmware", "qxl", "none"])
+        self.f_vga.addItems(VGA_TYPES)
         self.f_vnc = QLineEdit()
         self.f_vnc.setPlaceholderText(":1,password=on")
         self.f_fullscreen = QCheckBox("Full Screen (-full-screen)")
@@ -991,7 +5865,7 @@ class MguiQemu(QMainWindow):
         layout = self.input_layout
         self.f_usb = QCheckBox("Enable USB (-usb)")
         self.f_usb_device = QComboBox()
-        self.f_usb_device.addItems(["", "usb-tablet", "usb-mouse", "usb-kbd", "usb-host"])
+        self.f_usb_device.addItems(USB_DEVICES)
         self.f_kbd_layout = QLineEdit()
         self.f_kbd_layout.setPlaceholderText("en-us")
 
@@ -1019,15 +5893,20 @@ class MguiQemu(QMainWindow):
         layout.addRow("BIOS/Firmware (-bios):", self.add_browse(self.f_bios))
         self.f_L = QLineEdit()
         layout.addRow("BIOS/ROM Path (-L):", self.add_browse(self.f_L))
+        self.f_fast_boot = QCheckBox("Fast Boot (microVM, virtio-mmio, no firmware/VGA, serial console)")
+        layout.addRow(self.f_fast_boot)
+        self.f_boot_marker = QLineEdit()
+        self.f_boot_marker.setPlaceholderText(DEFAULT_BOOT_MARKER)
+        layout.addRow("Ready Marker (regex):", self.f_boot_marker)
         return self.create_scroll_widget(layout)
 
     def create_audio_tab(self):
         self.audio_layout = QFormLayout()
         layout = self.audio_layout
         self.f_audio_drv = QComboBox()
-        self.f_audio_drv.addItems(["none", "pa", "alsa", "oss", "sdl", "dsound", "coreaudio"])
+        self.f_audio_drv.addItems(AUDIO_DRIVERS)
         self.f_soundhw = QComboBox()
-        self.f_soundhw.addItems(["none", "intel-hda", "ac97", "sb16", "all"])
+        self.f_soundhw.addItems(SOUND_HW)
 
         self.f_audiodev = QLineEdit()
         self.f_audiodev.setPlaceholderText("pa,id=snd0,server=127.0.0.1")
@@ -1098,22 +5977,33 @@ class MguiQemu(QMainWindow):
         self.label_select_template.setStyleSheet("font-weight: bold; font-size: 14px;")
         layout.addWidget(self.label_select_template)
         
-        self.template_buttons = []
-        templates = [
-            ("Debian Linux", self.apply_debian_template),
-            ("Fedora Linux", self.apply_fedora_template),
-            ("Arch Linux", self.apply_arch_template),
-            ("Windows 10/11", self.apply_windows_template),
-            ("MacOS (OSX-KVM)", self.apply_macos_template)
-        ]
-        
-        for name, func in templates:
-            btn = QPushButton(name)
-            btn.setFixedHeight(40)
-            btn.clicked.connect(func)
-            layout.addWidget(btn)
-            self.template_buttons.append((btn, name)) # Store original name as fallback
-            
+        # Built-in templates and the user's <VM folder>/templates/*.json, listed when the tab is opened
+        filter_row = QHBoxLayout()
+        self.template_filter = QLineEdit()
+        self.template_filter.setPlaceholderText("Filter by name or tag...")
+        self.template_filter.textChanged.connect(self.show_templates)
+        self.template_arch = QComboBox()
+        self.template_arch.addItem("Any architecture")
+        self.template_arch.currentIndexChanged.connect(self.show_templates)
+        filter_row.addWidget(self.template_filter, 1)
+        filter_row.addWidget(self.template_arch)
+        layout.addLayout(filter_row)
+
+        self.template_list = QListWidget()
+        self.template_list.setMinimumHeight(200)
+        self.template_list.itemDoubleClicked.connect(lambda item: self.apply_template(item.text()))
+        layout.addWidget(self.template_list)
+        self.template_status = QLabel()
+        self.template_status.setStyleSheet("color: gray;")
+        self.template_status.setWordWrap(True)
+        layout.addWidget(self.template_status)
+
+        self.btn_apply_template = QPushButton("Apply Template")
+        self.btn_apply_template.setFixedHeight(40)
+        self.btn_apply_template.clicked.connect(
+            lambda: self.apply_template(self.template_list.currentItem().text()) if self.template_list.currentItem() else None)
+        layout.addWidget(self.btn_apply_template)
+
         layout.addSpacing(20)
         self.btn_clear = QPushButton("Clear All Fields")
         self.btn_clear.setFixedHeight(45)
@@ -1122,142 +6012,629 @@ class MguiQemu(QMainWindow):
         layout.addWidget(self.btn_clear)
             
         layout.addStretch()
-        return self.create_scroll_widget(layout)
+        self.templates_tab = self.create_scroll_widget(layout)
+        self.tabs.currentChanged.connect(
+            lambda _: self.show_templates() if self.tabs.currentWidget() is self.templates_tab else None)
+        return self.templates_tab
 
-    def apply_debian_template(self):
-        self.f_name.setText("Debian_VM")
-        self.f_arch.setCurrentText("x86_64")
-        self.f_machine.setCurrentText("q35")
-        self.f_cpu.setCurrentText("host")
-        self.f_ram.setValue(2048)
-        self.f_smp.setValue(2)
-        self.f_net_type.setCurrentText("user")
-        self.f_net_device.setCurrentText("virtio-net-pci")
-        self.f_display.setCurrentText("gtk")
-        self.f_vga.setCurrentText("virtio")
+    def show_templates(self):
+        if self.tabs.currentWidget() is not self.templates_tab:
+            return
+        archs = self.template_registry.architectures()
+        if [self.template_arch.itemText(i) for i in range(1, self.template_arch.count())] != archs:
+            current = self.template_arch.currentText()
+            self.template_arch.blockSignals(True)
+            self.template_arch.clear()
+            lang_code = self.lang_code()
+            self.template_arch.addItem(self.lang_data[lang_code]["any_arch"])
+            self.template_arch.addItems(archs)
+            self.template_arch.setCurrentIndex(max(0, self.template_arch.findText(current)))
+            self.template_arch.blockSignals(False)
+        arch = self.template_arch.currentText() if self.template_arch.currentIndex() > 0 else ""
+        self.template_list.clear()
+        for name in self.template_registry.find(self.template_filter.text(), arch):
+            template = self.template_registry.get(name)
+            self.template_list.addItem(name)
+            details = [template.get("description", ""), f"arch: {template['config'].get('arch', '-')}",
+                       f"tags: {', '.join(template['tags']) or '-'}", f"source: {template['source']}"]
+            self.template_list.item(self.template_list.count() - 1).setToolTip("\n".join(d for d in details if d))
+        errors = self.template_registry.errors
+        self.template_status.setText(f"Templates not loaded: {'; '.join(errors)}" if errors else
+                                     f"User templates: {self.base_path / TEMPLATE_DIR}")
+
+    def apply_template(self, name):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        try:
+            template = self.template_registry.get(name)
+        except (KeyError, ValueError) as exc:
+            QMessageBox.critical(self, d["err"], f"Template {name}: {exc.args[0]}")
+            return
+        # Fields the template doesn't mention keep their current values
+        cfg = self.collect_config()
+        cfg.update(template["config"])
+        self.apply_config(cfg)
+        if template.get("notes"):
+            QMessageBox.information(self, name, template["notes"])
         self.update_preview()
 
-    def apply_fedora_template(self):
-        self.f_name.setText("Fedora_VM")
-        self.f_arch.setCurrentText("x86_64")
-        self.f_machine.setCurrentText("q35")
-        self.f_cpu.setCurrentText("host")
-        self.f_ram.setValue(4096)
-        self.f_smp.setValue(2)
-        self.f_net_type.setCurrentText("user")
-        self.f_net_device.setCurrentText("virtio-net-pci")
-        self.f_display.setCurrentText("gtk")
-        self.f_vga.setCurrentText("virtio")
-        self.update_preview()
+    def create_images_tab(self):
+        self.img_queue = QemuImgQueue(parent=self)
+        self.img_queue.job_added.connect(self.on_img_job_added)
+        self.img_queue.job_changed.connect(self.on_img_job_changed)
+        self.img_queue.job_finished.connect(self.on_img_job_changed)
 
-    def apply_arch_template(self):
-        self.f_name.setText("Arch_VM")
-        self.f_arch.setCurrentText("x86_64")
-        self.f_machine.setCurrentText("q35")
-        self.f_cpu.setCurrentText("host")
-        self.f_ram.setValue(2048)
-        self.f_smp.setValue(2)
-        self.f_net_type.setCurrentText("user")
-        self.f_net_device.setCurrentText("virtio-net-pci")
-        self.f_display.setCurrentText("gtk")
-        self.f_vga.setCurrentText("virtio")
-        self.update_preview()
+        layout = QVBoxLayout()
+        form = QFormLayout()
+        self.f_img_op = QComboBox()
+        self.f_img_op.addItems(QEMU_IMG_OPS)
+        self.f_img_src = QLineEdit()
+        self.f_img_src.setPlaceholderText("image.qcow2 (several sources separated by ';' for convert)")
+        btn_src = QPushButton("📁")
+        btn_src.setFixedWidth(30)
+        btn_src.clicked.connect(self.select_img_sources)
+        src_row = QWidget()
+        src_l = QHBoxLayout(src_row)
+        src_l.setContentsMargins(0, 0, 0, 0)
+        src_l.addWidget(self.f_img_src)
+        src_l.addWidget(btn_src)
+        self.f_img_dst = QLineEdit()
+        self.f_img_dst.setPlaceholderText("output image or directory")
+        self.f_img_fmt = QComboBox()
+        self.f_img_fmt.addItems(["qcow2", "raw", "vmdk", "vdi", "vhdx", "vpc"])
+        self.f_img_size = QLineEdit()
+        self.f_img_size.setPlaceholderText("20G / +5G")
+        self.f_img_tag = QLineEdit()
+        self.f_img_snap_action = QComboBox()
+        self.f_img_snap_action.addItems(["-c (create)", "-a (apply)", "-d (delete)", "-l (list)"])
+        self.f_img_compress = QCheckBox("Compress (-c)")
+        self.f_img_parallel = QSpinBox()
+        self.f_img_parallel.setRange(1, 32)
+        self.f_img_parallel.setValue(max(1, min(4, (os.cpu_count() or 2) // 2)))
+        self.f_img_parallel.valueChanged.connect(self.img_queue.set_max_parallel)
+        self.img_queue.set_max_parallel(self.f_img_parallel.value())
+
+        form.addRow("Operation:", self.f_img_op)
+        form.addRow("Image:", src_row)
+        form.addRow("Target:", self.add_browse(self.f_img_dst))
+        form.addRow("Format (-f/-O):", self.f_img_fmt)
+        form.addRow("Size:", self.f_img_size)
+        form.addRow("Snapshot:", self.f_img_snap_action)
+        form.addRow("Snapshot Tag:", self.f_img_tag)
+        form.addRow(self.f_img_compress)
+        form.addRow("Parallel Jobs:", self.f_img_parallel)
+        layout.addLayout(form)
 
-    def apply_windows_template(self):
-        self.f_name.setText("Windows_VM")
-        self.f_arch.setCurrentText("x86_64")
-        self.f_machine.setCurrentText("q35")
-        self.f_cpu.setCurrentText("host")
-        self.f_ram.setValue(4096)
-        self.f_smp.setValue(4)
-        self.f_net_type.setCurrentText("user")
-        self.f_net_device.setCurrentText("e1000-82545em")
-        self.f_display.setCurrentText("gtk")
-        self.f_vga.setCurrentText("qxl")
-        self.f_usb.setChecked(True)
-        self.f_usb_device.setCurrentText("usb-tablet")
-        self.update_preview()
+        buttons = QHBoxLayout()
+        self.btn_queue_job = QPushButton("➕ Queue Job")
+        self.btn_queue_job.clicked.connect(self.queue_img_job)
+        self.btn_cancel_job = QPushButton("✖ Cancel Selected")
+        self.btn_cancel_job.clicked.connect(self.cancel_img_jobs)
+        buttons.addWidget(self.btn_queue_job)
+        buttons.addWidget(self.btn_cancel_job)
+        layout.addLayout(buttons)
+
+        self.img_jobs_table = QTableWidget(0, 3)
+        self.img_jobs_table.setHorizontalHeaderLabels(["Job", "Status", "Progress"])
+        self.img_jobs_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.img_jobs_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.img_jobs_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.img_jobs_table)
+        return self.create_scroll_widget(layout)
 
-    def apply_macos_template(self):
-        # Switch to Virtualization mode to enable KVM
-        self.f_mode.setCurrentIndex(1)
-        
-        self.f_name.setText("MacOS_VM")
-        self.f_arch.setCurrentText("x86_64")
-        self.f_machine.setCurrentText("q35")
-        
-        # MacOS requirements based on OSX-KVM
-        # Using a more comprehensive CPU string from OpenCore-Boot.sh
-        cpu_val = "Haswell-noTSX,vendor=GenuineIntel,+invtsc,vmware-cpuid-freq=on,+ssse3,+sse4.2,+popcnt,+avx,+aes,+xsave,+xsaveopt,check,kvm=on"
-        self.f_cpu.setEditable(True)
-        self.f_cpu.setCurrentText(cpu_val)
-        
-        self.f_ram.setValue(4096)
-        self.f_smp.setValue(4)
-        
-        # Force KVM
-        self.f_accel.setCurrentText("kvm")
-        self.f_net_type.setCurrentText("user")
-        self.f_net_device.setCurrentText("vmxnet3")
-        self.f_hostfwd.setText("tcp::2222-:22")
-        
-        self.f_display.setCurrentText("gtk")
-        self.f_vga.setCurrentText("virtio")
-        self.f_usb.setChecked(True)
-        self.f_usb_device.setCurrentText("usb-tablet")
-        
-        # MacOS specific flags based on OSX-KVM
-        osk = "ourhardworkbythesewordsguardedpleasedontsteal(c)AppleComputerInc"
-        self.f_device_extra.setText(f"isa-applesmc,osk=\"{osk}\"")
-        
-        # Add common objects and arguments from OSX-KVM
-        extra_args = [
-            "-smbios type=2",
-            "-global ICH9-LPC.acpi-pci-hotplug-with-bridge-support=off",
-            "-device pcie-root-port,id=pcie.1,bus=pcie.0,slot=1,chassis=1",
-            "-device pcie-root-port,id=pcie.2,bus=pcie.0,slot=2,chassis=2",
-            "# --- MacOS Boot & Storage Configuration ---",
-            "# You MUST provide paths to these files for macOS to boot:",
-            "# -drive if=pflash,format=raw,readonly=on,file=\"OVMF_CODE.fd\"",
-            "# -drive if=pflash,format=raw,file=\"OVMF_VARS-1024x768.fd\"",
-            "# -device ide-hd,bus=sata.2,drive=OpenCoreBoot",
-            "# -drive id=OpenCoreBoot,if=none,snapshot=on,format=qcow2,file=\"OpenCore.qcow2\"",
-            "# -device ide-hd,bus=sata.3,drive=InstallMedia",
-            "# -drive id=InstallMedia,if=none,snapshot=on,format=raw,file=\"BaseSystem.img\"",
-            "# -device ide-hd,bus=sata.4,drive=SystemDisk",
-            "# -drive id=SystemDisk,if=none,format=qcow2,file=\"mac_hdd_ng.img\""
-        ]
-        self.f_extra.setPlainText("\n".join(extra_args))
-        
-        self.f_vga.setCurrentText("vmware")
-        self.f_display.setCurrentText("gtk")
-        self.f_nodefaults.setChecked(True)
-        
-        QMessageBox.information(self, "MacOS Template (OSX-KVM)", 
-            "MacOS template applied! 🚀\n\n"
-            "Settings adjusted to match OSX-KVM project requirements:\n"
-            "• Mode: Virtualization (KVM)\n"
-            "• CPU: Haswell-noTSX (with invtsc and kvm=on)\n"
-            "• Machine: q35\n"
-            "• Net: vmxnet3\n"
-            "• SMC: OSK string included\n\n"
-            "Note: You still need to provide:\n"
-            "1. OpenCore boot image (BaseSystem.img)\n"
-            "2. MacOS Virtual Disk (qcow2)\n"
-            "3. OVMF UEFI Firmware\n\n"
-            "Recommended host tweak:\n"
-            "sudo modprobe kvm; echo 1 | sudo tee /sys/module/kvm/parameters/ignore_msrs")
-        self.update_preview()
+    def select_img_sources(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Select Images")
+        if files:
+            self.f_img_src.setText(";".join(f.replace("\\", "/") for f in files))
+
+    def queue_img_job(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        self.img_queue.qemu_img = qemu_img_path(self.f_qemu_path.text().strip())
+        op = self.f_img_op.currentText()
+        fmt = self.f_img_fmt.currentText()
+        sources = [p.strip() for p in self.f_img_src.text().split(";") if p.strip()]
+        target = self.f_img_dst.text().strip()
+        size = self.f_img_size.text().strip()
+        tag = self.f_img_tag.text().strip()
+        action = self.f_img_snap_action.currentText().split()[0]
+        if not sources:
+            QMessageBox.critical(self, d["err"], "Select an image first.")
+            return
+        if op in ("create", "resize") and not size:
+            QMessageBox.critical(self, d["err"], "A size is required.")
+            return
+        if op == "snapshot" and action != "-l" and not tag:
+            QMessageBox.critical(self, d["err"], "A snapshot tag is required.")
+            return
+        if op == "convert" and not target:
+            QMessageBox.critical(self, d["err"], "A target image or directory is required.")
+            return
+        if op == "convert" and len(sources) > 1 and not Path(target).is_dir():
+            QMessageBox.critical(self, d["err"], "Converting several images needs an existing target directory.")
+            return
+
+        # One job per source, so a whole library can be converted in parallel
+        for src in sources:
+            dst = target
+            if op == "convert" and Path(target).is_dir():
+                dst = str(Path(target) / f"{Path(src).stem}.{fmt}")
+            args = qemu_img_args(op, src, dst, fmt, size, tag, action, self.f_img_compress.isChecked())
+            self.img_queue.submit(args, f"{op} {Path(src).name}" + (f" -> {Path(dst).name}" if op == "convert" else ""))
+
+    def cancel_img_jobs(self):
+        rows = {index.row() for index in self.img_jobs_table.selectedIndexes()}
+        for row in rows:
+            self.img_queue.cancel(self.img_jobs_table.item(row, 0).data(Qt.ItemDataRole.UserRole))
+
+    def on_img_job_added(self, job_id):
+        job = self.img_queue.jobs[job_id]
+        row = self.img_jobs_table.rowCount()
+        self.img_jobs_table.insertRow(row)
+        item = QTableWidgetItem(job.label)
+        item.setData(Qt.ItemDataRole.UserRole, job_id)
+        item.setToolTip(" ".join(job.args))
+        self.img_jobs_table.setItem(row, 0, item)
+        self.img_jobs_table.setItem(row, 1, QTableWidgetItem(job.state))
+        bar = QProgressBar()
+        bar.setRange(0, 100)
+        bar.setValue(0)
+        self.img_jobs_table.setCellWidget(row, 2, bar)
+
+    def on_img_job_changed(self, job_id):
+        job = self.img_queue.jobs[job_id]
+        row = job_id - 1
+        self.img_jobs_table.item(row, 1).setText(job.state)
+        self.img_jobs_table.item(row, 0).setToolTip(" ".join(job.args) + ("\n" + job.output.strip() if job.output else ""))
+        bar = self.img_jobs_table.cellWidget(row, 2)
+        if job.state == "running" and job.progress < 0:
+            bar.setRange(0, 0)  # busy indicator for ops without -p
+        else:
+            bar.setRange(0, 100)
+            bar.setValue(int(max(job.progress, 0)))
+        if job.state in ("done", "failed") and job.output:
+            self.log_output.appendPlainText(f"[qemu-img] {job.label}: {job.state}\n{job.output.strip()}")
+
+    def create_snapshots_tab(self):
+        self.img_queue.job_finished.connect(self.on_snapshot_job_finished)
+        layout = QVBoxLayout()
+        self.snap_table = QTableWidget(0, 5)
+        self.snap_table.setHorizontalHeaderLabels(["ID", "Tag", "VM State", "Date", "VM Clock"])
+        self.snap_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.snap_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.snap_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.snap_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.snap_table.itemSelectionChanged.connect(self.on_snapshot_selected)
+        layout.addWidget(self.snap_table)
+
+        form = QFormLayout()
+        self.f_snap_tag = QLineEdit()
+        self.f_snap_tag.setPlaceholderText("clean-install")
+        form.addRow("Snapshot Tag:", self.f_snap_tag)
+        layout.addLayout(form)
+
+        buttons = QHBoxLayout()
+        self.btn_snap_refresh = QPushButton("🔄 Refresh")
+        self.btn_snap_refresh.clicked.connect(self.refresh_snapshots)
+        self.btn_snap_take = QPushButton("📸 Take")
+        self.btn_snap_take.clicked.connect(lambda: self.run_snapshot_action("save"))
+        self.btn_snap_revert = QPushButton("⏪ Revert")
+        self.btn_snap_revert.clicked.connect(lambda: self.run_snapshot_action("load"))
+        self.btn_snap_delete = QPushButton("🗑 Delete")
+        self.btn_snap_delete.clicked.connect(lambda: self.run_snapshot_action("delete"))
+        for btn in [self.btn_snap_refresh, self.btn_snap_take, self.btn_snap_revert, self.btn_snap_delete]:
+            buttons.addWidget(btn)
+        layout.addLayout(buttons)
+
+        self.snap_progress = QProgressBar()
+        self.snap_progress.setRange(0, 100)
+        self.snap_progress.setValue(0)
+        layout.addWidget(self.snap_progress)
+        return self.create_scroll_widget(layout)
+
+    def snapshot_disks(self):
+        disks = []
+        for widget in [self.f_hda, self.f_hdb, self.f_hdc, self.f_hdd]:
+            info = inspect_image(widget.text().strip()) if widget.text().strip() else None
+            if info and info["format"] == "qcow2":
+                disks.append(info["path"])
+        return disks
+
+    def vm_is_live(self):
+        return self.process.state() == QProcess.ProcessState.Running and self.qmp_port is not None
+
+    def show_snapshots(self, snapshots):
+        self.snap_table.setRowCount(0)
+        for snap in snapshots:
+            row = self.snap_table.rowCount()
+            self.snap_table.insertRow(row)
+            clock = snap["vm_clock_ns"] // 1_000_000_000
+            values = [snap["id"], snap["name"], format_size(snap["vm_state_size"]) if snap["vm_state_size"] else "-",
+                      time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snap["date"])),
+                      f"{clock // 3600:02d}:{clock // 60 % 60:02d}:{clock % 60:02d}"]
+            for col, value in enumerate(values):
+                self.snap_table.setItem(row, col, QTableWidgetItem(value))
+
+    def on_snapshot_selected(self):
+        row = self.snap_table.currentRow()
+        if row >= 0 and self.snap_table.item(row, 1):
+            self.f_snap_tag.setText(self.snap_table.item(row, 1).text())
+
+    def refresh_snapshots(self):
+        if self.vm_is_live():
+            if self.snapshot_worker is None:
+                self.start_snapshot_worker("list")
+            return
+        disks = self.snapshot_disks()
+        self.show_snapshots(list_qcow2_snapshots(disks[0]) if disks else [])
+
+    def run_snapshot_action(self, action):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        tag = self.f_snap_tag.text().strip()
+        if not tag:
+            QMessageBox.critical(self, d["err"], "A snapshot tag is required.")
+            return
+        if self.vm_is_live():
+            if self.snapshot_worker is None:
+                self.start_snapshot_worker(action, tag)
+            return
+        disks = self.snapshot_disks()
+        if not disks:
+            QMessageBox.critical(self, d["err"], "Internal snapshots need at least one qcow2 disk.")
+            return
+        # Offline: one qemu-img snapshot job per disk, all with the same tag
+        self.img_queue.qemu_img = qemu_img_path(self.f_qemu_path.text().strip())
+        flag = {"save": "-c", "load": "-a", "delete": "-d"}[action]
+        self.snap_progress.setRange(0, 0)
+        job_ids = [self.img_queue.submit(qemu_img_args("snapshot", disk, tag=tag, snapshot_action=flag),
+                                         f"snapshot {flag} {tag} {Path(disk).name}") for disk in disks]
+        # Jobs that fail to start finish inside submit(), before they could be tracked
+        self.snap_jobs.update(j for j in job_ids if self.img_queue.jobs[j].state in ("queued", "running"))
+        self.on_snapshot_job_finished(None)
+
+    def on_snapshot_job_finished(self, job_id):
+        if job_id is not None and job_id not in self.snap_jobs:
+            return
+        self.snap_jobs.discard(job_id)
+        if not self.snap_jobs:
+            self.snap_progress.setRange(0, 100)
+            self.snap_progress.setValue(100)
+            self.refresh_snapshots()
+
+    def start_snapshot_worker(self, action, tag=""):
+        self.snapshot_worker = SnapshotWorker(self.qmp_port, action, tag, self)
+        self.snap_progress.setRange(0, 100)
+        self.snap_progress.setValue(0)
+        self.snapshot_worker.progress.connect(self.snap_progress.setValue)
+        self.snapshot_worker.listed.connect(self.show_snapshots)
+        self.snapshot_worker.done.connect(self.log_output.appendPlainText)
+        self.snapshot_worker.failed.connect(
+            lambda msg: self.log_output.appendPlainText(f"Snapshot {action} failed: {msg}"))
+        self.snapshot_worker.finished.connect(self.on_snapshot_worker_finished)
+        self.snapshot_worker.start()
+
+    def on_snapshot_worker_finished(self):
+        self.snap_progress.setValue(100)
+        self.snapshot_worker.deleteLater()
+        self.snapshot_worker = None
+
+    def create_ksm_tab(self):
+        layout = QFormLayout()
+        self.ksm = KsmControl()
+        self.f_ksm_root = QLineEdit(KSM_SYSFS)
+        self.f_ksm_root.editingFinished.connect(self.load_ksm_settings)
+        self.f_ksm_run = QComboBox()
+        self.f_ksm_run.addItems(["0 (stop)", "1 (run)", "2 (unmerge all)"])
+        self.f_ksm_pages_to_scan = QSpinBox()
+        self.f_ksm_pages_to_scan.setRange(0, 1000000)
+        self.f_ksm_sleep = QSpinBox()
+        self.f_ksm_sleep.setRange(0, 100000)
+        self.f_ksm_sleep.setSuffix(" ms")
+        self.btn_ksm_apply = QPushButton("Apply")
+        self.btn_ksm_apply.clicked.connect(self.apply_ksm_settings)
+        self.ksm_stats = QLabel()
+        self.ksm_history = QLabel()
+        self.ksm_history.setStyleSheet("font-family: monospace;")
+
+        layout.addRow("Sysfs Root:", self.f_ksm_root)
+        layout.addRow("run:", self.f_ksm_run)
+        layout.addRow("pages_to_scan:", self.f_ksm_pages_to_scan)
+        layout.addRow("sleep_millisecs:", self.f_ksm_sleep)
+        layout.addRow(self.btn_ksm_apply)
+        layout.addRow(self.ksm_stats)
+        layout.addRow(self.ksm_history)
+
+        self.ksm_timer = QTimer(self)
+        self.ksm_timer.timeout.connect(self.sample_ksm)
+        self.ksm_timer.start(5000)
+        self.load_ksm_settings()
+        return self.create_scroll_widget(layout)
+
+    def load_ksm_settings(self):
+        root = self.f_ksm_root.text().strip() or KSM_SYSFS
+        if Path(root) != self.ksm.root:
+            self.ksm = KsmControl(root)
+        if not self.ksm.available():
+            self.ksm_stats.setText(f"KSM is not available ({root}/run not found)")
+            self.ksm_history.clear()
+            return
+        settings = self.ksm.settings()
+        if settings["run"] is not None:
+            self.f_ksm_run.setCurrentIndex(min(2, settings["run"]))
+        self.f_ksm_pages_to_scan.setValue(settings["pages_to_scan"] or 0)
+        self.f_ksm_sleep.setValue(settings["sleep_millisecs"] or 0)
+        self.sample_ksm()
+
+    def apply_ksm_settings(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        try:
+            self.ksm.write("pages_to_scan", self.f_ksm_pages_to_scan.value())
+            self.ksm.write("sleep_millisecs", self.f_ksm_sleep.value())
+            self.ksm.write("run", self.f_ksm_run.currentIndex())
+        except OSError as exc:
+            QMessageBox.critical(self, d["err"],
+                                 f"Unable to write KSM settings: {exc}\n"
+                                 f"Example: echo 1 | sudo tee {self.ksm.root / 'run'}")
+            return
+        self.load_ksm_settings()
+
+    def sample_ksm(self):
+        if not self.ksm.available():
+            return
+        stats = self.ksm.sample()
+        self.ksm_stats.setText(
+            f"Shared pages: {stats['pages_shared']}   Sharing: {stats['pages_sharing']}   "
+            f"Unshared: {stats['pages_unshared']}   Full scans: {stats['full_scans']}\n"
+            f"Saved: {format_size(stats['saved_bytes'])}"
+        )
+        sharing = [entry[2] for entry in self.ksm.history]
+        self.ksm_history.setText(f"Saved over time: {sparkline(sharing)}")
+
+    def create_guest_tab(self):
+        layout = QVBoxLayout()
+        self.guest_table = QTableWidget(0, 4)
+        self.guest_table.setHorizontalHeaderLabels(["VM", "CPU", "Memory", "Filesystems"])
+        self.guest_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        self.guest_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.guest_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.guest_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.guest_table)
+
+        buttons = QHBoxLayout()
+        self.btn_guest_refresh = QPushButton("🔄 Refresh")
+        self.btn_guest_refresh.clicked.connect(lambda: self.run_guest_action("stats"))
+        self.btn_guest_freeze = QPushButton("🧊 Freeze FS")
+        self.btn_guest_freeze.clicked.connect(lambda: self.run_guest_action("freeze"))
+        self.btn_guest_thaw = QPushButton("💧 Thaw FS")
+        self.btn_guest_thaw.clicked.connect(lambda: self.run_guest_action("thaw"))
+        self.btn_guest_shutdown = QPushButton("⏻ Shut Down")
+        self.btn_guest_shutdown.clicked.connect(lambda: self.run_guest_action("shutdown"))
+        for btn in [self.btn_guest_refresh, self.btn_guest_freeze, self.btn_guest_thaw, self.btn_guest_shutdown]:
+            buttons.addWidget(btn)
+        layout.addLayout(buttons)
+
+        self.guest_status = QLabel("Running VMs with the guest agent enabled (Hardware tab) and qemu-guest-agent installed in the guest.")
+        self.guest_status.setWordWrap(True)
+        self.guest_status.setStyleSheet("color: gray;")
+        layout.addWidget(self.guest_status)
+
+        # Only poll the guests while the tab is visible
+        self.guest_tab = self.create_scroll_widget(layout)
+        self.guest_timer = QTimer(self)
+        self.guest_timer.timeout.connect(
+            lambda: self.run_guest_action("stats") if self.tabs.currentWidget() is self.guest_tab else None)
+        self.guest_timer.start(5000)
+        self.tabs.currentChanged.connect(
+            lambda _: self.run_guest_action("stats") if self.tabs.currentWidget() is self.guest_tab else None)
+        return self.guest_tab
+
+    def guest_agent_targets(self):
+        targets = []
+        if self.guest_target is not None and self.process.state() == QProcess.ProcessState.Running:
+            targets.append(self.guest_target)
+        # Pooled copies are paused, so their agents cannot answer
+        pooled = self.warm_pool.spawning | set(self.warm_pool.ready)
+        for vm in self.supervisor.instances.values():
+            target = guest_agent_target(vm.name, vm.cfg, vm.qmp_port)
+            if target is not None and vm.name not in pooled:
+                targets.append(target)
+        return targets
+
+    def guest_row(self, name):
+        for row in range(self.guest_table.rowCount()):
+            if self.guest_table.item(row, 0).text() == name:
+                return row
+        return -1
+
+    def run_guest_action(self, action):
+        if self.guest_worker is not None:
+            return
+        targets = self.guest_agent_targets()
+        if action == "stats":
+            names = [t[0] for t in targets]
+            if names != [self.guest_table.item(row, 0).text() for row in range(self.guest_table.rowCount())]:
+                self.guest_table.setRowCount(0)
+                for name in names:
+                    row = self.guest_table.rowCount()
+                    self.guest_table.insertRow(row)
+                    for col, value in enumerate([name, "…", "…", "…"]):
+                        self.guest_table.setItem(row, col, QTableWidgetItem(value))
+        else:
+            row = self.guest_table.currentRow()
+            name = self.guest_table.item(row, 0).text() if row >= 0 else None
+            targets = [t for t in targets if t[0] == name]
+            if not targets:
+                self.guest_status.setText("Select a running VM with a guest agent first.")
+                return
+        if not targets:
+            return
+        self.guest_worker = GuestAgentWorker(targets, action, self)
+        self.guest_worker.result.connect(self.on_guest_result)
+        self.guest_worker.failed.connect(lambda name, msg: self.on_guest_failed(name, msg, action))
+        self.guest_worker.finished.connect(self.on_guest_worker_finished)
+        self.guest_worker.start()
+
+    def on_guest_result(self, name, result):
+        if isinstance(result, str):
+            self.log_output.appendPlainText(f"[{name}] guest agent: {result}")
+            self.guest_status.setText(f"{name}: {result}")
+            if result == "shutdown requested":
+                self.after_guest_shutdown(name)
+            return
+        row = self.guest_row(name)
+        if row < 0:
+            return
+        cpu = "n/a"
+        ticks = result["cpu_ticks"]
+        if ticks is not None:
+            prev = self.guest_cpu_ticks.get(name)
+            self.guest_cpu_ticks[name] = ticks
+            cpu = "…"
+            if prev is not None and ticks[1] > prev[1]:
+                cpu = f"{(ticks[0] - prev[0]) * 100 / (ticks[1] - prev[1]):.0f}%"
+        memory = "n/a (enable the balloon)"
+        if result["memory"] is not None:
+            used, total = result["memory"]
+            memory = f"{format_size(used)} / {format_size(total)}"
+        filesystems = ", ".join(f"{mount} {used * 100 // total}%" for mount, used, total in
+                                dict((fs[0], fs) for fs in result["filesystems"]).values() if total)
+        for col, value in enumerate([cpu, memory, filesystems or "-"], start=1):
+            self.guest_table.item(row, col).setText(value)
+        # Highlight hot guests
+        hot = cpu.endswith("%") and float(cpu[:-1]) >= 90
+        self.guest_table.item(row, 1).setForeground(Qt.GlobalColor.red if hot else self.guest_table.palette().text())
+
+    def on_guest_failed(self, name, msg, action):
+        if action != "stats":
+            self.log_output.appendPlainText(f"[{name}] guest agent {action} failed: {msg}")
+            self.guest_status.setText(f"{name}: {action} failed: {msg}")
+            return
+        row = self.guest_row(name)
+        if row >= 0:
+            for col, value in enumerate(["-", "-", f"agent not responding: {msg}"], start=1):
+                self.guest_table.item(row, col).setText(value)
+
+    def on_guest_worker_finished(self):
+        self.guest_worker.deleteLater()
+        self.guest_worker = None
+
+    def after_guest_shutdown(self, name):
+        # QEMU keeps running with -no-shutdown or when the guest hangs: stop it after a grace period
+        if self.guest_target is not None and self.guest_target[0] == name:
+            self.agent_shutdown_pending = True
+            proc = self.process
+            QTimer.singleShot(QGA_SHUTDOWN_GRACE_MS, lambda: self.force_stop(proc))
+        else:
+            vm = self.supervisor.instances.get(name)
+            if vm is not None:
+                vm.stopping = True
+            QTimer.singleShot(QGA_SHUTDOWN_GRACE_MS, lambda: self.supervisor.stop(name))
+
+    def shutdown_guest(self):
+        # The agent powers the guest off directly, without ACPI (which -no-acpi disables) or a power
+        # button handler. A second click or an unresponsive agent falls back to terminating QEMU.
+        if self.guest_target is None or self.agent_shutdown_pending:
+            return False
+        try:
+            with GuestAgentClient(self.guest_target[1], timeout=1.0) as client:
+                client.connect()
+                client.shutdown()
+        except (OSError, QmpError, ValueError) as exc:
+            self.log_output.appendPlainText(f"Guest agent unavailable ({exc or type(exc).__name__}), stopping QEMU")
+            return False
+        self.log_output.appendPlainText("Shutdown requested via guest agent")
+        self.after_guest_shutdown(self.guest_target[0])
+        return True
+
+    def force_stop(self, proc):
+        if proc is self.process and proc.state() == QProcess.ProcessState.Running:
+            proc.terminate()
+            if not proc.waitForFinished(3000):
+                proc.kill()
+
+    def create_metrics_tab(self):
+        layout = QVBoxLayout()
+        self.metrics_table = QTableWidget(0, 9)
+        self.metrics_table.setHorizontalHeaderLabels(
+            ["VM", "Device", "Read IOPS", "Write IOPS", "Read/s", "Write/s", "Latency", "Queue", "IOPS History"])
+        self.metrics_table.horizontalHeader().setSectionResizeMode(8, QHeaderView.ResizeMode.Stretch)
+        self.metrics_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.metrics_table)
+        self.net_table = QTableWidget(0, 7)
+        self.net_table.setHorizontalHeaderLabels(
+            ["VM", "Interface", "RX/s", "TX/s", "RX Packets/s", "TX Packets/s", "RX+TX History"])
+        self.net_table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)
+        self.net_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.net_table)
+        self.metrics_status = QLabel("Per-disk I/O and network traffic of every running VM, busiest first. Sampled every 2 s.")
+        self.metrics_status.setWordWrap(True)
+        self.metrics_status.setStyleSheet("color: gray;")
+        layout.addWidget(self.metrics_status)
+
+        self.metrics_tab = self.create_scroll_widget(layout)
+        self.blockstats_sampler.sampled.connect(
+            lambda: self.show_blockstats() if self.tabs.currentWidget() is self.metrics_tab else None)
+        self.netstats_sampler.sampled.connect(
+            lambda: self.show_netstats() if self.tabs.currentWidget() is self.metrics_tab else None)
+        self.tabs.currentChanged.connect(self.on_metrics_tab_shown)
+        return self.metrics_tab
+
+    def on_metrics_tab_shown(self):
+        if self.tabs.currentWidget() is self.metrics_tab:
+            self.show_blockstats()
+            self.show_netstats()
+
+    def show_blockstats(self):
+        rows = []
+        series, _ = self.blockstats_sampler.snapshot()
+        for (name, device), samples in series.items():
+            if samples:
+                rates = samples[-1][1]
+                history = [r["read_iops"] + r["write_iops"] for _, r in samples[-40:]]
+                rows.append((rates["read_iops"] + rates["write_iops"], name, device, rates, history))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        self.metrics_table.setRowCount(len(rows))
+        for row, (_, name, device, rates, history) in enumerate(rows):
+            values = [name, device, f"{rates['read_iops']:.0f}", f"{rates['write_iops']:.0f}",
+                      f"{format_size(rates['read_bps'])}", f"{format_size(rates['write_bps'])}",
+                      f"{rates['latency_ms']:.2f} ms",
+                      "–" if rates["queue_depth"] is None else f"{rates['queue_depth']:.1f}", sparkline(history)]
+            for col, value in enumerate(values):
+                self.metrics_table.setItem(row, col, QTableWidgetItem(value))
+        total = sum(row[0] for row in rows)
+        if total > 0 and len(rows) > 1:
+            busiest = rows[0]
+            self.metrics_status.setText(
+                f"Busiest: {busiest[1]} / {busiest[2]} with {busiest[0] * 100 / total:.0f}% of {total:.0f} IOPS")
+
+    def show_netstats(self):
+        series, unavailable = self.netstats_sampler.snapshot()
+        rows = []
+        for (name, ifname), samples in series.items():
+            if samples:
+                rx, tx, rx_pkts, tx_pkts = samples[-1][1]
+                history = [r[0] + r[1] for _, r in samples[-40:]]
+                rows.append((rx + tx, name, ifname, [format_size(rx), format_size(tx), f"{rx_pkts:.0f}",
+                                                     f"{tx_pkts:.0f}", sparkline(history)]))
+        rows.sort(key=lambda row: row[0], reverse=True)
+        rows += [(0, name, "-", ["n/a", "n/a", "n/a", "n/a", "no host-side counters for this network backend"])
+                 for name in sorted(unavailable)]
+        self.net_table.setRowCount(len(rows))
+        for row, (_, name, ifname, values) in enumerate(rows):
+            for col, value in enumerate([name, ifname] + values):
+                self.net_table.setItem(row, col, QTableWidgetItem(value))
 
     def clear_all_fields(self):
         # Reset LineEdits
         line_edits = [
-            self.f_name, self.f_uuid, self.f_pidfile, self.f_mem_path, self.f_numa,
+            self.f_name, self.f_uuid, self.f_pidfile, self.f_mem_path, self.f_numa, self.f_pool_state,
             self.f_hda, self.f_hdb, self.f_hdc, self.f_hdd, self.f_cdrom,
             self.f_fda, self.f_fdb, self.f_mtdblock, self.f_pflash, self.f_sd,
             self.f_hostfwd, self.f_hostname, self.f_redir, self.f_nic,
             self.f_vnc, self.f_usbdevice, self.f_kbd_layout,
-            self.f_kernel, self.f_initrd, self.f_append, self.f_dtb, self.f_bios, self.f_L,
+            self.f_kernel, self.f_initrd, self.f_append, self.f_dtb, self.f_bios, self.f_L, self.f_boot_marker,
             self.f_audiodev, self.f_debug_item, self.f_debug_log, self.f_gdb, self.f_trace, self.f_trace_file,
             self.f_object, self.f_global, self.f_add_fd, self.f_device_extra
         ]
@@ -1267,9 +6644,9 @@ class MguiQemu(QMainWindow):
 
         # Reset ComboBoxes
         combos = [
-            self.f_arch, self.f_machine, self.f_cpu, self.f_accel, self.f_boot,
-            self.f_net_type, self.f_net_device, self.f_display, self.f_vga,
-            self.f_usb_device, self.f_audio_drv, self.f_soundhw
+            self.f_arch, self.f_machine, self.f_cpu, self.f_accel, self.f_boot, self.f_suspend_compress, self.f_mem_merge,
+            self.f_tcg_thread, self.f_icount, self.f_net_type, self.f_net_device, self.f_display, self.f_vga,
+            self.f_usb_device, self.f_audio_drv, self.f_soundhw, self.f_restart_policy
         ]
         for w in combos:
             if w:
@@ -1278,12 +6655,16 @@ class MguiQemu(QMainWindow):
         # Reset SpinBoxes
         if self.f_ram: self.f_ram.setValue(1024)
         if self.f_smp: self.f_smp.setValue(1)
+        if self.f_tcg_tb_size: self.f_tcg_tb_size.setValue(0)
+        if self.f_restart_max: self.f_restart_max.setValue(5)
+        if self.f_restart_window: self.f_restart_window.setValue(300)
 
         # Reset CheckBoxes
         checkboxes = [
             self.f_nodefaults, self.f_no_user_config, self.f_S, self.f_no_acpi,
             self.f_no_hpet, self.f_no_shutdown, self.f_no_reboot, self.f_daemonize,
-            self.f_mem_prealloc, self.f_snapshot, self.f_fullscreen, self.f_usb
+            self.f_mem_prealloc, self.f_balloon, self.f_guest_agent, self.f_snapshot, self.f_fullscreen, self.f_usb,
+            self.f_fast_boot
         ]
         for w in checkboxes:
             if w:
@@ -1314,11 +6695,12 @@ class MguiQemu(QMainWindow):
 
     def setup_connections(self):
         widgets = [
-            self.f_arch, self.f_machine, self.f_cpu, self.f_accel,
+            self.f_arch, self.f_machine, self.f_cpu, self.f_accel, self.f_mem_merge,
+            self.f_tcg_thread, self.f_tcg_tb_size,
             self.f_ram, self.f_smp, self.f_boot, self.f_uuid,
             self.f_nodefaults, self.f_no_user_config, self.f_S,
             self.f_no_acpi, self.f_no_hpet, self.f_no_shutdown,
-            self.f_no_reboot, self.f_daemonize, self.f_mem_prealloc,
+            self.f_no_reboot, self.f_daemonize, self.f_mem_prealloc, self.f_balloon, self.f_guest_agent,
             self.f_pidfile, self.f_mem_path, self.f_numa,
             self.f_hda, self.f_hdb, self.f_hdc, self.f_hdd, self.f_cdrom,
             self.f_fda, self.f_fdb, self.f_mtdblock, self.f_pflash, self.f_sd, self.f_snapshot,
@@ -1326,7 +6708,7 @@ class MguiQemu(QMainWindow):
             self.f_redir, self.f_nic,
             self.f_display, self.f_vga, self.f_vnc, self.f_fullscreen,
             self.f_usb, self.f_usb_device, self.f_usbdevice, self.f_kbd_layout,
-            self.f_kernel, self.f_initrd, self.f_append, self.f_dtb, self.f_bios, self.f_L,
+            self.f_kernel, self.f_initrd, self.f_append, self.f_dtb, self.f_bios, self.f_L, self.f_fast_boot,
             self.f_audio_drv, self.f_audiodev, self.f_soundhw,
             self.f_debug_item, self.f_debug_log, self.f_gdb, self.f_trace, self.f_trace_file,
             self.f_object, self.f_global, self.f_add_fd, self.f_device_extra,
@@ -1345,11 +6727,19 @@ class MguiQemu(QMainWindow):
                 w.stateChanged.connect(lambda _: self.update_preview())
 
         self.f_arch.currentIndexChanged.connect(
-            lambda _=None: (self.update_qemu_path_auto(), self.update_preview())
+            lambda _=None: (self.update_qemu_path_auto(), self.apply_arch_defaults(), self.update_accel_hint(),
+                            self.update_tcg_fields(), self.update_preview())
         )
+        self.f_accel.currentIndexChanged.connect(lambda _=None: self.update_tcg_fields())
+        self.f_icount.currentTextChanged.connect(lambda _: (self.update_tcg_fields(), self.update_preview()))
+        for w in [self.f_hda, self.f_hdb, self.f_hdc, self.f_hdd, self.f_cdrom]:
+            w.textChanged.connect(lambda _: self.update_storage_info())
+
+    def lang_code(self):
+        return LANG_CODES[self.f_lang.currentIndex()]
 
     def retranslate_ui(self):
-        lang_code = ["en", "ua", "de", "zh", "ru"][self.f_lang.currentIndex()]
+        lang_code = self.lang_code()
         d = self.lang_data[lang_code]
         is_intuitive = self.f_intuitive.isChecked()
 
@@ -1359,11 +6749,15 @@ class MguiQemu(QMainWindow):
         self.label_qemu_logs.setText(d["logs"])
         
         # Sidebar & Buttons
-        # Finding Delete button is slightly tricky, let's just find it by type in sidebar
-        for i in range(self.centralWidget().layout().itemAt(0).layout().count()):
-            w = self.centralWidget().layout().itemAt(0).layout().itemAt(i).widget()
-            if isinstance(w, QPushButton) and w != self.btn_run:
-                w.setText(d["delete_vm"])
+        self.btn_del_vm.setText(d["delete_vm"])
+        self.btn_clone_vm.setText(d["clone_vm"])
+        self.btn_export_vm.setText(d["export_vm"])
+        self.btn_bulk_launch.setText(d["bulk_launch"])
+        self.btn_capacity.setText(d["capacity"])
+        self.btn_benchmark.setText(d["benchmark"])
+        self.btn_import_scripts.setText(d["import_scripts"])
+        self.label_warm_pool.setText(d["warm_pool"])
+        self.btn_suspend.setText(d["suspend"])
 
         self.btn_run.setText(d["stop"] if self.process.state() == QProcess.ProcessState.Running else d["launch"])
         self.status_label.setText(d["status_running"] if self.process.state() == QProcess.ProcessState.Running else d["status_idle"])
@@ -1385,6 +6779,20 @@ class MguiQemu(QMainWindow):
         self.tabs.setTabText(7, d["tab_debug"])
         self.tabs.setTabText(8, d["tab_expert"])
         self.tabs.setTabText(9, d["tab_templates"])
+        self.tabs.setTabText(10, d["tab_images"])
+        self.tabs.setTabText(11, d["tab_snapshots"])
+        self.tabs.setTabText(12, d["tab_ksm"])
+        self.tabs.setTabText(13, d["tab_guest"])
+        self.tabs.setTabText(14, d["tab_metrics"])
+        self.btn_ksm_apply.setText(d["ksm_apply"])
+        self.btn_snap_refresh.setText(f"🔄 {d['snap_refresh']}")
+        self.btn_snap_take.setText(f"📸 {d['snap_take']}")
+        self.btn_snap_revert.setText(f"⏪ {d['snap_revert']}")
+        self.btn_snap_delete.setText(f"🗑 {d['snap_delete']}")
+        self.btn_guest_refresh.setText(f"🔄 {d['guest_refresh']}")
+        self.btn_guest_freeze.setText(f"🧊 {d['guest_freeze']}")
+        self.btn_guest_thaw.setText(f"💧 {d['guest_thaw']}")
+        self.btn_guest_shutdown.setText(f"⏻ {d['guest_shutdown']}")
 
         # HW
         hw = self.hw_layout
@@ -1392,6 +6800,9 @@ class MguiQemu(QMainWindow):
         hw.labelForField(self.f_arch).setText(d["arch"])
         hw.labelForField(self.f_machine).setText(d["machine"])
         hw.labelForField(self.f_cpu).setText(d["cpu"])
+        hw.labelForField(self.cpu_resolver_row).setText(d["cpu_resolver"])
+        self.btn_cpu_best.setText(d["cpu_best"])
+        self.btn_cpu_cluster.setText(d["cpu_cluster"])
         hw.labelForField(self.f_accel).setText(d["accel"])
         hw.labelForField(self.f_ram).setText(d["intuitive_ram"] if is_intuitive else d["ram"])
         hw.labelForField(self.f_smp).setText(d["intuitive_cores"] if is_intuitive else d["cores"])
@@ -1399,6 +6810,17 @@ class MguiQemu(QMainWindow):
         hw.itemAt(hw.getWidgetPosition(self.f_pidfile.parentWidget())[0], QFormLayout.ItemRole.LabelRole).widget().setText(d["pid_file"])
         hw.labelForField(self.f_mem_path).setText(d["mem_path"])
         hw.labelForField(self.f_numa).setText(d["numa"])
+        hw.itemAt(hw.getWidgetPosition(self.f_pool_state.parentWidget())[0], QFormLayout.ItemRole.LabelRole).widget().setText(d["pool_state"])
+        hw.labelForField(self.f_suspend_compress).setText(d["suspend_compress"])
+        hw.labelForField(self.f_mem_merge).setText(d["mem_merge"])
+        hw.labelForField(self.f_tcg_thread).setText(d["tcg_thread"])
+        hw.labelForField(self.f_tcg_tb_size).setText(d["tcg_tb_size"])
+        hw.labelForField(self.f_icount).setText(d["icount"])
+        hw.labelForField(self.f_balloon_min).setText(d["balloon_min"])
+        hw.labelForField(self.f_balloon_max).setText(d["balloon_max"])
+        hw.labelForField(self.f_restart_policy).setText(d["restart_policy"])
+        hw.labelForField(self.f_restart_max).setText(d["restart_max"])
+        hw.labelForField(self.f_restart_window).setText(d["restart_window"])
         
         self.f_nodefaults.setText(d["no_defaults"])
         self.f_no_user_config.setText(d["no_user_config"])
@@ -1409,13 +6831,17 @@ class MguiQemu(QMainWindow):
         self.f_no_reboot.setText(d["no_reboot"])
         self.f_daemonize.setText(d["daemonize"])
         self.f_mem_prealloc.setText(d["prealloc_ram"])
+        self.f_balloon.setText(d["balloon"])
+        self.f_guest_agent.setText(d["guest_agent"])
 
         tech_hw = [
             self.f_arch, self.f_machine, self.f_cpu, self.f_accel, self.f_uuid, 
-            self.f_pidfile.parentWidget(), self.f_mem_path, self.f_numa,
-            self.f_nodefaults, self.f_no_user_config, self.f_S, self.f_no_acpi,
+            self.f_pidfile.parentWidget(), self.f_mem_path, self.f_numa, self.f_pool_state.parentWidget(),
+            self.f_suspend_compress, self.f_nodefaults, self.f_no_user_config, self.f_S, self.f_no_acpi,
             self.f_no_hpet, self.f_no_shutdown, self.f_no_reboot, self.f_daemonize,
-            self.f_mem_prealloc
+            self.f_mem_prealloc, self.f_balloon, self.f_balloon_min, self.f_balloon_max, self.f_mem_merge, self.f_guest_agent,
+            self.f_restart_max, self.f_restart_window,
+            self.f_tcg_thread, self.f_tcg_tb_size, self.f_icount, self.cpu_resolver_row
         ]
         for w in tech_hw:
             l = hw.labelForField(w)
@@ -1479,8 +6905,17 @@ class MguiQemu(QMainWindow):
         # Templates
         if hasattr(self, 'label_select_template'):
             self.label_select_template.setText(d["select_template"])
+            self.template_filter.setPlaceholderText(d["template_filter"])
+            self.template_arch.setItemText(0, d["any_arch"])
+            self.btn_apply_template.setText(d["apply_template"])
         if hasattr(self, 'btn_clear'):
             self.btn_clear.setText(d["clear"])
+        self.btn_undo.setText(d["undo"])
+        self.btn_redo.setText(d["redo"])
+
+        # Disk Images
+        self.btn_queue_job.setText(d["queue_job"])
+        self.btn_cancel_job.setText(d["cancel_job"])
 
         # Expert
         self.label_qemu_bin.setText(d["qemu_bin"])
@@ -1500,11 +6935,13 @@ class MguiQemu(QMainWindow):
         self.tabs.setTabVisible(6, not is_intuitive) # Audio
         self.tabs.setTabVisible(7, not is_intuitive) # Debug
         self.tabs.setTabVisible(8, not is_intuitive) # Expert
+        self.tabs.setTabVisible(10, not is_intuitive) # Disk Images
+        self.tabs.setTabVisible(12, not is_intuitive) # KSM
         
         self.update_preview()
 
     def update_qemu_path_auto(self):
-        arch_code = self.arch_map.get(self.f_arch.currentText(), "x86_64")
+        arch_code = self.arch_map.get(self.f_arch.currentText(), self.f_arch.currentText() or "x86_64")
         binary_name = f"qemu-system-{arch_code}"
         if platform.system() == "Windows":
             binary_name += ".exe"
@@ -1515,6 +6952,17 @@ class MguiQemu(QMainWindow):
                     return
         self.f_qemu_path.setText(binary_name)
 
+    def update_storage_info(self):
+        lines = []
+        for label, widget in [("hda", self.f_hda), ("hdb", self.f_hdb), ("hdc", self.f_hdc),
+                              ("hdd", self.f_hdd), ("cdrom", self.f_cdrom)]:
+            path = widget.text().strip()
+            if not path:
+                continue
+            info = inspect_image(path)
+            lines.append(f"{label}: {describe_image(info) if info else 'not found'}")
+        self.storage_info.setText("\n".join(lines))
+
     def select_qemu_executable(self):
         file_filter = "Executables (*.exe)" if platform.system() == "Windows" else "All Files (*)"
         file_path, _ = QFileDialog.getOpenFileName(self, "Select QEMU Executable", "", file_filter)
@@ -1522,223 +6970,294 @@ class MguiQemu(QMainWindow):
             self.f_qemu_path.setText(file_path)
 
     def generate_command_list(self):
-        qemu_bin = self.f_qemu_path.text().strip()
-        if not qemu_bin:
-            arch_code = self.arch_map.get(self.f_arch.currentText(), self.f_arch.currentText() or "x86_64")
-            qemu_bin = f"qemu-system-{arch_code}"
-
-        cmd = [qemu_bin]
-
-        # System & CPU
-        if self.f_name.text():
-            cmd.extend(["-name", self.f_name.text()])
-
-        cmd.extend(["-m", str(self.f_ram.value())])
-        cmd.extend(["-smp", str(self.f_smp.value())])
-        
-        # Determine acceleration and machine type
-        machine = self.f_machine.currentText() if isinstance(self.f_machine, QComboBox) else self.f_machine.text()
-        accel = self.f_accel.currentText()
-        
-        if accel == "kvm":
-            cmd.extend(["-machine", f"{machine},accel=kvm"])
-        else:
-            cmd.extend(["-machine", machine])
-            cmd.extend(["-accel", accel])
-
-        cmd.extend(["-cpu", self.f_cpu.currentText()])
-
-        uuid_val = self.f_uuid.text().strip()
-        if uuid_val: cmd.extend(["-uuid", uuid_val])
-
-        pidfile = self.f_pidfile.text().strip()
-        if pidfile: cmd.extend(["-pidfile", pidfile])
-
-        mem_path = self.f_mem_path.text().strip()
-        if mem_path: cmd.extend(["-mem-path", mem_path])
-
-        numa = self.f_numa.text().strip()
-        if numa: cmd.extend(["-numa", numa])
-
-        if self.f_nodefaults.isChecked(): cmd.append("-nodefaults")
-        if self.f_no_user_config.isChecked(): cmd.append("-no-user-config")
-        if self.f_S.isChecked(): cmd.append("-S")
-        if self.f_no_acpi.isChecked(): cmd.append("-no-acpi")
-        if self.f_no_hpet.isChecked(): cmd.append("-no-hpet")
-        if self.f_no_shutdown.isChecked(): cmd.append("-no-shutdown")
-        if self.f_no_reboot.isChecked(): cmd.append("-no-reboot")
-        if self.f_daemonize.isChecked(): cmd.append("-daemonize")
-        if self.f_mem_prealloc.isChecked(): cmd.append("-mem-prealloc")
-
-        # Storage
-        for flag, widget in [
-            ("-hda", self.f_hda), ("-hdb", self.f_hdb), ("-hdc", self.f_hdc), ("-hdd", self.f_hdd),
-            ("-cdrom", self.f_cdrom), ("-fda", self.f_fda), ("-fdb", self.f_fdb),
-            ("-mtdblock", self.f_mtdblock), ("-pflash", self.f_pflash), ("-sd", self.f_sd)
-        ]:
-            path = widget.text().strip()
-            if path: cmd.extend([flag, path])
-
-        if self.f_snapshot.isChecked(): cmd.append("-snapshot")
-
-        boot_val = self.f_boot.currentText()
-        if boot_val:
-            cmd.extend(["-boot", boot_val.split()[0]])
-
-        # Network
-        net_type = self.f_net_type.currentText()
-        if net_type != "none":
-            netdev_id = "net0"
-            net_opts = f"{net_type},id={netdev_id}"
-            hostfwd = self.f_hostfwd.text().strip()
-            if net_type == "user" and hostfwd:
-                net_opts += f",hostfwd={hostfwd}"
-            hostname = self.f_hostname.text().strip()
-            if net_type == "user" and hostname:
-                net_opts += f",hostname={hostname}"
-
-            cmd.extend(["-netdev", net_opts])
-            cmd.extend(["-device", f"{self.f_net_device.currentText()},netdev={netdev_id}"])
-
-        nic_val = self.f_nic.text().strip()
-        if nic_val: cmd.extend(["-nic", nic_val])
-        redir_val = self.f_redir.text().strip()
-        if redir_val: cmd.extend(["-redir", redir_val])
-
-        # Graphics
-        display_val = self.f_display.currentText()
-        if display_val != "none":
-            cmd.extend(["-display", display_val])
-        else:
-            cmd.append("-nographic")
-
-        vga_val = self.f_vga.currentText()
-        if vga_val != "none":
-            cmd.extend(["-vga", vga_val])
-
-        vnc_val = self.f_vnc.text().strip()
-        if vnc_val: cmd.extend(["-vnc", vnc_val])
-        if self.f_fullscreen.isChecked(): cmd.append("-full-screen")
-
-        # Input
-        if self.f_usb.isChecked(): cmd.append("-usb")
-        usb_dev = self.f_usb_device.currentText()
-        if usb_dev: cmd.extend(["-device", usb_dev])
-        usbdevice_val = self.f_usbdevice.text().strip()
-        if usbdevice_val: cmd.extend(["-usbdevice", usbdevice_val])
-        kbd_layout = self.f_kbd_layout.text().strip()
-        if kbd_layout: cmd.extend(["-k", kbd_layout])
-
-        # Kernel & Boot
-        for flag, widget in [
-            ("-kernel", self.f_kernel), ("-initrd", self.f_initrd), ("-dtb", self.f_dtb),
-            ("-bios", self.f_bios), ("-L", self.f_L)
-        ]:
-            path = widget.text().strip()
-            if path: cmd.extend([flag, path])
-
-        append_val = self.f_append.text().strip()
-        if append_val: cmd.extend(["-append", append_val])
-
-        # Audio
-        audio_drv = self.f_audio_drv.currentText()
-        soundhw = self.f_soundhw.currentText()
-        if audio_drv != "none":
-            cmd.extend(["-audio", f"driver={audio_drv},model={soundhw}"])
-        elif soundhw != "none":
-            cmd.extend(["-soundhw", soundhw])
-
-        audiodev = self.f_audiodev.text().strip()
-        if audiodev: cmd.extend(["-audiodev", audiodev])
-
-        # Debug
-        debug_items = self.f_debug_item.text().strip()
-        if debug_items: cmd.extend(["-d", debug_items])
-        debug_log = self.f_debug_log.text().strip()
-        if debug_log: cmd.extend(["-D", debug_log])
-        gdb_val = self.f_gdb.text().strip()
-        if gdb_val:
-            if gdb_val == "s":
-                cmd.append("-s")
-            else:
-                cmd.extend(["-gdb", gdb_val])
-        trace_val = self.f_trace.text().strip()
-        if trace_val: cmd.extend(["-trace", trace_val])
-        trace_file = self.f_trace_file.text().strip()
-        if trace_file: cmd.extend(["-T", trace_file])
-
-        # Expert
-        obj_val = self.f_object.text().strip()
-        if obj_val: cmd.extend(["-object", obj_val])
-        glob_val = self.f_global.text().strip()
-        if glob_val: cmd.extend(["-global", glob_val])
-        fd_val = self.f_add_fd.text().strip()
-        if fd_val: cmd.extend(["-add-fd", fd_val])
-        dev_extra = self.f_device_extra.text().strip()
-        if dev_extra: cmd.extend(["-device", dev_extra])
-
-        extra = self.f_extra.toPlainText().strip()
-        if extra:
-            cmd.extend(shlex.split(extra))
-
-        return cmd
+        return build_command(self.collect_config())
 
     # Corrected methods at class level
     def update_preview(self):
         try:
             self.cmd_preview.setPlainText(" ".join(self.generate_command_list()))
-        except (OSError, FileNotFoundError) as exc:
+        except (OSError, ValueError) as exc:
             self.cmd_preview.setPlainText(f"Error: {exc}")
 
     def run_vm(self):
-        lang_code = ["en", "ua", "de"][self.f_lang.currentIndex()]
+        lang_code = self.lang_code()
         d = self.lang_data[lang_code]
         if self.process.state() == QProcess.ProcessState.Running:
-            self.process.terminate()
-            if not self.process.waitForFinished(3000):
-                self.process.kill()
+            self.stop_requested = True
+            if self.shutdown_guest():
+                return
+            self.force_stop(self.process)
+            return
+        # Launching by hand replaces a pending automatic restart and starts a fresh restart history
+        self.restart_timer.stop()
+
+        if self.launch_from_pool():
             return
 
-        args = self.generate_command_list()
+        try:
+            args = self.generate_command_list()
+        except ValueError as exc:
+            QMessageBox.critical(self, d["err"], str(exc))
+            return
         if not args:
             QMessageBox.critical(self, d["err"], "Unable to generate QEMU launch command")
             return
+        self.qmp_port = find_free_port()
+        args += qmp_args(self.qmp_port)
+        session = JournalSession(self.journal, self.collect_config()["name"] or "vm")
+        args += session.args()
+
+        # A suspended VM continues from its saved state instead of cold booting
+        cfg = self.collect_config()
+        state = saved_state_for(self.base_path, cfg)
+        if state is not None and not state[2]:
+            reply = QMessageBox.question(
+                self, d["err"],
+                "The configuration changed since this VM was suspended.\n"
+                "Discard the saved state and boot from scratch?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+            discard_state(state[0])
+            state = None
+        if state is not None:
+            args += incoming_args(state[0], state[1])
+
+        if cfg.get("fast_boot", False) and not cfg.get("kernel", "").strip():
+            QMessageBox.critical(self, d["err"], "Fast boot loads the kernel directly: set a kernel in the Boot/Kernel tab.")
+            return
 
         # Check binary existence
         qemu_bin = str(args[0])
-        executable_path = shutil.which(qemu_bin)
-
-        # Fallback for Windows if only name is provided
-        if not executable_path and platform.system() == "Windows" and not qemu_bin.lower().endswith(".exe"):
-            executable_path = shutil.which(qemu_bin + ".exe")
-
+        executable_path = resolve_qemu_binary(qemu_bin)
         if not executable_path:
-            # If still not found, check if it's an absolute path that exists
-            bin_path = Path(qemu_bin)
-            if bin_path.exists():
-                executable_path = str(bin_path)
-            else:
-                QMessageBox.critical(
-                    self, d["err"],
-                    f"QEMU binary not found: {qemu_bin}\nPlease check the path in the 'Expert' tab."
-                )
-                return
+            QMessageBox.critical(
+                self, d["err"],
+                f"QEMU binary not found: {qemu_bin}\nPlease check the path in the 'Expert' tab."
+            )
+            return
 
         self.log_output.clear()
         self.log_output.appendPlainText(f"Starting: {' '.join(args)}")
         self.process.setProgram(executable_path)
         self.process.setArguments([str(arg) for arg in args[1:]])
+        self.start_boot_timer(cfg)
         self.process.start()
 
         if not self.process.waitForStarted(5000):
             QMessageBox.critical(self, d["err"], f"Failed to start QEMU: {self.process.errorString()}")
+            return
+        self.journal_session = session
+        session.launched(args, self.process.processId())
+        if state is not None:
+            self.start_suspend_worker("resume", state[0], state[1])
+        self.restart_policy = RestartPolicy.from_config(cfg)
+        self.track_main_vm(cfg)
+
+    def track_main_vm(self, cfg):
+        self.restart_cfg = cfg
+        self.stop_requested = False
+        self.vm_started_at = time.monotonic()
+        if cfg.get("balloon", False):
+            self.balloon_balancer.set_target(self.qmp_port, cfg["name"] or "vm", cfg["balloon_min"],
+                                             cfg["balloon_max"] or cfg["ram"])
+        self.guest_target = guest_agent_target(cfg["name"] or "vm", cfg, self.qmp_port)
+        self.start_vm_stats(self.qmp_port, cfg["name"] or "vm", cfg, self.process.processId())
+
+    def restart_vm(self):
+        # Cold boot from the configuration the VM was launched with, even if the form was edited since
+        cfg = self.restart_cfg
+        if cfg is None or self.process.state() != QProcess.ProcessState.NotRunning:
+            return
+        args = build_command(cfg)
+        executable_path = resolve_qemu_binary(str(args[0]))
+        if not executable_path:
+            self.log_output.appendPlainText(f"Restart failed: QEMU binary not found: {args[0]}")
+            return
+        self.qmp_port = find_free_port()
+        args += qmp_args(self.qmp_port)
+        session = JournalSession(self.journal, cfg["name"] or "vm")
+        args += session.args()
+        state = saved_state_for(self.base_path, cfg)
+        if state is not None and not state[2]:
+            self.log_output.appendPlainText("Configuration changed since the VM was suspended: discarding the saved state")
+            discard_state(state[0])
+            state = None
+        if state is not None:
+            args += incoming_args(state[0], state[1])
+        self.log_output.appendPlainText(f"Restarting: {' '.join(str(arg) for arg in args)}")
+        self.process.setProgram(executable_path)
+        self.process.setArguments([str(arg) for arg in args[1:]])
+        self.start_boot_timer(cfg)
+        self.process.start()
+        if not self.process.waitForStarted(5000):
+            self.log_output.appendPlainText(f"Restart failed: {self.process.errorString()}")
+            return
+        self.journal_session = session
+        session.launched(args, self.process.processId())
+        if state is not None:
+            self.start_suspend_worker("resume", state[0], state[1])
+        self.track_main_vm(cfg)
+
+    def schedule_vm_restart(self, code, crashed):
+        policy = self.restart_policy
+        name = self.restart_cfg["name"] or "vm"
+        delay = policy.next_delay(code, crashed, time.monotonic() - self.vm_started_at)
+        if delay is None:
+            if policy.crash_loop:
+                self.journal.record(name, "crash_loop", restarts=len(policy.restarts), window_s=policy.window)
+                self.log_output.appendPlainText(
+                    f"Crash loop: {len(policy.restarts)} restarts within {policy.window} s, giving up")
+            return
+        self.journal.record(name, "restart_scheduled", attempt=policy.attempt, delay_s=round(delay, 3))
+        self.log_output.appendPlainText(f"Restarting in {delay:.1f} s (attempt {policy.attempt}, {policy.policy})")
+        self.status_label.setText(f"● Restarting in {delay:.0f} s")
+        self.restart_timer.start(int(delay * 1000))
+
+    def suspend_vm(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        if self.process.state() != QProcess.ProcessState.Running or self.suspend_worker is not None:
+            return
+        # The VM that is running, not whatever the form shows now
+        cfg = self.restart_cfg
+        if cfg is None:
+            return
+        vm_dir = self.base_path / (cfg["name"].strip() or "unnamed_vm")
+        if not vm_dir.is_dir():
+            QMessageBox.critical(self, d["err"], "Save the VM configuration before suspending it.")
+            return
+        if "-snapshot" in self.process.arguments():
+            QMessageBox.critical(self, d["err"], "VMs running with -snapshot cannot be suspended: their disk changes are discarded on exit.")
+            return
+        compress = cfg.get("suspend_compress", "none")
+        self.stop_requested = True
+        self.start_suspend_worker("suspend", vm_dir / SUSPEND_STATE_FILE,
+                                  {"fingerprint": config_fingerprint(cfg)},
+                                  compress if compress in STATE_COMPRESSORS else "")
+
+    def start_suspend_worker(self, mode, state_path, meta, compress=""):
+        self.suspend_worker = SuspendWorker(mode, self.qmp_port, state_path, meta, compress, self)
+        label = "Suspend" if mode == "suspend" else "Resume"
+        self.suspend_worker.progress.connect(lambda pct: self.status_label.setText(f"● {label}: {pct}%"))
+        self.suspend_worker.done.connect(
+            lambda elapsed: self.log_output.appendPlainText(f"{label} finished in {elapsed} ({state_path})"))
+        self.suspend_worker.failed.connect(
+            lambda msg: self.log_output.appendPlainText(f"{label} failed: {msg}"))
+        if mode == "suspend":
+            # QEMU keeps running when suspending fails, so a later crash is still restarted
+            self.suspend_worker.failed.connect(lambda _msg: setattr(self, "stop_requested", False))
+        self.suspend_worker.finished.connect(self.on_suspend_worker_finished)
+        self.suspend_worker.start()
+
+    def on_suspend_worker_finished(self):
+        self.suspend_worker.deleteLater()
+        self.suspend_worker = None
+        self.update_status_ui()
 
-    def on_process_finished(self):
+    def update_warm_pool(self):
+        size = self.f_pool_size.value()
+        if size == 0:
+            self.warm_pool.size = 0
+            self.warm_pool.drain()
+            return
+        self.warm_pool.configure(self.collect_config(), size)
+
+    def launch_from_pool(self):
+        cfg = self.collect_config()
+        if not self.warm_pool.matches(cfg):
+            if self.warm_pool.size:
+                self.pool_status.setText("Pool holds a different configuration; cold booting")
+            return False
+        vm = self.warm_pool.acquire()
+        if vm is None:
+            return False
+        self.supervisor.release(vm.name)
+        old = self.process
+        self.bind_process(vm.process)
+        old.deleteLater()
+        self.qmp_port = vm.qmp_port
+        self.journal_session = vm.journal_session
+        self.restart_policy = RestartPolicy.from_config(cfg)
+        # Restart what the pool actually ran, minus the pool's own overrides (instance key, -S, no restarts)
+        self.restart_cfg = {key: value for key, value in vm.cfg.items() if key != "instance"}
+        self.restart_cfg.update(S=self.warm_pool.cfg.get("S", False),
+                                restart_policy=self.warm_pool.cfg.get("restart_policy", "never"))
+        self.stop_requested = False
+        self.vm_started_at = time.monotonic()
+        self.guest_target = guest_agent_target(cfg["name"] or "vm", vm.cfg, vm.qmp_port)
+        self.start_vm_stats(vm.qmp_port, cfg["name"] or "vm", vm.cfg, vm.process.processId())
+        self.pool_resuming = vm.name
+        self.log_output.clear()
+        self.log_output.appendPlainText(f"Resuming pre-warmed {vm.name}: {' '.join(vm.args)}")
         self.update_status_ui()
+        return True
+
+    def on_pool_resumed(self, name, elapsed_ms):
+        if name == self.pool_resuming:
+            self.pool_resuming = None
+            self.log_output.appendPlainText(f"Resumed pre-warmed {name} in {elapsed_ms:.1f} ms")
+
+    def on_pool_resume_failed(self, name, reason):
+        if name == self.pool_resuming:
+            self.pool_resuming = None
+            self.log_output.appendPlainText(f"Pre-warmed {name} failed to resume: {reason}")
+            self.stop_requested = True
+            self.force_stop(self.process)
+
+    def track_balloon(self, vm):
+        if not vm.cfg.get("balloon", False):
+            return
+        port = vm.qmp_port
+        self.balloon_balancer.set_target(port, vm.name, vm.cfg.get("balloon_min", 512),
+                                         vm.cfg.get("balloon_max", 0) or vm.cfg.get("ram", 2048))
+        vm.process.finished.connect(lambda: self.balloon_balancer.remove_target(port))
+
+    def start_vm_stats(self, port, name, cfg, pid):
+        self.blockstats_sampler.set_target(port, name)
+        self.netstats_sampler.set_target(port, name, pid=pid, net_type=cfg.get("net_type", "user"))
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.set_target(port, name, pid, cfg.get("net_type", "user"))
+
+    def stop_vm_stats(self, port):
+        self.blockstats_sampler.remove_target(port)
+        self.netstats_sampler.remove_target(port)
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.remove_target(port)
+
+    def start_metrics_exporter(self, exporter):
+        self.metrics_exporter = exporter
+        exporter.setParent(self)
+        exporter.start_exporting()
+
+    def track_vm_stats(self, vm):
+        port = vm.qmp_port
+        self.start_vm_stats(port, vm.name, vm.cfg, vm.process.processId())
+        vm.process.finished.connect(lambda: self.stop_vm_stats(port))
+
+    def on_process_finished(self, code=0, status=QProcess.ExitStatus.NormalExit):
+        crashed = status == QProcess.ExitStatus.CrashExit
+        if self.journal_session is not None:
+            self.journal_session.finished(code, crashed)
+            self.journal_session = None
+        if crashed or code:
+            self.log_output.appendPlainText(f"QEMU exited with code {code}{' (crashed)' if crashed else ''}")
+        intentional = self.stop_requested or self.agent_shutdown_pending
+        if self.qmp_port is not None:
+            self.balloon_balancer.remove_target(self.qmp_port)
+            self.stop_vm_stats(self.qmp_port)
+        if self.guest_target is not None:
+            self.guest_cpu_ticks.pop(self.guest_target[0], None)
+        self.guest_target = None
+        self.agent_shutdown_pending = False
+        self.update_status_ui()
+        if self.restart_policy is not None and not intentional:
+            self.schedule_vm_restart(code, crashed)
         print("QEMU process finished.")
 
     def update_status_ui(self):
-        lang_code = ["en", "ua", "de"][self.f_lang.currentIndex()]
+        lang_code = self.lang_code()
         d = self.lang_data[lang_code]
         is_run = self.process.state() == QProcess.ProcessState.Running
         self.btn_run.setText(d["stop"] if is_run else d["launch"])
@@ -1750,6 +7269,25 @@ class MguiQemu(QMainWindow):
             f"color: {'#00ff00' if is_run else 'gray'}; font-weight: bold;"
         )
 
+    def start_boot_timer(self, cfg):
+        # Time-to-userspace: from spawning QEMU until the ready marker shows up on the console
+        pattern = cfg.get("boot_marker", "").strip() or (DEFAULT_BOOT_MARKER if cfg.get("fast_boot", False) else "")
+        self.boot_tail = ""
+        self.boot_started = time.perf_counter()
+        try:
+            self.boot_marker = re.compile(pattern) if pattern else None
+        except re.error:
+            self.boot_marker = re.compile(re.escape(pattern))
+
+    def check_boot_marker(self, text):
+        self.boot_tail = (self.boot_tail + text)[-4096:]
+        if self.boot_marker.search(self.boot_tail):
+            elapsed = (time.perf_counter() - self.boot_started) * 1000
+            self.log_output.appendPlainText(f"Reached userspace in {elapsed:.0f} ms")
+            self.boot_marker = None
+            if self.journal_session is not None:
+                self.journal_session.booted(elapsed / 1000)
+
     def read_output(self):
         try:
             err = self.process.readAllStandardError().data().decode(errors='replace')
@@ -1758,11 +7296,13 @@ class MguiQemu(QMainWindow):
                 self.log_output.appendPlainText(err.strip())
             if out:
                 self.log_output.appendPlainText(out.strip())
+            if self.boot_marker is not None:
+                self.check_boot_marker(err + out)
         except Exception as e:
             print(f"Read output error: {e}")
 
     def delete_vm(self):
-        lang_code = ["en", "ua", "de"][self.f_lang.currentIndex()]
+        lang_code = self.lang_code()
         d = self.lang_data[lang_code]
         name = self.vm_list.currentItem()
         if not name: return
@@ -1775,93 +7315,271 @@ class MguiQemu(QMainWindow):
                 shutil.rmtree(p)
                 self.refresh_list()
 
+    def show_bulk_launch(self):
+        if self.bulk_dialog is None:
+            self.bulk_dialog = BulkLaunchDialog(self.bulk_scheduler, self.base_path, self)
+            self.bulk_dialog.finished.connect(lambda _: setattr(self, "bulk_dialog", None))
+            self.bulk_dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.bulk_dialog.show()
+        self.bulk_dialog.raise_()
+
+    def running_vm_names(self):
+        names = set(self.supervisor.instances)
+        if self.process.state() == QProcess.ProcessState.Running:
+            names.add(self.f_name.text().strip())
+        return names
+
+    def show_capacity_planner(self):
+        if self.capacity_dialog is None:
+            self.capacity_dialog = CapacityDialog(self.base_path, self.running_vm_names, self)
+            self.capacity_dialog.finished.connect(lambda _: setattr(self, "capacity_dialog", None))
+            self.capacity_dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        else:
+            self.capacity_dialog.refresh()
+        self.capacity_dialog.show()
+        self.capacity_dialog.raise_()
+
+    def show_benchmark(self):
+        if self.benchmark_dialog is None:
+            self.benchmark_dialog = BenchmarkDialog(self.base_path, self)
+            self.benchmark_dialog.finished.connect(self.on_benchmark_closed)
+        self.benchmark_dialog.show()
+        self.benchmark_dialog.raise_()
+
+    def on_benchmark_closed(self):
+        if self.benchmark_dialog.bench is not None:
+            self.benchmark_dialog.bench.done.disconnect()
+            self.benchmark_dialog.bench.cancel()
+        self.benchmark_dialog.deleteLater()
+        self.benchmark_dialog = None
+
+    def import_scripts_dialog(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        if self.import_worker is not None:
+            return
+        folder = QFileDialog.getExistingDirectory(self, d["import_title"])
+        if not folder:
+            return
+        self.btn_import_scripts.setEnabled(False)
+        self.log_output.appendPlainText(f"Importing launch scripts from {folder}...")
+        self.import_worker = ImportWorker([folder], self.base_path, self)
+        self.import_worker.done.connect(self.on_import_done)
+        self.import_worker.failed.connect(
+            lambda message: QMessageBox.critical(self, d["err"], f"Import failed: {message}"))
+        self.import_worker.finished.connect(self.on_import_worker_finished)
+        self.import_worker.start()
+
+    def on_import_done(self, report):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        summary, details = format_import_report(report)
+        self.refresh_list()
+        self.log_output.appendPlainText(summary)
+        box = QMessageBox(QMessageBox.Information, d["import_title"], summary, QMessageBox.Ok, self)
+        box.setDetailedText(details)
+        box.exec()
+
+    def on_import_worker_finished(self):
+        self.import_worker.deleteLater()
+        self.import_worker = None
+        self.btn_import_scripts.setEnabled(True)
+
+    def clone_vm(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        item = self.vm_list.currentItem()
+        if not item or self.copy_worker is not None:
+            return
+        name = item.text()
+        new_name, ok = QInputDialog.getText(self, d["clone_vm"], "New VM name:", text=f"{name}_clone")
+        new_name = new_name.strip()
+        if not ok or not new_name:
+            return
+        if (self.base_path / new_name).exists():
+            QMessageBox.critical(self, d["err"], f"A VM named '{new_name}' already exists.")
+            return
+        self.start_copy_worker("clone", self.base_path / name, self.base_path / new_name)
+
+    def export_vm(self):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        item = self.vm_list.currentItem()
+        if not item or self.copy_worker is not None:
+            return
+        name = item.text()
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, d["export_vm"], str(Path.home() / f"{name}.tar"), "Tar bundle (*.tar)"
+        )
+        if not file_path:
+            return
+        try:
+            Path(file_path).unlink(missing_ok=True)
+        except OSError as exc:
+            QMessageBox.critical(self, d["err"], f"Failed to export: {exc}")
+            return
+        self.start_copy_worker("export", self.base_path / name, file_path)
+
+    def start_copy_worker(self, mode, src_dir, target):
+        self.copy_progress = QProgressDialog(f"Copying {src_dir.name}...", "Cancel", 0, 1000, self)
+        self.copy_progress.setMinimumDuration(300)
+        self.copy_worker = VmCopyWorker(mode, src_dir, target, self)
+        self.copy_progress.canceled.connect(self.copy_worker.cancel)
+        self.copy_worker.progress.connect(self.on_copy_progress)
+        self.copy_worker.done.connect(self.on_copy_done)
+        self.copy_worker.failed.connect(self.on_copy_failed)
+        self.copy_worker.finished.connect(self.on_copy_worker_finished)
+        self.copy_worker.start()
+
+    def on_copy_progress(self, copied, total):
+        if self.copy_progress and total:
+            self.copy_progress.setValue(min(999, copied * 1000 // total))
+
+    def on_copy_done(self, target):
+        worker = self.copy_worker
+        if worker.mode == "clone":
+            self.rewrite_cloned_config(worker.src_dir, Path(target))
+            self.refresh_list()
+        self.log_output.appendPlainText(f"{worker.mode.capitalize()} finished: {target}")
+
+    def on_copy_failed(self, message):
+        lang_code = self.lang_code()
+        d = self.lang_data[lang_code]
+        if message != "Cancelled":
+            QMessageBox.critical(self, d["err"], f"Copy failed: {message}")
+        self.log_output.appendPlainText(f"Copy failed: {message}")
+
+    def on_copy_worker_finished(self):
+        if self.copy_progress:
+            self.copy_progress.reset()
+            self.copy_progress.deleteLater()
+        self.copy_worker.deleteLater()
+        self.copy_worker = None
+        self.copy_progress = None
+
+    @staticmethod
+    def rewrite_cloned_config(src_dir, dst_dir):
+        # Point the clone at its own copies of disks that lived inside the old VM folder
+        cfg_path = dst_dir / "config.json"
+        try:
+            with open(cfg_path, "r", encoding='utf-8') as f:
+                data = json.load(f)
+            old_prefix = src_dir.as_posix() + "/"
+            for key, value in data.items():
+                if isinstance(value, str) and value.replace("\\", "/").startswith(old_prefix):
+                    data[key] = dst_dir.as_posix() + "/" + value.replace("\\", "/")[len(old_prefix):]
+            data["name"] = dst_dir.name
+            with open(cfg_path, "w", encoding='utf-8') as f:
+                json.dump(data, f, indent=4)
+        except (OSError, JSONDecodeError) as exc:
+            print(f"Clone config error: {exc}")
+
+    def collect_config(self):
+        return {
+            "lang_idx": self.f_lang.currentIndex(),
+            "intuitive": self.f_intuitive.isChecked(),
+            "name": self.f_name.text(),
+            "mode": self.f_mode.currentIndex(),
+            "arch": self.f_arch.currentText(),
+            "machine": self.f_machine.currentText(),
+            "cpu": self.f_cpu.currentText(),
+            "accel": self.f_accel.currentText(),
+            "tcg_thread": self.f_tcg_thread.currentText(),
+            "tcg_tb_size": self.f_tcg_tb_size.value(),
+            "icount": self.f_icount.currentText().strip(),
+            "ram": self.f_ram.value(),
+            "smp": self.f_smp.value(),
+            "uuid": self.f_uuid.text(),
+            "pidfile": self.f_pidfile.text(),
+            "mem_path": self.f_mem_path.text(),
+            "numa": self.f_numa.text(),
+            "pool_state": self.f_pool_state.text(),
+            "suspend_compress": self.f_suspend_compress.currentText().split()[0],
+            "nodefaults": self.f_nodefaults.isChecked(),
+            "no_user_config": self.f_no_user_config.isChecked(),
+            "S": self.f_S.isChecked(),
+            "no_acpi": self.f_no_acpi.isChecked(),
+            "no_hpet": self.f_no_hpet.isChecked(),
+            "no_shutdown": self.f_no_shutdown.isChecked(),
+            "no_reboot": self.f_no_reboot.isChecked(),
+            "daemonize": self.f_daemonize.isChecked(),
+            "mem_prealloc": self.f_mem_prealloc.isChecked(),
+            "mem_merge": self.f_mem_merge.currentText(),
+            "balloon": self.f_balloon.isChecked(),
+            "guest_agent": self.f_guest_agent.isChecked(),
+            "balloon_min": self.f_balloon_min.value(),
+            "balloon_max": self.f_balloon_max.value(),
+            "restart_policy": self.f_restart_policy.currentText(),
+            "restart_max": self.f_restart_max.value(),
+            "restart_window": self.f_restart_window.value(),
+
+            "hda": self.f_hda.text(),
+            "hdb": self.f_hdb.text(),
+            "hdc": self.f_hdc.text(),
+            "hdd": self.f_hdd.text(),
+            "cdrom": self.f_cdrom.text(),
+            "fda": self.f_fda.text(),
+            "fdb": self.f_fdb.text(),
+            "mtdblock": self.f_mtdblock.text(),
+            "pflash": self.f_pflash.text(),
+            "sd": self.f_sd.text(),
+            "snapshot": self.f_snapshot.isChecked(),
+            "boot": self.f_boot.currentText(),
+
+            "net_type": self.f_net_type.currentText(),
+            "net_device": self.f_net_device.currentText(),
+            "nic": self.f_nic.text(),
+            "hostfwd": self.f_hostfwd.text(),
+            "hostname": self.f_hostname.text(),
+            "redir": self.f_redir.text(),
+
+            "display": self.f_display.currentText(),
+            "vga": self.f_vga.currentText(),
+            "vnc": self.f_vnc.text(),
+            "fullscreen": self.f_fullscreen.isChecked(),
+
+            "usb": self.f_usb.isChecked(),
+            "usb_device": self.f_usb_device.currentText(),
+            "usbdevice": self.f_usbdevice.text(),
+            "kbd_layout": self.f_kbd_layout.text(),
+
+            "kernel": self.f_kernel.text(),
+            "initrd": self.f_initrd.text(),
+            "append": self.f_append.text(),
+            "dtb": self.f_dtb.text(),
+            "bios": self.f_bios.text(),
+            "L": self.f_L.text(),
+            "fast_boot": self.f_fast_boot.isChecked(),
+            "boot_marker": self.f_boot_marker.text(),
+
+            "audio_drv": self.f_audio_drv.currentText(),
+            "audiodev": self.f_audiodev.text(),
+            "soundhw": self.f_soundhw.currentText(),
+
+            "debug_item": self.f_debug_item.text(),
+            "debug_log": self.f_debug_log.text(),
+            "gdb": self.f_gdb.text(),
+            "trace": self.f_trace.text(),
+            "trace_file": self.f_trace_file.text(),
+
+            "object": self.f_object.text(),
+            "global": self.f_global.text(),
+            "add_fd": self.f_add_fd.text(),
+            "device_extra": self.f_device_extra.text(),
+
+            "qemu_path": self.f_qemu_path.text(),
+            "extra": self.f_extra.toPlainText()
+        }
+
     def save_vm(self):
-        lang_code = ["en", "ua", "de"][self.f_lang.currentIndex()]
+        lang_code = self.lang_code()
         d = self.lang_data[lang_code]
         name = self.f_name.text().strip() or "unnamed_vm"
         p = self.base_path / name
         try:
             p.mkdir(exist_ok=True)
-            data = {
-                "lang_idx": self.f_lang.currentIndex(),
-                "intuitive": self.f_intuitive.isChecked(),
-                "name": name,
-                "mode": self.f_mode.currentIndex(),
-                "arch": self.f_arch.currentText(),
-                "machine": self.f_machine.currentText(),
-                "cpu": self.f_cpu.currentText(),
-                "accel": self.f_accel.currentText(),
-                "ram": self.f_ram.value(),
-                "smp": self.f_smp.value(),
-                "uuid": self.f_uuid.text(),
-                "pidfile": self.f_pidfile.text(),
-                "mem_path": self.f_mem_path.text(),
-                "numa": self.f_numa.text(),
-                "nodefaults": self.f_nodefaults.isChecked(),
-                "no_user_config": self.f_no_user_config.isChecked(),
-                "S": self.f_S.isChecked(),
-                "no_acpi": self.f_no_acpi.isChecked(),
-                "no_hpet": self.f_no_hpet.isChecked(),
-                "no_shutdown": self.f_no_shutdown.isChecked(),
-                "no_reboot": self.f_no_reboot.isChecked(),
-                "daemonize": self.f_daemonize.isChecked(),
-                "mem_prealloc": self.f_mem_prealloc.isChecked(),
-
-                "hda": self.f_hda.text(),
-                "hdb": self.f_hdb.text(),
-                "hdc": self.f_hdc.text(),
-                "hdd": self.f_hdd.text(),
-                "cdrom": self.f_cdrom.text(),
-                "fda": self.f_fda.text(),
-                "fdb": self.f_fdb.text(),
-                "mtdblock": self.f_mtdblock.text(),
-                "pflash": self.f_pflash.text(),
-                "sd": self.f_sd.text(),
-                "snapshot": self.f_snapshot.isChecked(),
-                "boot": self.f_boot.currentText(),
-
-                "net_type": self.f_net_type.currentText(),
-                "net_device": self.f_net_device.currentText(),
-                "nic": self.f_nic.text(),
-                "hostfwd": self.f_hostfwd.text(),
-                "hostname": self.f_hostname.text(),
-                "redir": self.f_redir.text(),
-
-                "display": self.f_display.currentText(),
-                "vga": self.f_vga.currentText(),
-                "vnc": self.f_vnc.text(),
-                "fullscreen": self.f_fullscreen.isChecked(),
-
-                "usb": self.f_usb.isChecked(),
-                "usb_device": self.f_usb_device.currentText(),
-                "usbdevice": self.f_usbdevice.text(),
-                "kbd_layout": self.f_kbd_layout.text(),
-
-                "kernel": self.f_kernel.text(),
-                "initrd": self.f_initrd.text(),
-                "append": self.f_append.text(),
-                "dtb": self.f_dtb.text(),
-                "bios": self.f_bios.text(),
-                "L": self.f_L.text(),
-
-                "audio_drv": self.f_audio_drv.currentText(),
-                "audiodev": self.f_audiodev.text(),
-                "soundhw": self.f_soundhw.currentText(),
-
-                "debug_item": self.f_debug_item.text(),
-                "debug_log": self.f_debug_log.text(),
-                "gdb": self.f_gdb.text(),
-                "trace": self.f_trace.text(),
-                "trace_file": self.f_trace_file.text(),
-
-                "object": self.f_object.text(),
-                "global": self.f_global.text(),
-                "add_fd": self.f_add_fd.text(),
-                "device_extra": self.f_device_extra.text(),
-
-                "qemu_path": self.f_qemu_path.text(),
-                "extra": self.f_extra.toPlainText()
-            }
+            data = self.collect_config()
+            data["name"] = name
             with open(p / "config.json", "w", encoding='utf-8') as f:
                 json.dump(data, f, indent=4)
             self.refresh_list()
@@ -1876,89 +7594,164 @@ class MguiQemu(QMainWindow):
         try:
             with open(p, "r", encoding='utf-8') as f:
                 d = json.load(f)
-                self.f_lang.setCurrentIndex(d.get("lang_idx", 0))
-                self.f_intuitive.setChecked(d.get("intuitive", False))
-                self.retranslate_ui()
-                self.f_mode.setCurrentIndex(d.get("mode", 0))
-                self.on_mode_changed()
-                self.f_name.setText(d.get("name", name))
-                self.f_arch.setCurrentText(d.get("arch", "x86_64"))
-                self.f_machine.setCurrentText(d.get("machine", "q35"))
-                self.f_cpu.setCurrentText(d.get("cpu", "host"))
-                self.f_accel.setCurrentText(d.get("accel", "kvm"))
-                self.f_ram.setValue(d.get("ram", 2048))
-                self.f_smp.setValue(d.get("smp", 2))
-                self.f_uuid.setText(d.get("uuid", ""))
-                self.f_pidfile.setText(d.get("pidfile", ""))
-                self.f_mem_path.setText(d.get("mem_path", ""))
-                self.f_numa.setText(d.get("numa", ""))
-                self.f_nodefaults.setChecked(d.get("nodefaults", False))
-                self.f_no_user_config.setChecked(d.get("no_user_config", False))
-                self.f_S.setChecked(d.get("S", False))
-                self.f_no_acpi.setChecked(d.get("no_acpi", False))
-                self.f_no_hpet.setChecked(d.get("no_hpet", False))
-                self.f_no_shutdown.setChecked(d.get("no_shutdown", False))
-                self.f_no_reboot.setChecked(d.get("no_reboot", False))
-                self.f_daemonize.setChecked(d.get("daemonize", False))
-                self.f_mem_prealloc.setChecked(d.get("mem_prealloc", False))
-
-                self.f_hda.setText(d.get("hda", ""))
-                self.f_hdb.setText(d.get("hdb", ""))
-                self.f_hdc.setText(d.get("hdc", ""))
-                self.f_hdd.setText(d.get("hdd", ""))
-                self.f_cdrom.setText(d.get("cdrom", ""))
-                self.f_fda.setText(d.get("fda", ""))
-                self.f_fdb.setText(d.get("fdb", ""))
-                self.f_mtdblock.setText(d.get("mtdblock", ""))
-                self.f_pflash.setText(d.get("pflash", ""))
-                self.f_sd.setText(d.get("sd", ""))
-                self.f_snapshot.setChecked(d.get("snapshot", False))
-                self.f_boot.setCurrentText(d.get("boot", ""))
-
-                self.f_net_type.setCurrentText(d.get("net_type", "user"))
-                self.f_net_device.setCurrentText(d.get("net_device", "virtio-net-pci"))
-                self.f_nic.setText(d.get("nic", ""))
-                self.f_hostfwd.setText(d.get("hostfwd", ""))
-                self.f_hostname.setText(d.get("hostname", ""))
-                self.f_redir.setText(d.get("redir", ""))
-
-                self.f_display.setCurrentText(d.get("display", "gtk"))
-                self.f_vga.setCurrentText(d.get("vga", "virtio"))
-                self.f_vnc.setText(d.get("vnc", ""))
-                self.f_fullscreen.setChecked(d.get("fullscreen", False))
-
-                self.f_usb.setChecked(d.get("usb", False))
-                self.f_usb_device.setCurrentText(d.get("usb_device", ""))
-                self.f_usbdevice.setText(d.get("usbdevice", ""))
-                self.f_kbd_layout.setText(d.get("kbd_layout", ""))
-
-                self.f_kernel.setText(d.get("kernel", ""))
-                self.f_initrd.setText(d.get("initrd", ""))
-                self.f_append.setText(d.get("append", ""))
-                self.f_dtb.setText(d.get("dtb", ""))
-                self.f_bios.setText(d.get("bios", ""))
-                self.f_L.setText(d.get("L", ""))
-
-                self.f_audio_drv.setCurrentText(d.get("audio_drv", "none"))
-                self.f_audiodev.setText(d.get("audiodev", ""))
-                self.f_soundhw.setCurrentText(d.get("soundhw", "none"))
-
-                self.f_debug_item.setText(d.get("debug_item", ""))
-                self.f_debug_log.setText(d.get("debug_log", ""))
-                self.f_gdb.setText(d.get("gdb", ""))
-                self.f_trace.setText(d.get("trace", ""))
-                self.f_trace_file.setText(d.get("trace_file", ""))
-
-                self.f_object.setText(d.get("object", ""))
-                self.f_global.setText(d.get("global", ""))
-                self.f_add_fd.setText(d.get("add_fd", ""))
-                self.f_device_extra.setText(d.get("device_extra", ""))
-
-                self.f_qemu_path.setText(d.get("qemu_path", ""))
-                self.f_extra.setPlainText(d.get("extra", ""))
+            self.apply_config(d, name)
         except (OSError, JSONDecodeError) as exc:
             print(f"Load error: {exc}")
         self.update_preview()
+        self.switch_history(name)
+
+    def watch_config_edits(self):
+        for attr, w in vars(self).items():
+            if not attr.startswith("f_") or attr in ("f_lang", "f_intuitive"):
+                continue
+            if isinstance(w, QComboBox):
+                w.currentTextChanged.connect(lambda _: self.history_timer.start(0))
+            elif isinstance(w, QSpinBox):
+                w.valueChanged.connect(lambda _: self.history_timer.start(0))
+            elif isinstance(w, QLineEdit):
+                w.textChanged.connect(lambda _: self.history_timer.start(0))
+            elif isinstance(w, QPlainTextEdit):
+                w.textChanged.connect(lambda: self.history_timer.start(0))
+            elif isinstance(w, QCheckBox):
+                w.stateChanged.connect(lambda _: self.history_timer.start(0))
+
+    def switch_history(self, name):
+        # Each VM keeps its own history while the app runs; it is dropped if the config changed on disk
+        self.history_timer.stop()
+        cfg = self.collect_config()
+        history = self.histories.pop(name, None)
+        if history is None or any(history.current.get(k) != v for k, v in cfg.items() if k not in HISTORY_IGNORED):
+            history = ConfigHistory(cfg)
+        self.histories[name] = history
+        while len(self.histories) > HISTORY_VMS:
+            del self.histories[next(iter(self.histories))]
+        self.history = history
+        self.update_history_actions()
+
+    def record_config_edit(self):
+        if self.history is not None and self.history.record(self.collect_config()):
+            self.update_history_actions()
+
+    def undo_config(self):
+        self.history_timer.stop()
+        self.record_config_edit()
+        self.restore_config(self.history.undo())
+
+    def redo_config(self):
+        self.history_timer.stop()
+        self.record_config_edit()
+        self.restore_config(self.history.redo())
+
+    def restore_config(self, cfg):
+        if cfg is not None:
+            cfg.update({k: v for k, v in self.collect_config().items() if k in HISTORY_IGNORED})
+            self.apply_config(cfg)
+            self.update_preview()
+            # Applying fires the same widget signals as editing; they must not become a new step
+            self.history_timer.stop()
+            self.history.current = dict(self.collect_config())
+        self.update_history_actions()
+
+    def update_history_actions(self):
+        self.btn_undo.setEnabled(bool(self.history.undo_steps))
+        self.btn_redo.setEnabled(bool(self.history.redo_steps))
+
+    def apply_config(self, d, name=""):
+        self.f_lang.setCurrentIndex(d.get("lang_idx", 0))
+        self.f_intuitive.setChecked(d.get("intuitive", False))
+        self.retranslate_ui()
+        self.f_mode.setCurrentIndex(d.get("mode", 0))
+        self.on_mode_changed()
+        self.f_name.setText(d.get("name", name))
+        self.f_arch.setCurrentText(d.get("arch", "x86_64"))
+        self.f_machine.setCurrentText(d.get("machine", "q35"))
+        self.f_cpu.setCurrentText(d.get("cpu", "host"))
+        self.f_accel.setCurrentText(d.get("accel", "kvm"))
+        self.f_tcg_thread.setCurrentText(d.get("tcg_thread", "auto"))
+        self.f_tcg_tb_size.setValue(d.get("tcg_tb_size", 0))
+        self.f_icount.setCurrentText(d.get("icount", ""))
+        self.f_ram.setValue(d.get("ram", 2048))
+        self.f_smp.setValue(d.get("smp", 2))
+        self.f_uuid.setText(d.get("uuid", ""))
+        self.f_pidfile.setText(d.get("pidfile", ""))
+        self.f_mem_path.setText(d.get("mem_path", ""))
+        self.f_numa.setText(d.get("numa", ""))
+        self.f_pool_state.setText(d.get("pool_state", ""))
+        self.f_suspend_compress.setCurrentIndex(max(0, self.f_suspend_compress.findText(d.get("suspend_compress", "none"), Qt.MatchFlag.MatchStartsWith)))
+        self.f_nodefaults.setChecked(d.get("nodefaults", False))
+        self.f_no_user_config.setChecked(d.get("no_user_config", False))
+        self.f_S.setChecked(d.get("S", False))
+        self.f_no_acpi.setChecked(d.get("no_acpi", False))
+        self.f_no_hpet.setChecked(d.get("no_hpet", False))
+        self.f_no_shutdown.setChecked(d.get("no_shutdown", False))
+        self.f_no_reboot.setChecked(d.get("no_reboot", False))
+        self.f_daemonize.setChecked(d.get("daemonize", False))
+        self.f_mem_prealloc.setChecked(d.get("mem_prealloc", False))
+        self.f_mem_merge.setCurrentText(d.get("mem_merge", "default"))
+        self.f_balloon.setChecked(d.get("balloon", False))
+        self.f_guest_agent.setChecked(d.get("guest_agent", False))
+        self.f_balloon_min.setValue(d.get("balloon_min", 512))
+        self.f_balloon_max.setValue(d.get("balloon_max", 0))
+        self.f_restart_policy.setCurrentText(d.get("restart_policy", "never"))
+        self.f_restart_max.setValue(d.get("restart_max", 5))
+        self.f_restart_window.setValue(d.get("restart_window", 300))
+
+        self.f_hda.setText(d.get("hda", ""))
+        self.f_hdb.setText(d.get("hdb", ""))
+        self.f_hdc.setText(d.get("hdc", ""))
+        self.f_hdd.setText(d.get("hdd", ""))
+        self.f_cdrom.setText(d.get("cdrom", ""))
+        self.f_fda.setText(d.get("fda", ""))
+        self.f_fdb.setText(d.get("fdb", ""))
+        self.f_mtdblock.setText(d.get("mtdblock", ""))
+        self.f_pflash.setText(d.get("pflash", ""))
+        self.f_sd.setText(d.get("sd", ""))
+        self.f_snapshot.setChecked(d.get("snapshot", False))
+        self.f_boot.setCurrentText(d.get("boot", ""))
+
+        self.f_net_type.setCurrentText(d.get("net_type", "user"))
+        self.f_net_device.setCurrentText(d.get("net_device", "virtio-net-pci"))
+        self.f_nic.setText(d.get("nic", ""))
+        self.f_hostfwd.setText(d.get("hostfwd", ""))
+        self.f_hostname.setText(d.get("hostname", ""))
+        self.f_redir.setText(d.get("redir", ""))
+
+        self.f_display.setCurrentText(d.get("display", "gtk"))
+        self.f_vga.setCurrentText(d.get("vga", "virtio"))
+        self.f_vnc.setText(d.get("vnc", ""))
+        self.f_fullscreen.setChecked(d.get("fullscreen", False))
+
+        self.f_usb.setChecked(d.get("usb", False))
+        self.f_usb_device.setCurrentText(d.get("usb_device", ""))
+        self.f_usbdevice.setText(d.get("usbdevice", ""))
+        self.f_kbd_layout.setText(d.get("kbd_layout", ""))
+
+        self.f_kernel.setText(d.get("kernel", ""))
+        self.f_initrd.setText(d.get("initrd", ""))
+        self.f_append.setText(d.get("append", ""))
+        self.f_dtb.setText(d.get("dtb", ""))
+        self.f_bios.setText(d.get("bios", ""))
+        self.f_L.setText(d.get("L", ""))
+        self.f_fast_boot.setChecked(d.get("fast_boot", False))
+        self.f_boot_marker.setText(d.get("boot_marker", ""))
+
+        self.f_audio_drv.setCurrentText(d.get("audio_drv", "none"))
+        self.f_audiodev.setText(d.get("audiodev", ""))
+        self.f_soundhw.setCurrentText(d.get("soundhw", "none"))
+
+        self.f_debug_item.setText(d.get("debug_item", ""))
+        self.f_debug_log.setText(d.get("debug_log", ""))
+        self.f_gdb.setText(d.get("gdb", ""))
+        self.f_trace.setText(d.get("trace", ""))
+        self.f_trace_file.setText(d.get("trace_file", ""))
+
+        self.f_object.setText(d.get("object", ""))
+        self.f_global.setText(d.get("global", ""))
+        self.f_add_fd.setText(d.get("add_fd", ""))
+        self.f_device_extra.setText(d.get("device_extra", ""))
+
+        self.f_qemu_path.setText(d.get("qemu_path", ""))
+        self.f_extra.setPlainText(d.get("extra", ""))
 
     def refresh_list(self):
         self.vm_list.clear()
@@ -1966,6 +7759,22 @@ class MguiQemu(QMainWindow):
             for d in sorted(self.base_path.iterdir()):
                 if d.is_dir() and (d / "config.json").exists():
                     self.vm_list.addItem(d.name)
+                    self.vm_list.item(self.vm_list.count() - 1).setToolTip(self.describe_vm_disks(d))
+
+    @staticmethod
+    def describe_vm_disks(vm_dir):
+        try:
+            with open(vm_dir / "config.json", "r", encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, JSONDecodeError):
+            return ""
+        lines = []
+        for key in ["hda", "hdb", "hdc", "hdd", "cdrom"]:
+            path = data.get(key, "")
+            if path:
+                info = inspect_image(path)
+                lines.append(f"{key}: {describe_image(info) if info else 'not found'}")
+        return "\n".join(lines)
 
     def select_file(self, line_edit):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select File")
@@ -1973,9 +7782,106 @@ class MguiQemu(QMainWindow):
             line_edit.setText(file_path.replace("\\", "/"))
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Modern GUI for QEMU")
+    parser.add_argument("--headless", action="store_true", help="launch saved VMs without the GUI")
+    parser.add_argument("--start", nargs="+", default=[], metavar="VM", help="saved VMs to launch in headless mode")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT", help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-textfile", metavar="PATH", help="write Prometheus metrics to this node_exporter textfile (*.prom)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, metavar="SECONDS", help="seconds between metric collections")
+    parser.add_argument("--journal-report", type=float, nargs="?", const=24.0, metavar="HOURS",
+                        help="summarize launches, crashes and boot times from the event journal (last 24 hours) and exit")
+    parser.add_argument("--import", dest="import_paths", nargs="+", metavar="PATH",
+                        help="import QEMU command lines from launch scripts (files or directories) as saved VMs and exit")
+    # Anything else (e.g. -style) is left for Qt
+    return parser.parse_known_args(argv)
+
+
+def metrics_exporter_from(options):
+    if options.metrics_port is None and not options.metrics_textfile:
+        return None
+    return MetricsExporter(options.metrics_port, options.metrics_textfile, options.metrics_interval)
+
+
+def run_headless(options, qt_args):
+    app = QCoreApplication(qt_args)
+    base_path = Path.home() / "MGUI_QEMU_VMs"
+    journal = EventJournal(base_path)
+    supervisor = VmSupervisor(journal=journal, base_path=base_path)
+    scheduler = BulkLaunchScheduler(supervisor)
+    exporter = metrics_exporter_from(options)
+    supervisor.instance_output.connect(
+        lambda name, text: print(f"[{name}] {text.strip()}", flush=True) if text.strip() else None)
+
+    def on_started(name):
+        vm = supervisor.instances[name]
+        print(f"[{name}] started, QMP on 127.0.0.1:{vm.qmp_port}", flush=True)
+        if exporter is not None:
+            port = vm.qmp_port
+            exporter.set_target(port, name, vm.process.processId(), vm.cfg.get("net_type", "user"))
+            vm.process.finished.connect(lambda: exporter.remove_target(port))
+
+    def on_finished(name, code):
+        print(f"[{name}] QEMU exited with code {code}", flush=True)
+        quit_if_idle()
+
+    def quit_if_idle():
+        if not supervisor.instances and not supervisor.pending_restarts and not scheduler.queue:
+            app.quit()
+
+    def stop(*_):
+        supervisor.stop_all()
+        if not supervisor.instances:
+            app.quit()
+
+    supervisor.instance_started.connect(on_started)
+    supervisor.instance_finished.connect(on_finished)
+    scheduler.drained.connect(quit_if_idle)  # a queued restart that failed to launch
+    supervisor.restart_scheduled.connect(
+        lambda name, attempt, delay: print(f"[{name}] restarting in {delay:.1f} s (attempt {attempt})", flush=True))
+    supervisor.crash_loop.connect(
+        lambda name, count: print(f"[{name}] crash loop: {count} restarts within the restart window, giving up", flush=True))
+    for name in options.start:
+        cfg = load_saved_config(base_path, name)
+        if cfg is None:
+            continue
+        cfg["name"] = name
+        try:
+            supervisor.launch(cfg)
+        except (RuntimeError, OSError) as exc:
+            print(f"[{name}] launch error: {exc}")
+    if not supervisor.instances:
+        print("No VM is running: pass saved VM names with --start")
+        return 1
+    if exporter is not None:
+        exporter.start_exporting()
+
+    # Ctrl+C / SIGTERM stop the VMs; the timer lets the interpreter run its signal handlers
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    wakeup = QTimer()
+    wakeup.timeout.connect(lambda: None)
+    wakeup.start(200)
+    code = app.exec()
+    if exporter is not None:
+        exporter.stop()
+    journal.close()
+    return code
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    options, qt_args = parse_args(sys.argv[1:])
+    if options.journal_report is not None:
+        sys.exit(print_journal_report(Path.home() / "MGUI_QEMU_VMs", options.journal_report))
+    if options.import_paths:
+        sys.exit(print_import_report(options.import_paths, Path.home() / "MGUI_QEMU_VMs"))
+    if options.headless:
+        sys.exit(run_headless(options, [sys.argv[0]] + qt_args))
+    app = QApplication([sys.argv[0]] + qt_args)
     app.setStyle("Fusion")
     window = MguiQemu()
+    exporter = metrics_exporter_from(options)
+    if exporter is not None:
+        window.start_metrics_exporter(exporter)
     window.show()
     sys.exit(app.exec())
\ No newline at end of file